@@ -0,0 +1,842 @@
+#!/usr/bin/env python3
+"""
+Columnar archive for Biomass Conversion Index Monitoring System
+Compacts closed daily prompts_*.jsonl files into prompts_*.bca archives:
+fixed-width columns (timestamps, indicator counts, dictionary-encoded
+indicator words, sessions and projects, lengths and text hashes of compact
+metric records) plus optional prompt text, read back through mmap without
+building an object per record
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+
+from config import get_data_dir
+from key_index import KEY_FIELDS, UNKNOWN_KEY, KeyIndex
+from prompt_store import ARCHIVE_SUFFIX, DATA_FILE_SUFFIX, StatsRecord, data_file_stem, file_date, is_archive, list_data_files, open_data_file
+from summary_cache import SummaryCache, SummaryParseError, new_summary
+
+ARCHIVE_MAGIC = b'BCIA'
+ARCHIVE_VERSION = 3
+FLAG_TEXT = 1
+# Some records are compact metric records (see text_store.py)
+FLAG_METRICS = 2
+# Some records carry the session and project of the hook payload (see key_index.py)
+FLAG_KEYS = 4
+
+# magic, version, flags, record count, dictionary size
+_HEADER = struct.Struct('<4sHHII')
+# Sections in file order; the header is followed by an (offset, length) pair for each
+SECTIONS = ('epoch', 'curses', 'word_index', 'word_ids', 'words', 'text_index', 'text', 'extras', 'length', 'hash',
+            'session', 'project', 'keys')
+# Version 1 archives end at the extras, version 2 at the hashes
+VERSION_SECTIONS = {1: SECTIONS[:8], 2: SECTIONS[:10], 3: SECTIONS}
+_TABLES = {version: struct.Struct('<' + 'QQ' * len(sections)) for version, sections in VERSION_SECTIONS.items()}
+# Fixed-width columns and their array typecodes (stored little-endian)
+COLUMN_TYPES = {'epoch': 'q', 'curses': 'I', 'word_index': 'I', 'word_ids': 'I', 'text_index': 'Q', 'length': 'I',
+                'session': 'I', 'project': 'I'}
+# Length column value of a record in the tracker layout (prompt text inline)
+NO_LENGTH = 0xFFFFFFFF
+# Session/project column value of a record without that field
+NO_KEY = 0xFFFFFFFF
+# SHA-256 of a metric record's text; all zeros when the record has no hash
+HASH_SIZE = 32
+_NO_HASH = bytes(HASH_SIZE)
+
+# Timestamps are stored as wall-clock microseconds since this naive epoch,
+# so hour buckets match the text of the original timestamps
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+HOUR_US = 3600 * 1000000
+
+# Column values buffered per write (and text bytes, times 8) when an archive is copied
+COPY_CHUNK = 64 * 1024
+
+# Closed files touched more recently than this are left alone (a late hook may still be appending)
+COMPACT_MIN_AGE = 300
+
+class ArchiveError(Exception):
+    """A daily file can't be archived, or an archive can't be read"""
+
+def to_epoch_us(timestamp):
+    """Wall-clock microseconds since 1970-01-01 for an ISO timestamp (any UTC offset is ignored, like hour keys)"""
+    return (datetime.fromisoformat(timestamp).replace(tzinfo=None) - _EPOCH) // _MICROSECOND
+
+def from_epoch_us(value):
+    """ISO timestamp, as the tracker writes it, for wall-clock microseconds"""
+    return (_EPOCH + timedelta(microseconds=value)).isoformat()
+
+def key_to_epoch_us(key):
+    """Start of an hour key ('YYYY-MM-DD HH') in wall-clock microseconds"""
+    return (datetime.strptime(key, "%Y-%m-%d %H") - _EPOCH) // _MICROSECOND
+
+def hour_key_us(value):
+    """Hour key ('YYYY-MM-DD HH') for wall-clock microseconds"""
+    return (_EPOCH + timedelta(microseconds=value - value % HOUR_US)).strftime("%Y-%m-%d %H")
+
+def tracker_entry(timestamp, prompt, curse_count, found_curses):
+    """Entry with the fields and key order save_prompt_data writes"""
+    return {
+        "timestamp": timestamp,
+        "prompt": prompt,
+        "curse_count": curse_count,
+        "found_curses": found_curses,
+        "date": timestamp[:10],
+        "hour": int(timestamp[11:13])
+    }
+
+def metric_entry(timestamp, curse_count, found_curses, length, digest=None, context=None):
+    """Compact metric record with the fields and key order text_store writes (context goes before the length)"""
+    entry = {
+        "timestamp": timestamp,
+        "curse_count": curse_count,
+        "found_curses": found_curses
+    }
+    if context:
+        entry.update(context)
+    entry['length'] = length
+    if digest is not None:
+        entry['hash'] = digest
+    return entry
+
+def _hash_bytes(digest):
+    """Raw bytes of a hex SHA-256 text hash, or None if it isn't one"""
+    if not isinstance(digest, str) or len(digest) != 2 * HASH_SIZE:
+        return None
+    try:
+        raw = bytes.fromhex(digest)
+    except ValueError:
+        return None
+    # Upper case or an all-zero hash wouldn't come back the same
+    return raw if raw.hex() == digest and raw != _NO_HASH else None
+
+def _encode(text):
+    """UTF-8 that survives the lone surrogates json.loads can produce"""
+    return text.encode('utf-8', 'surrogatepass')
+
+def _column_bytes(column):
+    """On-disk (little-endian) bytes of a column or blob"""
+    if isinstance(column, array):
+        if sys.byteorder != 'little':
+            column = array(column.typecode, column)
+            column.byteswap()
+        return column.tobytes()
+    return column
+
+def _chunks(values, typecode):
+    """On-disk bytes of a column given value by value, COPY_CHUNK values at a time"""
+    chunk = array(typecode)
+    for value in values:
+        chunk.append(value)
+        if len(chunk) >= COPY_CHUNK:
+            yield _column_bytes(chunk)
+            chunk = array(typecode)
+    yield _column_bytes(chunk)
+
+def _running_totals(sizes):
+    """0 followed by the running totals of sizes (an index column)"""
+    total = 0
+    yield total
+    for size in sizes:
+        total += size
+        yield total
+
+def build_archive(entries, keep_text=True):
+    """
+    Encode the entries of one daily file into archive bytes.
+    Records are rebuilt in the tracker layout or, for compact metric
+    records, from the length and hash columns; the session id and working
+    directory of hook records come from dictionary-encoded columns. Entries
+    the columns can't rebuild byte for byte (other fields, key order,
+    tracker date/hour that differ from the timestamp) are also kept
+    verbatim in the extras section, so exporting round-trips.
+    """
+    epoch = array('q')
+    curses = array('I')
+    word_index = array('I', [0])
+    word_ids = array('I')
+    words = []
+    ids = {}
+    text_index = array('Q', [0])
+    text = bytearray()
+    lengths = array('I')
+    hashes = bytearray()
+    key_columns = {kind: array('I') for kind in KEY_FIELDS}
+    key_names = {kind: [] for kind in KEY_FIELDS}
+    key_ids = {kind: {} for kind in KEY_FIELDS}
+    extras = {}
+    
+    for position, entry in enumerate(entries):
+        try:
+            timestamp = entry['timestamp']
+            micros = to_epoch_us(timestamp)
+            count = entry['curse_count']
+            found = entry['found_curses']
+        except (KeyError, TypeError, ValueError) as e:
+            raise ArchiveError(f"record {position}: {e!r}")
+        if type(count) is not int or count < 0 or not isinstance(found, list) or not all(isinstance(word, str) for word in found):
+            raise ArchiveError(f"record {position}: unexpected indicator fields")
+        
+        epoch.append(micros)
+        curses.append(count)
+        for word in found:
+            word_id = ids.get(word)
+            if word_id is None:
+                word_id = ids[word] = len(words)
+                words.append(word)
+            word_ids.append(word_id)
+        word_index.append(len(word_ids))
+        
+        prompt = entry.get('prompt')
+        has_prompt = isinstance(prompt, str)
+        if keep_text:
+            if has_prompt:
+                text += _encode(prompt)
+            text_index.append(len(text))
+        
+        context = {}
+        for kind, field in KEY_FIELDS.items():
+            value = entry.get(field)
+            if isinstance(value, str):
+                context[field] = value
+                key_id = key_ids[kind].get(value)
+                if key_id is None:
+                    key_id = key_ids[kind][value] = len(key_names[kind])
+                    key_names[kind].append(value)
+                key_columns[kind].append(key_id)
+            else:
+                key_columns[kind].append(NO_KEY)
+        
+        length = entry.get('length')
+        digest = entry.get('hash')
+        raw_hash = _hash_bytes(digest)
+        if 'prompt' not in entry and type(length) is int and 0 <= length < NO_LENGTH and (digest is None or raw_hash):
+            lengths.append(length)
+            hashes += raw_hash or _NO_HASH
+            rebuilt = metric_entry(from_epoch_us(micros), count, found, length, digest, context)
+        else:
+            lengths.append(NO_LENGTH)
+            hashes += _NO_HASH
+            rebuilt = tracker_entry(from_epoch_us(micros), prompt, count, found)
+            rebuilt.update(context)
+        if json.dumps(rebuilt, ensure_ascii=False) != json.dumps(entry, ensure_ascii=False):
+            extra = dict(entry)
+            if has_prompt:
+                # Text lives in the text section (or is dropped) either way
+                extra['prompt'] = None
+            extras[str(position)] = [extra, has_prompt]
+    
+    has_metrics = any(length != NO_LENGTH for length in lengths)
+    has_keys = any(key_names.values())
+    sections = {
+        'epoch': epoch,
+        'curses': curses,
+        'word_index': word_index,
+        'word_ids': word_ids,
+        'words': _encode(json.dumps(words, ensure_ascii=False)),
+        'text_index': text_index if keep_text else array('Q'),
+        'text': bytes(text),
+        'extras': _encode(json.dumps(extras, ensure_ascii=False)) if extras else b'',
+        # Only archives holding metric records carry these columns
+        'length': lengths if has_metrics else array('I'),
+        'hash': bytes(hashes) if has_metrics else b'',
+        # Likewise only archives holding hook records carry the key columns
+        'session': key_columns['session'] if has_keys else array('I'),
+        'project': key_columns['project'] if has_keys else array('I'),
+        'keys': _encode(json.dumps(key_names, ensure_ascii=False)) if has_keys else b''
+    }
+    
+    # Columns start on 8-byte boundaries so they can be cast in place
+    table_struct = _TABLES[ARCHIVE_VERSION]
+    offset = _HEADER.size + table_struct.size
+    table = []
+    blobs = []
+    for name in SECTIONS:
+        data = _column_bytes(sections[name])
+        padding = -offset % 8
+        blobs.append(b'\0' * padding)
+        offset += padding
+        table += [offset, len(data)]
+        blobs.append(data)
+        offset += len(data)
+    
+    flags = (FLAG_TEXT if keep_text else 0) | (FLAG_METRICS if has_metrics else 0) | (FLAG_KEYS if has_keys else 0)
+    header = _HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, flags, len(epoch), len(words))
+    return header + table_struct.pack(*table) + b''.join(blobs)
+
+class PromptArchive:
+    """Read-only archive; columns are memoryviews straight over an mmap of the file"""
+    def __init__(self, path):
+        self.path = path
+        self._views = []
+        with open(path, 'rb') as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ArchiveError(f"{path}: empty archive")
+        
+        try:
+            self._load()
+        except Exception:
+            self.close()
+            raise
+    
+    def _load(self):
+        """Parse the header and map every section"""
+        size = len(self._mmap)
+        if size < _HEADER.size:
+            raise ArchiveError(f"{self.path}: truncated archive")
+        magic, version, flags, count, word_count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != ARCHIVE_MAGIC or version not in _TABLES:
+            raise ArchiveError(f"{self.path}: not an archive this version can read")
+        table_struct = _TABLES[version]
+        if size < _HEADER.size + table_struct.size:
+            raise ArchiveError(f"{self.path}: truncated archive")
+        
+        table = table_struct.unpack_from(self._mmap, _HEADER.size)
+        # Sections an older version doesn't have are empty
+        self._sections = {name: (0, 0) for name in SECTIONS}
+        for position, name in enumerate(VERSION_SECTIONS[version]):
+            start, length = table[2 * position], table[2 * position + 1]
+            if start + length > size:
+                raise ArchiveError(f"{self.path}: section {name} runs past the end of the file")
+            self._sections[name] = (start, length)
+        
+        self._view = memoryview(self._mmap)
+        self._views.append(self._view)
+        self.count = count
+        self.has_text = bool(flags & FLAG_TEXT)
+        self.has_metrics = bool(flags & FLAG_METRICS)
+        self.has_keys = bool(flags & FLAG_KEYS)
+        self.epoch = self._column('epoch')
+        self.curses = self._column('curses')
+        self.word_index = self._column('word_index')
+        self.word_ids = self._column('word_ids')
+        self.text_index = self._column('text_index')
+        self.lengths = self._column('length')
+        # kind -> column of dictionary ids, and the dictionary
+        self.key_columns = {kind: self._column(kind) for kind in KEY_FIELDS}
+        self.key_names = json.loads(self._blob('keys')) if self.has_keys else {kind: [] for kind in KEY_FIELDS}
+        self.words = json.loads(self._blob('words') or b'[]')
+        extras = self._blob('extras')
+        self.extras = {int(key): value for key, value in json.loads(extras).items()} if extras else {}
+        
+        if len(self.epoch) != count or len(self.curses) != count or len(self.word_index) != count + 1 or len(self.words) != word_count \
+                or (self.has_text and len(self.text_index) != count + 1) \
+                or (self.has_metrics and (len(self.lengths) != count or self._sections['hash'][1] != count * HASH_SIZE)) \
+                or (self.has_keys and any(len(column) != count for column in self.key_columns.values())):
+            raise ArchiveError(f"{self.path}: column lengths don't match the header")
+    
+    def _column(self, name):
+        """Fixed-width column as a zero-copy memoryview (an array copy on big-endian machines)"""
+        start, length = self._sections[name]
+        view = self._view[start:start + length]
+        if sys.byteorder != 'little':
+            column = array(COLUMN_TYPES[name], view.tobytes())
+            column.byteswap()
+            view.release()
+            return column
+        self._views.append(view)
+        column = view.cast(COLUMN_TYPES[name])
+        self._views.append(column)
+        return column
+    
+    def _blob(self, name):
+        """Raw bytes of a variable-length section"""
+        start, length = self._sections[name]
+        return self._mmap[start:start + length]
+    
+    def close(self):
+        """Release the column views and unmap the file"""
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def __len__(self):
+        return self.count
+    
+    def found_curses(self, position):
+        """Indicator words of one record"""
+        words = self.words
+        word_ids = self.word_ids
+        return [words[word_ids[i]] for i in range(self.word_index[position], self.word_index[position + 1])]
+    
+    def prompt(self, position):
+        """Prompt text of one record ("" when the archive was written without text)"""
+        if not self.has_text:
+            return ""
+        start, _length = self._sections['text']
+        begin = start + self.text_index[position]
+        end = start + self.text_index[position + 1]
+        return self._mmap[begin:end].decode('utf-8', 'surrogatepass')
+    
+    def text_hash(self, position):
+        """Hex hash of the stored text of one metric record, or None"""
+        if not self.has_metrics:
+            return None
+        start = self._sections['hash'][0] + position * HASH_SIZE
+        raw = self._mmap[start:start + HASH_SIZE]
+        return raw.hex() if raw != _NO_HASH else None
+    
+    def record_key(self, kind, position):
+        """Session or project key of one record (UNKNOWN_KEY when it has none)"""
+        if not self.has_keys:
+            extra = self.extras.get(position)
+            value = extra[0].get(KEY_FIELDS[kind]) if extra is not None else None
+            return value if isinstance(value, str) and value else UNKNOWN_KEY
+        key_id = self.key_columns[kind][position]
+        return self.key_names[kind][key_id] if key_id != NO_KEY else UNKNOWN_KEY
+    
+    def _context(self, position):
+        """Session id and working directory fields of one record"""
+        context = {}
+        if self.has_keys:
+            for kind, field in KEY_FIELDS.items():
+                key_id = self.key_columns[kind][position]
+                if key_id != NO_KEY:
+                    context[field] = self.key_names[kind][key_id]
+        return context
+    
+    def entry(self, position):
+        """Full record as it appeared in the daily file"""
+        extra = self.extras.get(position)
+        if extra is None:
+            if self.has_metrics and self.lengths[position] != NO_LENGTH:
+                return metric_entry(from_epoch_us(self.epoch[position]), self.curses[position], self.found_curses(position),
+                                    self.lengths[position], self.text_hash(position), self._context(position))
+            entry = tracker_entry(from_epoch_us(self.epoch[position]), self.prompt(position),
+                                  self.curses[position], self.found_curses(position))
+            entry.update(self._context(position))
+            return entry
+        entry, has_prompt = extra
+        entry = dict(entry)
+        if has_prompt:
+            entry['prompt'] = self.prompt(position)
+        return entry
+    
+    def _positions(self, start_key=None, end_key=None):
+        """Record positions with an hour key in [start_key, end_key], compared as integers"""
+        low = key_to_epoch_us(start_key) if start_key else None
+        high = key_to_epoch_us(end_key) + HOUR_US if end_key else None
+        epoch = self.epoch
+        for position in range(self.count):
+            micros = epoch[position]
+            if low is not None and micros < low:
+                continue
+            if high is not None and micros >= high:
+                continue
+            yield position
+    
+    def iter_stats_entries(self, start_key=None, end_key=None):
+        """StatsRecords of the records in range, straight from the columns (prompt text is never touched)"""
+        epoch = self.epoch
+        curses = self.curses
+        for position in self._positions(start_key, end_key):
+            yield StatsRecord(epoch[position] // HOUR_US, curses[position], self.found_curses(position))
+    
+    def iter_keyed_entries(self, kind, match=None, start_key=None, end_key=None):
+        """
+        (key, StatsRecord) of the records in range whose session or project
+        key passes match (every record when match is None). match runs once
+        per dictionary entry; records are picked by their id in the column.
+        """
+        epoch = self.epoch
+        curses = self.curses
+        if not self.has_keys:
+            # Older archives only kept the keys of hook records, verbatim in the extras
+            for position in self._positions(start_key, end_key):
+                key = self.record_key(kind, position)
+                if match is None or match(key):
+                    yield key, StatsRecord(epoch[position] // HOUR_US, curses[position], self.found_curses(position))
+            return
+        
+        wanted = {key_id: name for key_id, name in enumerate(self.key_names[kind]) if match is None or match(name)}
+        if match is None or match(UNKNOWN_KEY):
+            wanted[NO_KEY] = UNKNOWN_KEY
+        if not wanted:
+            return
+        column = self.key_columns[kind]
+        for position in self._positions(start_key, end_key):
+            key = wanted.get(column[position])
+            if key is not None:
+                yield key, StatsRecord(epoch[position] // HOUR_US, curses[position], self.found_curses(position))
+    
+    def timestamp(self, position):
+        """ISO timestamp of one record"""
+        extra = self.extras.get(position)
+        if extra is not None:
+            return extra[0]['timestamp']
+        return from_epoch_us(self.epoch[position])
+    
+    def summarize(self, summary=None):
+        """
+        Per-file summary in the summary cache layout, built from the columns.
+        Hour 'first'/'end' are record positions rather than byte offsets.
+        """
+        if summary is None:
+            summary = new_summary()
+        epoch = self.epoch
+        curses = self.curses
+        word_index = self.word_index
+        word_ids = self.word_ids
+        
+        # hour number -> [prompts, curses, {word id: count}, first, end]
+        buckets = {}
+        current_hour = None
+        bucket = None
+        word_end = word_index[0] if self.count else 0
+        for position in range(self.count):
+            hour = epoch[position] // HOUR_US
+            if hour != current_hour:
+                current_hour = hour
+                bucket = buckets.get(hour)
+                if bucket is None:
+                    bucket = buckets[hour] = [0, 0, {}, position, position + 1]
+            bucket[0] += 1
+            bucket[1] += curses[position]
+            bucket[4] = position + 1
+            
+            word_start = word_end
+            word_end = word_index[position + 1]
+            if word_start != word_end:
+                counts = bucket[2]
+                for i in range(word_start, word_end):
+                    word_id = word_ids[i]
+                    counts[word_id] = counts.get(word_id, 0) + 1
+        
+        words = self.words
+        for hour, (prompts, curse_total, counts, first, end) in buckets.items():
+            named = {words[word_id]: count for word_id, count in counts.items()}
+            summary['hours'][hour_key_us(hour * HOUR_US)] = {
+                "prompts": prompts,
+                "curses": curse_total,
+                "words": named,
+                "first": first,
+                "end": end
+            }
+            summary['prompts'] += prompts
+            summary['curses'] += curse_total
+            for word, count in named.items():
+                summary['words'][word] = summary['words'].get(word, 0) + count
+        return summary
+    
+    def write_subset(self, path, positions, keep_text=True, keep_hashes=True):
+        """
+        Write the records at positions (ascending) to a new archive at path,
+        optionally without the text section or the text hashes. Columns are
+        copied slice by slice, so memory doesn't grow with the day and no
+        record is rebuilt. Returns the fsynced temp file next to path, for the
+        caller to rename into place once this archive is closed.
+        """
+        keep_text = keep_text and self.has_text
+        word_index = self.word_index
+        word_ids = self.word_ids
+        text_index = self.text_index
+        
+        # The dictionary only keeps the words the kept records use
+        used = set()
+        for position in positions:
+            used.update(word_ids[word_index[position]:word_index[position + 1]])
+        old_ids = sorted(used)
+        new_ids = {old_id: new_id for new_id, old_id in enumerate(old_ids)}
+        # So do the session and project dictionaries
+        key_names = {}
+        new_key_ids = {}
+        for kind, column in self.key_columns.items():
+            used = sorted({column[position] for position in positions} - {NO_KEY}) if self.has_keys else []
+            key_names[kind] = [self.key_names[kind][key_id] for key_id in used]
+            new_key_ids[kind] = {old_id: new_id for new_id, old_id in enumerate(used)}
+            new_key_ids[kind][NO_KEY] = NO_KEY
+        has_keys = any(key_names.values())
+        
+        extras = {}
+        for position, (entry, has_prompt) in self.extras.items():
+            new_position = bisect_left(positions, position)
+            if new_position < len(positions) and positions[new_position] == position:
+                if not keep_hashes and 'hash' in entry:
+                    entry = {key: value for key, value in entry.items() if key != 'hash'}
+                extras[str(new_position)] = [entry, has_prompt]
+        
+        def text():
+            start = self._sections['text'][0]
+            chunk = bytearray()
+            for position in positions:
+                chunk += self._mmap[start + text_index[position]:start + text_index[position + 1]]
+                if len(chunk) >= 8 * COPY_CHUNK:
+                    yield bytes(chunk)
+                    chunk = bytearray()
+            yield bytes(chunk)
+        
+        def hashes():
+            start = self._sections['hash'][0]
+            chunk = bytearray()
+            for position in positions:
+                chunk += self._mmap[start + position * HASH_SIZE:start + (position + 1) * HASH_SIZE] if keep_hashes else _NO_HASH
+                if len(chunk) >= HASH_SIZE * COPY_CHUNK:
+                    yield bytes(chunk)
+                    chunk = bytearray()
+            yield bytes(chunk)
+        
+        sections = {
+            'epoch': _chunks((self.epoch[position] for position in positions), 'q'),
+            'curses': _chunks((self.curses[position] for position in positions), 'I'),
+            'word_index': _chunks(_running_totals(word_index[position + 1] - word_index[position] for position in positions), 'I'),
+            'word_ids': _chunks((new_ids[word_ids[i]] for position in positions
+                                 for i in range(word_index[position], word_index[position + 1])), 'I'),
+            'words': [_encode(json.dumps([self.words[old_id] for old_id in old_ids], ensure_ascii=False))],
+            'text_index': _chunks(_running_totals(text_index[position + 1] - text_index[position] for position in positions), 'Q')
+                          if keep_text else [],
+            'text': text() if keep_text else [],
+            'extras': [_encode(json.dumps(extras, ensure_ascii=False))] if extras else [],
+            'length': _chunks((self.lengths[position] for position in positions), 'I') if self.has_metrics else [],
+            'hash': hashes() if self.has_metrics else [],
+            'session': _chunks((new_key_ids['session'][self.key_columns['session'][position]] for position in positions), 'I')
+                       if has_keys else [],
+            'project': _chunks((new_key_ids['project'][self.key_columns['project'][position]] for position in positions), 'I')
+                       if has_keys else [],
+            'keys': [_encode(json.dumps(key_names, ensure_ascii=False))] if has_keys else []
+        }
+        
+        table_struct = _TABLES[ARCHIVE_VERSION]
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                # The table is filled in once every section's place is known
+                offset = _HEADER.size + table_struct.size
+                f.write(bytes(offset))
+                table = []
+                for name in SECTIONS:
+                    padding = -offset % 8
+                    f.write(b'\0' * padding)
+                    offset += padding
+                    start = offset
+                    for chunk in sections[name]:
+                        f.write(chunk)
+                        offset += len(chunk)
+                    table += [start, offset - start]
+                
+                flags = (FLAG_TEXT if keep_text else 0) | (FLAG_METRICS if self.has_metrics else 0) | (FLAG_KEYS if has_keys else 0)
+                f.seek(0)
+                f.write(_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, flags, len(positions), len(old_ids)))
+                f.write(table_struct.pack(*table))
+                f.flush()
+                os.fsync(f.fileno())
+            return tmp_path
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+def archive_record_count(file_path):
+    """Number of records in an archive, from its header alone"""
+    with open(file_path, 'rb') as f:
+        header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise ArchiveError(f"{file_path}: truncated archive")
+    magic, _version, _flags, count, _word_count = _HEADER.unpack(header)
+    if magic != ARCHIVE_MAGIC:
+        raise ArchiveError(f"{file_path}: not an archive")
+    return count
+
+def summarize_archive(file_path):
+    """Summary cache entry for an archive (the whole file always counts as consumed)"""
+    st = os.stat(file_path)
+    try:
+        with PromptArchive(file_path) as archive:
+            summary = archive.summarize()
+    except (ArchiveError, ValueError, KeyError, TypeError) as e:
+        raise SummaryParseError(new_summary(), e)
+    summary['size'] = st.st_size
+    summary['mtime_ns'] = st.st_mtime_ns
+    summary['offset'] = st.st_size
+    return summary
+
+def iter_archive_entries(file_path, start_key=None, end_key=None):
+    """Stream StatsRecords of an archive's records in [start_key, end_key]"""
+    with PromptArchive(file_path) as archive:
+        yield from archive.iter_stats_entries(start_key, end_key)
+
+def archive_path_for(file_path):
+    """Archive path for a daily JSONL file (compressed or not)"""
+    return data_file_stem(file_path) + ARCHIVE_SUFFIX
+
+def jsonl_path_for(file_path):
+    """Daily JSONL path for an archive"""
+    return file_path[:-len(ARCHIVE_SUFFIX)] + DATA_FILE_SUFFIX
+
+def read_jsonl_entries(file_path):
+    """All entries of a closed daily file; an unterminated last line means it isn't closed"""
+    entries = []
+    with open_data_file(file_path) as f:
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                raise ArchiveError(f"{file_path}: last line is incomplete")
+            line = raw.decode('utf-8')
+            if line.strip():
+                entries.append(json.loads(line))
+    return entries
+
+def write_atomic(path, data):
+    """Write a file via a temp file, fsync and rename"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def forget_caches(*file_paths):
+    """Drop the cached summaries and session/project index of data files that were replaced"""
+    for file_path in file_paths:
+        data_dir = os.path.dirname(file_path)
+        SummaryCache(data_dir).forget(file_path)
+        KeyIndex(data_dir).forget(file_path)
+
+def compact_file(file_path, keep_text=True, keep_source=False):
+    """
+    Convert one closed daily file into an archive, verify it exports the
+    same records, then remove the JSONL (unless keep_source).
+    Returns (records, JSONL bytes, archive bytes).
+    """
+    st = os.stat(file_path)
+    try:
+        entries = read_jsonl_entries(file_path)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise ArchiveError(f"{file_path}: {e}")
+    data = build_archive(entries, keep_text)
+    
+    archive_path = archive_path_for(file_path)
+    write_atomic(archive_path, data)
+    try:
+        with PromptArchive(archive_path) as archive:
+            for position, entry in enumerate(entries):
+                exported = archive.entry(position)
+                if not keep_text and 'prompt' in entry:
+                    exported['prompt'] = entry['prompt']
+                if json.dumps(exported, ensure_ascii=False) != json.dumps(entry, ensure_ascii=False):
+                    raise ArchiveError(f"{file_path}: record {position} doesn't round-trip")
+        
+        current = os.stat(file_path)
+        if (current.st_size, current.st_mtime_ns) != (st.st_size, st.st_mtime_ns):
+            raise ArchiveError(f"{file_path}: changed while compacting")
+    except BaseException:
+        os.remove(archive_path)
+        raise
+    
+    if not keep_source:
+        os.remove(file_path)
+        forget_caches(file_path)
+    return len(entries), st.st_size, len(data)
+
+def compactable_files(data_dir=None, before=None):
+    """Closed daily JSONL files (dated before `before`, default today) that aren't archived yet"""
+    before = before or date.today()
+    now = time.time()
+    selected = []
+    for file_path in list_data_files(data_dir):
+        if is_archive(file_path):
+            continue
+        day = file_date(file_path)
+        if day is None or day >= before:
+            continue
+        try:
+            if now - os.path.getmtime(file_path) < COMPACT_MIN_AGE:
+                continue
+        except OSError:
+            continue
+        selected.append(file_path)
+    return selected
+
+def export_archive(file_path, out):
+    """Write an archive's records to a text stream as JSONL, as the tracker wrote them"""
+    with PromptArchive(file_path) as archive:
+        for position in range(archive.count):
+            line = json.dumps(archive.entry(position), ensure_ascii=False)
+            try:
+                line.encode('utf-8')
+            except UnicodeEncodeError:
+                # Lone surrogates only survive as \u escapes
+                line = json.dumps(archive.entry(position))
+            out.write(line + '\n')
+
+def restore_archive(file_path):
+    """Turn an archive back into its daily JSONL file and remove the archive"""
+    jsonl_path = jsonl_path_for(file_path)
+    if os.path.exists(jsonl_path):
+        raise ArchiveError(f"{jsonl_path} already exists")
+    tmp_path = f"{jsonl_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        export_archive(file_path, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, jsonl_path)
+    os.remove(file_path)
+    forget_caches(file_path, jsonl_path)
+    return jsonl_path
+
+# Command line support
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else None
+    
+    if command == "compact":
+        keep_text = '--no-text' not in args
+        keep_source = '--keep-jsonl' in args
+        before = None
+        if '--before' in args:
+            before = datetime.strptime(args[args.index('--before') + 1], "%Y-%m-%d").date()
+        
+        totals = [0, 0, 0]
+        for path in compactable_files(get_data_dir(), before):
+            try:
+                records, old_size, new_size = compact_file(path, keep_text, keep_source)
+            except (ArchiveError, OSError) as e:
+                print(f"Skipped {os.path.basename(path)}: {e}")
+                continue
+            totals = [totals[0] + records, totals[1] + old_size, totals[2] + new_size]
+            print(f"Compacted {os.path.basename(path)}: {records} records, {old_size} -> {new_size} bytes")
+        print(f"Total: {totals[0]} records, {totals[1]} -> {totals[2]} bytes")
+    elif command == "export" and len(args) > 1:
+        if len(args) > 2:
+            with open(args[2], 'w', encoding='utf-8') as f:
+                export_archive(args[1], f)
+        else:
+            export_archive(args[1], sys.stdout)
+    elif command == "restore":
+        for path in args[1:] or [p for p in list_data_files(get_data_dir()) if is_archive(p)]:
+            print(f"Restored {os.path.basename(restore_archive(path))}")
+    elif command == "info" and len(args) > 1:
+        with PromptArchive(args[1]) as archive:
+            print(f"Records: {archive.count}")
+            print(f"Indicator words: {len(archive.words)}")
+            print(f"Prompt text: {'yes' if archive.has_text else 'no'}")
+            print(f"Metric records: {sum(1 for length in archive.lengths if length != NO_LENGTH)}")
+            print(f"Sessions: {len(archive.key_names['session'])}, projects: {len(archive.key_names['project'])}")
+            print(f"Verbatim records: {len(archive.extras)}")
+    else:
+        print("Usage: python3 archive.py compact [--before YYYY-MM-DD] [--no-text] [--keep-jsonl]")
+        print("       python3 archive.py export <archive> [output.jsonl]")
+        print("       python3 archive.py restore [archive...]")
+        print("       python3 archive.py info <archive>")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Contention stress benchmark for daily-file appends
+Starts N writer processes that append records of mixed sizes (some well over
+PIPE_BUF) to one shared daily file as fast as they can, then measures the
+throughput and checks every line: each record must come back whole and
+exactly once. --naive also runs the old buffered text-mode append for
+comparison.
+
+Usage: python3 benchmarks/concurrent_appends.py [--writers 8] [--records 2000] [--naive]
+"""
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from prompt_store import ATOMIC_APPEND_SIZE, append_record, parse_record
+
+# Prompt lengths cycled through by every writer - from tiny to several PIPE_BUFs
+PROMPT_SIZES = [40, 200, 1500, ATOMIC_APPEND_SIZE - 300, ATOMIC_APPEND_SIZE * 2, ATOMIC_APPEND_SIZE * 8]
+
+def record(writer, sequence):
+    """One tracker-shaped record, identifiable by writer and sequence number"""
+    size = PROMPT_SIZES[sequence % len(PROMPT_SIZES)]
+    return {
+        "timestamp": "2026-01-01T12:00:00.000000",
+        "prompt": f"{writer}:{sequence} " + "damn " * (size // 5),
+        "curse_count": 1,
+        "found_curses": ["damn"],
+        "date": "2026-01-01",
+        "hour": 12
+    }
+
+def write_atomic(path, writer, records, start_event):
+    """Writer process using the tracker's append_record"""
+    start_event.wait()
+    for sequence in range(records):
+        append_record(path, (json.dumps(record(writer, sequence)) + '\n').encode('utf-8'))
+
+def write_naive(path, writer, records, start_event):
+    """Writer process appending through a buffered text file, like the tracker used to"""
+    start_event.wait()
+    for sequence in range(records):
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record(writer, sequence)) + '\n')
+
+def verify(path, writers, records):
+    """(whole records, torn lines, missing records, duplicated records)"""
+    seen = {}
+    torn = 0
+    with open(path, 'rb') as f:
+        for raw in f:
+            entry = parse_record(raw)
+            if entry is None:
+                torn += 1
+                continue
+            key = entry['prompt'].split(' ', 1)[0]
+            seen[key] = seen.get(key, 0) + 1
+    expected = writers * records
+    duplicated = sum(count - 1 for count in seen.values() if count > 1)
+    return sum(seen.values()), torn, expected - len(seen), duplicated
+
+def run(mode, writers, records, root):
+    """Run one mode and return its result"""
+    path = os.path.join(root, f"prompts_{mode}.jsonl")
+    target = write_atomic if mode == 'atomic' else write_naive
+    start_event = multiprocessing.Event()
+    processes = [multiprocessing.Process(target=target, args=(path, writer, records, start_event)) for writer in range(writers)]
+    for process in processes:
+        process.start()
+    
+    start = time.perf_counter()
+    start_event.set()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+    
+    whole, torn, missing, duplicated = verify(path, writers, records)
+    return {
+        "mode": mode, "writers": writers, "records": writers * records,
+        "seconds": elapsed, "records_per_second": writers * records / elapsed,
+        "mb_per_second": os.path.getsize(path) / elapsed / (1024 * 1024),
+        "whole": whole, "torn": torn, "missing": missing, "duplicated": duplicated
+    }
+
+def main():
+    """Main entry point"""
+    args = sys.argv[1:]
+    writers = int(args[args.index('--writers') + 1]) if '--writers' in args else 8
+    records = int(args[args.index('--records') + 1]) if '--records' in args else 2000
+    modes = ['atomic', 'naive'] if '--naive' in args else ['atomic']
+    
+    root = tempfile.mkdtemp(prefix='biomass-appends-')
+    results = []
+    failed = False
+    try:
+        print(f"{'mode':>8} {'writers':>8} {'records/s':>10} {'MB/s':>7} {'torn':>6} {'missing':>8} {'dupes':>6}")
+        for mode in modes:
+            result = run(mode, writers, records, root)
+            results.append(result)
+            print(f"{mode:>8} {writers:>8} {result['records_per_second']:>10.0f} {result['mb_per_second']:>7.1f} "
+                  f"{result['torn']:>6} {result['missing']:>8} {result['duplicated']:>6}")
+            if mode == 'atomic' and (result['torn'] or result['missing'] or result['duplicated']):
+                failed = True
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    
+    print(json.dumps({"benchmark": "concurrent_appends", "pipe_buf": ATOMIC_APPEND_SIZE, "results": results}))
+    if failed:
+        print("Corruption with atomic appends!", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
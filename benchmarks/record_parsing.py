@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Record parsing benchmark for the stats loader
+Generates synthetic daily lines and times three ways of turning them into
+what the stats need: full json.loads into a dict (the old loader), the
+projecting fast path (project_record) on tracker-layout lines, and the
+fallback it takes for lines in any other key order.
+
+Usage: python3 benchmarks/record_parsing.py [--records 200000] [--mean-length 400]
+"""
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from synthetic import DEFAULT_INDICATORS, _FILLER_TEXT
+from prompt_store import StatsRecord, parse_record, project_record
+
+def make_lines(records, mean_length, shuffled=False):
+    """Tracker-shaped JSONL lines (or the same fields in another key order)"""
+    rng = random.Random(0)
+    start = datetime(2026, 1, 1)
+    lines = []
+    for position in range(records):
+        ts = start + timedelta(seconds=position * 37)
+        length = min(len(_FILLER_TEXT), int(rng.expovariate(1 / mean_length)) + 1)
+        offset = rng.randrange(len(_FILLER_TEXT) - length + 1)
+        found = rng.sample(DEFAULT_INDICATORS, rng.randrange(3))
+        entry = {
+            "timestamp": ts.isoformat(),
+            "prompt": _FILLER_TEXT[offset:offset + length],
+            "curse_count": len(found),
+            "found_curses": found,
+            "date": ts.strftime("%Y-%m-%d"),
+            "hour": ts.hour
+        }
+        if shuffled:
+            entry = dict(reversed(list(entry.items())))
+        lines.append((json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8'))
+    return lines
+
+def full_parse(lines):
+    """The old loader: parse everything, then build the projected dict"""
+    for raw in lines:
+        entry = parse_record(raw)
+        StatsRecord.from_entry(entry)
+
+def projected(lines):
+    """The stats loader's projection"""
+    for raw in lines:
+        project_record(raw)
+
+def timed(function, lines):
+    """Best of three runs, in seconds"""
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        function(lines)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    """Main entry point"""
+    args = sys.argv[1:]
+    records = int(args[args.index('--records') + 1]) if '--records' in args else 200000
+    mean_length = int(args[args.index('--mean-length') + 1]) if '--mean-length' in args else 400
+    
+    tracker_lines = make_lines(records, mean_length)
+    other_lines = make_lines(records, mean_length, shuffled=True)
+    results = []
+    for name, function, lines in [('full-parse', full_parse, tracker_lines),
+                                  ('projected', projected, tracker_lines),
+                                  ('fallback', projected, other_lines)]:
+        seconds = timed(function, lines)
+        results.append({"mode": name, "records": records, "seconds": seconds, "records_per_second": records / seconds})
+        print(f"{name:>11} {records / seconds:>12.0f} records/s")
+    print(json.dumps({"benchmark": "record_parsing", "mean_length": mean_length, "results": results}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Report latency benchmark: JSONL files vs the SQLite storage backend
+Generates a synthetic history for each size, migrates it into SQLite and
+times a full daily report and a last-30-days weekly report through the
+streaming JSONL loader, the warm summary cache and the SQL aggregates.
+
+Usage: python3 benchmarks/storage_backends.py [--sizes 10000,1000000,10000000] [--per-day 1000]
+"""
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from synthetic import generate
+from sqlite_store import SQLiteStore
+from summary_cache import SummaryCache
+
+REPO_DIR = Path(__file__).parent.parent
+
+def load_stats_module():
+    """Import templates/curse-stats.py (not a valid module name)"""
+    spec = importlib.util.spec_from_file_location("curse_stats", REPO_DIR / 'templates' / 'curse-stats.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def timed(func):
+    """Seconds taken by func() and its result"""
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def main():
+    """Main entry point"""
+    args = sys.argv[1:]
+    sizes = [10000, 1000000, 10000000]
+    per_day = 1000
+    if '--sizes' in args:
+        sizes = [int(size) for size in args[args.index('--sizes') + 1].split(',')]
+    if '--per-day' in args:
+        per_day = int(args[args.index('--per-day') + 1])
+    
+    stats_module = load_stats_module()
+    root = tempfile.mkdtemp(prefix='biomass-storage-')
+    results = []
+    try:
+        print(f"{'prompts':>10} {'report':>10} {'jsonl':>8} {'cached':>8} {'sqlite':>8} {'migrate':>8}")
+        for size in sizes:
+            data_dir = os.path.join(root, f"data_{size}")
+            os.environ['BIOMASS_DATA_DIR'] = data_dir
+            os.environ['BIOMASS_CACHE_DIR'] = os.path.join(root, f"cache_{size}")
+            days = max(1, size // per_day)
+            generate(data_dir, days, min(per_day, size), mean_length=100)
+            
+            store = SQLiteStore(os.path.join(data_dir, 'prompts.sqlite3'))
+            migrate_seconds, _ = timed(lambda: store.migrate(data_dir))
+            # Warm the summary cache so "cached" measures the steady state
+            SummaryCache(data_dir).summaries()
+            
+            last_30 = datetime.now().date() - timedelta(days=30)
+            reports = [("daily", None), ("weekly", last_30)]
+            for period, start in reports:
+                jsonl_seconds, jsonl_stats = timed(
+                    lambda: stats_module.calculate_stats(stats_module.load_prompt_data(start), period))
+                cached_seconds, _ = timed(lambda: stats_module.load_cached_stats([period], start))
+                sqlite_seconds, sqlite_stats = timed(lambda: store.calculate_stats(period, start))
+                if sqlite_stats['total_prompts'] != jsonl_stats['total_prompts']:
+                    raise SystemExit(f"SQLite and JSONL disagree at {size} prompts ({period})")
+                
+                name = period if start is None else f"{period}/30d"
+                result = {
+                    "prompts": size, "report": name, "jsonl_seconds": jsonl_seconds,
+                    "cached_seconds": cached_seconds, "sqlite_seconds": sqlite_seconds,
+                    "migrate_seconds": migrate_seconds
+                }
+                results.append(result)
+                print(f"{size:>10} {name:>10} {jsonl_seconds:>8.3f} {cached_seconds:>8.3f} "
+                      f"{sqlite_seconds:>8.3f} {migrate_seconds:>8.2f}")
+            
+            store.close()
+            # Only one data dir on disk at a time
+            shutil.rmtree(data_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    
+    print(json.dumps({"benchmark": "storage_backends", "results": results}))
+
+if __name__ == "__main__":
+    main()
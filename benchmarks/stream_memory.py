@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for the curse-stats loading pipeline
+Generates synthetic data dirs of growing size and records the peak RSS of a
+full --no-cache report over each one. With the streaming pipeline the peak
+stays flat; --compare-list also runs the old materialize-everything approach.
+
+Usage: python3 benchmarks/stream_memory.py [--max-mb 2048] [--steps 4] [--compare-list]
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from synthetic import generate
+
+REPO_DIR = Path(__file__).parent.parent
+STATS_SCRIPT = REPO_DIR / 'templates' / 'curse-stats.py'
+
+# Runs in a child process so each measurement starts from a clean heap
+CHILD_CODE = r'''
+import importlib.util, json, resource, sys, time
+spec = importlib.util.spec_from_file_location("curse_stats", sys.argv[1])
+stats_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(stats_module)
+start = time.perf_counter()
+data = stats_module.load_prompt_data(use_index=False)
+if sys.argv[2] == "list":
+    data = list(data)
+stats = stats_module.calculate_stats(data, "daily")
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":
+    rss //= 1024
+print(json.dumps({"prompts": stats["total_prompts"], "seconds": elapsed, "peak_rss_kb": rss}))
+'''
+
+def measure(data_dir, mode):
+    """Run one report in a child process and return its measurements"""
+    env = dict(os.environ, BIOMASS_DATA_DIR=data_dir)
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_CODE, str(STATS_SCRIPT), mode],
+        env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    """Main entry point"""
+    args = sys.argv[1:]
+    max_mb = 2048
+    steps = 4
+    if '--max-mb' in args:
+        max_mb = int(args[args.index('--max-mb') + 1])
+    if '--steps' in args:
+        steps = int(args[args.index('--steps') + 1])
+    compare_list = '--compare-list' in args
+    
+    # ~1 KB per prompt at mean_length=800, 1000 prompts/day -> ~1 MB/day
+    mean_length = 800
+    prompts_per_day = 1000
+    bytes_per_day = prompts_per_day * (mean_length + 200)
+    
+    root = tempfile.mkdtemp(prefix='biomass-bench-')
+    results = []
+    try:
+        print(f"{'data':>10} {'prompts':>10} {'mode':>7} {'seconds':>8} {'peak RSS':>10}")
+        for step in range(steps):
+            size_mb = max_mb / (2 ** (steps - step - 1))
+            days = max(1, int(size_mb * 1024 * 1024 / bytes_per_day))
+            data_dir = os.path.join(root, f"data_{step}")
+            _files, total_bytes = generate(data_dir, days, prompts_per_day, mean_length)
+            
+            modes = ['stream', 'list'] if compare_list else ['stream']
+            for mode in modes:
+                result = measure(data_dir, mode)
+                result.update(mode=mode, data_mb=total_bytes / (1024 * 1024))
+                results.append(result)
+                print(f"{result['data_mb']:>8.0f}MB {result['prompts']:>10} {mode:>7} "
+                      f"{result['seconds']:>8.2f} {result['peak_rss_kb'] / 1024:>8.1f}MB")
+            
+            # Only one data dir on disk at a time
+            shutil.rmtree(data_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    
+    print(json.dumps({"benchmark": "stream_memory", "results": results}))
+
+if __name__ == "__main__":
+    main()
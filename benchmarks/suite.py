@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the Biomass Conversion Index Monitoring System
+Generates a synthetic history and measures:
+  - prompt-tracker.py end-to-end hook latency (p50/p99, in-process and daemon)
+  - count_curse_words throughput on small and huge prompts
+  - curse-stats.py report time per period and range (cached and --no-cache)
+  - digital-amnesia.py count_evidence time
+Results are written as JSON (with the git commit) so runs can be compared.
+
+Usage: python3 benchmarks/suite.py [--quick] [--output results.json] [--compare baseline.json]
+                                   [--days 90] [--per-day 200] [--hook-runs 50] [--locales en]
+"""
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from synthetic import DEFAULT_INDICATORS, _FILLER_TEXT, generate
+
+REPO_DIR = Path(__file__).parent.parent
+TEMPLATES_DIR = REPO_DIR / 'templates'
+
+# Reports timed per period and range
+REPORT_PERIODS = ['daily', 'weekly', 'monthly', 'hourly', 'all']
+REPORT_RANGES = [('full', []), ('last-7', ['--last', '7']), ('last-1', ['--last', '1'])]
+
+def load_script(name):
+    """Import a templates/*.py script (hyphenated names aren't importable)"""
+    spec = importlib.util.spec_from_file_location(name.replace('-', '_'), TEMPLATES_DIR / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def git_commit():
+    """Current commit of the repo, or None outside git"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def result(name, value, unit, **params):
+    """One machine-readable measurement"""
+    return {"name": name, "value": value, "unit": unit, "params": params}
+
+def bench_hook_latency(env, runs, daemon=False):
+    """Wall time of the tracker hook per prompt, as Claude Code would run it"""
+    env = dict(env, BIOMASS_TRACKER_DAEMON='1' if daemon else '0', BIOMASS_TRACKER_IDLE_TIMEOUT='5')
+    command = [sys.executable, str(TEMPLATES_DIR / 'prompt-tracker.py')]
+    prompt = "why does this damn build fail again " * 4
+    
+    # The first runs start the daemon and warm the OS caches
+    for _ in range(3):
+        subprocess.run(command, input=prompt, env=env, capture_output=True, text=True, check=True)
+        time.sleep(0.1 if daemon else 0)
+    
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, input=prompt, env=env, capture_output=True, text=True, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    
+    mode = 'daemon' if daemon else 'in-process'
+    return [
+        result('hook_latency_p50', percentile(timings, 0.50), 'ms', mode=mode, runs=runs),
+        result('hook_latency_p99', percentile(timings, 0.99), 'ms', mode=mode, runs=runs)
+    ]
+
+def bench_count_curse_words(quick):
+    """count_curse_words throughput with the installed and a synthetic indicator vocabulary"""
+    import matcher
+    tracker = load_script('prompt-tracker')
+    small = [_FILLER_TEXT[i:i + 120] + " damn" for i in range(0, 120000, 120)]
+    huge = (_FILLER_TEXT + " walnut ") * (10 if quick else 50)
+    
+    results = []
+    vocabularies = [
+        ('installed', matcher.get_matcher()),
+        ('synthetic', matcher.IndicatorMatcher.from_indicators(DEFAULT_INDICATORS + ['frak*', 'absolute walnut']))
+    ]
+    for vocabulary, indicator_matcher in vocabularies:
+        matcher._matcher = indicator_matcher
+        
+        start = time.perf_counter()
+        for text in small:
+            tracker.count_curse_words(text)
+        elapsed = time.perf_counter() - start
+        results.append(result('count_curse_words_small', len(small) / elapsed, 'prompts/s',
+                              vocabulary=vocabulary, prompt_chars=125))
+        
+        start = time.perf_counter()
+        tracker.count_curse_words(huge)
+        elapsed = time.perf_counter() - start
+        results.append(result('count_curse_words_huge', len(huge) / elapsed / (1024 * 1024), 'MB/s',
+                              vocabulary=vocabulary, prompt_chars=len(huge)))
+    matcher._matcher = None
+    return results
+
+def bench_reports(env, repeats):
+    """End-to-end curse-stats.py time per period, range and cache mode (median of repeats)"""
+    results = []
+    command = [sys.executable, str(TEMPLATES_DIR / 'curse-stats.py')]
+    # Warm the summary cache once so "cached" measures the steady state
+    subprocess.run(command, env=env, capture_output=True, check=True)
+    
+    for mode, extra in [('cached', []), ('no-cache', ['--no-cache'])]:
+        for period in REPORT_PERIODS:
+            for range_name, range_args in REPORT_RANGES:
+                timings = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    subprocess.run(command + [period] + range_args + extra, env=env, capture_output=True, check=True)
+                    timings.append((time.perf_counter() - start) * 1000)
+                results.append(result('report_time', sorted(timings)[len(timings) // 2], 'ms',
+                                      period=period, range=range_name, mode=mode))
+    return results
+
+def bench_count_evidence(repeats):
+    """digital-amnesia.py count_evidence time (median of repeats)"""
+    amnesia = load_script('digital-amnesia')
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        amnesia.count_evidence()
+        timings.append((time.perf_counter() - start) * 1000)
+    return [result('count_evidence_time', sorted(timings)[len(timings) // 2], 'ms')]
+
+def compare(results, baseline_path):
+    """Print the change of every measurement against a previous results file"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    
+    def key(item):
+        return item['name'], json.dumps(item['params'], sort_keys=True)
+    
+    previous = {key(item): item for item in baseline['results']}
+    print(f"\nCompared with {baseline['meta'].get('commit')} ({baseline_path}):")
+    for item in results:
+        old = previous.get(key(item))
+        if old is None or not old['value']:
+            continue
+        change = (item['value'] - old['value']) / old['value'] * 100
+        params = ' '.join(f"{name}={value}" for name, value in item['params'].items())
+        print(f"  {item['name']:<26} {params:<40} {old['value']:>10.2f} -> {item['value']:>10.2f} {item['unit']:<10} {change:+6.1f}%")
+
+def main():
+    """Main entry point"""
+    args = sys.argv[1:]
+    
+    def option(flag, default):
+        return args[args.index(flag) + 1] if flag in args else default
+    
+    quick = '--quick' in args
+    days = int(option('--days', 14 if quick else 90))
+    per_day = int(option('--per-day', 50 if quick else 200))
+    hook_runs = int(option('--hook-runs', 10 if quick else 50))
+    repeats = 1 if quick else 3
+    locales = option('--locales', None)
+    output = option('--output', None)
+    baseline = option('--compare', None)
+    
+    root = tempfile.mkdtemp(prefix='biomass-suite-')
+    data_dir = os.path.join(root, 'data')
+    env = dict(os.environ, BIOMASS_DATA_DIR=data_dir, BIOMASS_CACHE_DIR=os.path.join(root, 'cache'))
+    env.pop('BIOMASS_STORAGE', None)
+    saved_env = {name: os.environ.get(name) for name in ('BIOMASS_DATA_DIR', 'BIOMASS_CACHE_DIR')}
+    os.environ.update(BIOMASS_DATA_DIR=env['BIOMASS_DATA_DIR'], BIOMASS_CACHE_DIR=env['BIOMASS_CACHE_DIR'])
+    
+    results = []
+    try:
+        files, size = generate(data_dir, days, per_day, locales=locales.split(',') if locales else None)
+        print(f"Synthetic history: {files} days, {days * per_day} prompts, {size / (1024 * 1024):.1f} MB")
+        
+        sections = [
+            ('hook latency (in-process)', lambda: bench_hook_latency(env, hook_runs)),
+            ('hook latency (daemon)', lambda: bench_hook_latency(env, hook_runs, daemon=True)),
+            ('count_curse_words', lambda: bench_count_curse_words(quick)),
+            ('reports', lambda: bench_reports(env, repeats)),
+            ('count_evidence', lambda: bench_count_evidence(repeats))
+        ]
+        for title, bench in sections:
+            print(f"\n{title}:")
+            for item in bench():
+                params = ' '.join(f"{name}={value}" for name, value in item['params'].items())
+                print(f"  {item['name']:<26} {params:<40} {item['value']:>10.2f} {item['unit']}")
+                results.append(item)
+    finally:
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        shutil.rmtree(root, ignore_errors=True)
+    
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "days": days,
+            "prompts_per_day": per_day,
+            "quick": quick
+        },
+        "results": results
+    }
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {output}")
+    if baseline:
+        compare(results, baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Synthetic prompt data generator for Biomass Conversion Index benchmarks
+Writes prompts_YYYY-MM-DD.jsonl files shaped like the ones save_prompt_data writes
+"""
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+LOCALES_DIR = Path(__file__).parent.parent / 'locales'
+
+DEFAULT_INDICATORS = ['damn', 'hell', 'crap', 'bloody', 'muppet', 'donkey', 'walnut']
+FILLER_WORDS = ['please', 'fix', 'the', 'build', 'again', 'why', 'does', 'this', 'test', 'fail',
+                'component', 'render', 'state', 'hook', 'deploy', 'server', 'null', 'undefined']
+
+# Long run of filler text that prompts are sliced from (much faster than joining words per prompt)
+_filler_rng = random.Random(0)
+_FILLER_TEXT = ' '.join(_filler_rng.choice(FILLER_WORDS) for _ in range(20000))
+
+# Prompt length distributions (mean_length is the mean for each)
+LENGTH_DISTRIBUTIONS = ['exponential', 'uniform', 'fixed']
+
+def load_locale_indicators(langs):
+    """Indicator words from locales/<lang>.json (prefix stems lose their '*'); [] if none are defined"""
+    indicators = []
+    for lang in langs:
+        try:
+            with open(LOCALES_DIR / f"{lang}.json", 'r', encoding='utf-8') as f:
+                words = json.load(f).get('indicators', {}).get('curse_words', [])
+        except (json.JSONDecodeError, IOError):
+            continue
+        for word in words:
+            if isinstance(word, str) and word.rstrip('*') and word.rstrip('*') not in indicators:
+                indicators.append(word.rstrip('*'))
+    return indicators
+
+def prompt_length(rng, mean_length, distribution):
+    """Draw a prompt length"""
+    if distribution == 'fixed':
+        return mean_length
+    if distribution == 'uniform':
+        return rng.randint(10, max(10, 2 * mean_length - 10))
+    # Long-tailed lengths: mostly short prompts, the occasional pasted log
+    return int(rng.expovariate(1.0 / mean_length)) + 10
+
+def make_prompt(rng, length, found):
+    """Build prompt text of roughly `length` characters containing the found indicators"""
+    length = min(length, len(_FILLER_TEXT) - 1)
+    start = rng.randrange(len(_FILLER_TEXT) - length)
+    text = _FILLER_TEXT[start:start + length]
+    if found:
+        return f"{' '.join(found)} {text}"
+    return text
+
+def generate(data_dir, days=30, prompts_per_day=100, mean_length=200, breach_rate=0.3,
+             indicators=None, end_date=None, seed=1, distribution='exponential', locales=None):
+    """
+    Generate a synthetic history ending at end_date (default today).
+    Indicators come from `indicators`, else the given locales' lists, else DEFAULT_INDICATORS.
+    Returns (files written, total bytes).
+    """
+    rng = random.Random(seed)
+    indicators = indicators or (load_locale_indicators(locales) if locales else None) or DEFAULT_INDICATORS
+    end_date = end_date or datetime.now().date()
+    os.makedirs(data_dir, exist_ok=True)
+    
+    files = 0
+    total_bytes = 0
+    for day_offset in range(days - 1, -1, -1):
+        day = end_date - timedelta(days=day_offset)
+        midnight = datetime(day.year, day.month, day.day)
+        seconds = sorted(rng.randrange(86400) for _ in range(prompts_per_day))
+        lines = []
+        for second in seconds:
+            ts = midnight + timedelta(seconds=second, microseconds=rng.randrange(1000000))
+            found = []
+            if rng.random() < breach_rate:
+                found = [rng.choice(indicators) for _ in range(rng.randint(1, 3))]
+            length = prompt_length(rng, mean_length, distribution)
+            entry = {
+                "timestamp": ts.isoformat(),
+                "prompt": make_prompt(rng, length, found),
+                "curse_count": len(found),
+                "found_curses": found,
+                "date": day.strftime("%Y-%m-%d"),
+                "hour": ts.hour
+            }
+            lines.append(json.dumps(entry, ensure_ascii=False) + '\n')
+        
+        file_path = os.path.join(data_dir, f"prompts_{day.strftime('%Y-%m-%d')}.jsonl")
+        data = ''.join(lines).encode('utf-8')
+        with open(file_path, 'wb') as f:
+            f.write(data)
+        files += 1
+        total_bytes += len(data)
+    
+    return files, total_bytes
+
+# Command line support
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {}
+    for flag in ['--breach-rate', '--distribution', '--locales', '--seed']:
+        if flag in args:
+            position = args.index(flag)
+            options[flag] = args[position + 1]
+            del args[position:position + 2]
+    
+    if not args:
+        print("Usage: python3 benchmarks/synthetic.py <data_dir> [days] [prompts_per_day] [mean_length]")
+        print("       [--breach-rate 0.3] [--distribution exponential|uniform|fixed] [--locales en,es] [--seed 1]")
+        sys.exit(1)
+    
+    target = args[0]
+    n_days = int(args[1]) if len(args) > 1 else 30
+    per_day = int(args[2]) if len(args) > 2 else 100
+    length = int(args[3]) if len(args) > 3 else 200
+    written, size = generate(
+        target, n_days, per_day, length,
+        breach_rate=float(options.get('--breach-rate', 0.3)),
+        seed=int(options.get('--seed', 1)),
+        distribution=options.get('--distribution', 'exponential'),
+        locales=options['--locales'].split(',') if '--locales' in options else None
+    )
+    print(f"Wrote {written} files ({size / (1024 * 1024):.1f} MB) to {target}")
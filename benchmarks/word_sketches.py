@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Word sketch benchmark for the rollup
+Streams synthetic records with a large Zipf-distributed indicator
+vocabulary through the hourly rollup twice: with exact Counters and with
+--sketch counters (Space-Saving per bucket, Count-Min for the report).
+Reports peak traced memory, time, and how many period buckets list a
+different top 3 than the exact run.
+
+Usage: python3 benchmarks/word_sketches.py [--days 730] [--per-day 200] [--vocabulary 20000] [--top-k 32]
+"""
+import json
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from prompt_store import StatsRecord
+from rollup import PERIODS, hourly_buckets, rollup
+from sketches import DEFAULT_TOP_K, WordSketches
+
+def make_records(days, per_day, vocabulary):
+    """Records spread over the hours of each day, 0-3 words each from a Zipf(1.1) vocabulary"""
+    rng = random.Random(0)
+    words = [f"word{rank}" for rank in range(vocabulary)]
+    weights = [1 / (rank + 1) ** 1.1 for rank in range(vocabulary)]
+    first_hour = 20000 * 24
+    records = []
+    for day in range(days):
+        for _ in range(per_day):
+            found = rng.choices(words, weights, k=rng.randrange(4))
+            records.append(StatsRecord(first_hour + day * 24 + rng.randrange(24), len(found), found))
+    return records
+
+def run(records, make_counter):
+    """Peak traced bytes, seconds and stats of one rollup over every period (timed untraced)"""
+    word_counter = make_counter()
+    start = time.perf_counter()
+    stats = rollup(hourly_buckets(records, word_counter), PERIODS, word_counter)
+    seconds = time.perf_counter() - start
+    
+    word_counter = make_counter()
+    tracemalloc.start()
+    rollup(hourly_buckets(records, word_counter), PERIODS, word_counter)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, seconds, stats
+
+def top3(curse_words):
+    """The top 3 as curse-stats prints it"""
+    return sorted(curse_words.items(), key=lambda item: (-item[1], item[0]))[:3]
+
+def main():
+    """Main entry point"""
+    args = sys.argv[1:]
+    
+    def option(flag, default):
+        return int(args[args.index(flag) + 1]) if flag in args else default
+    
+    records = make_records(option('--days', 730), option('--per-day', 200), option('--vocabulary', 20000))
+    top_k = option('--top-k', DEFAULT_TOP_K)
+    
+    exact_peak, exact_seconds, exact = run(records, lambda: Counter)
+    sketch_peak, sketch_seconds, sketched = run(records, lambda: WordSketches(top_k))
+    
+    results = {}
+    for period in PERIODS:
+        buckets = exact[period]['stats_by_period']
+        differing = sum(1 for key, bucket in buckets.items()
+                        if [word for word, _ in top3(bucket['curse_words'])]
+                        != [word for word, _ in top3(sketched[period]['stats_by_period'][key]['curse_words'])])
+        results[period] = {"buckets": len(buckets), "top3_differs": differing}
+        print(f"{period:>8}: {len(buckets):>6} buckets, top 3 differs in {differing}")
+    print(f"   exact: {exact_peak / 1e6:8.1f} MB peak, {exact_seconds:.2f}s")
+    print(f"  sketch: {sketch_peak / 1e6:8.1f} MB peak, {sketch_seconds:.2f}s (k={top_k})")
+    print(json.dumps({"benchmark": "word_sketches", "records": len(records), "top_k": top_k,
+                      "exact": {"peak_bytes": exact_peak, "seconds": exact_seconds},
+                      "sketch": {"peak_bytes": sketch_peak, "seconds": sketch_seconds},
+                      "periods": results}))
+
+if __name__ == "__main__":
+    main()
@@ -7,12 +7,37 @@ import json
 import os
 from pathlib import Path
 
+# Where prompt events are written: daily JSONL files or a SQLite database
+STORAGE_BACKENDS = ['jsonl', 'sqlite']
+DATABASE_NAME = 'prompts.sqlite3'
+# How closed days can be compressed by rotation.py
+COMPRESSION_FORMATS = ['gzip', 'lzma']
+# Where prompt text goes in the daily files: in each record, in the separate
+# content-addressed store (see text_store.py), or nowhere
+PROMPT_TEXT_MODES = ['inline', 'separate', 'off']
+# Characters of a prompt the tracker scans and stores (the echo is never cut)
+DEFAULT_MAX_PROMPT_CHARS = 1024 * 1024
+
 class Config:
     def __init__(self, config_path=None):
         self.config_path = Path(config_path or Path.home() / '.biomass-config.json')
+        # Taken before reading, so a change made meanwhile is picked up by refresh_config()
+        self.signature = self._signature()
         self.config = self._load_config()
         self.languages = self._load_languages()
     
+    def _signature(self):
+        """(mtime, size) of the config file, or None if there is none"""
+        try:
+            st = os.stat(self.config_path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+    
+    def changed(self):
+        """Whether the config file changed since it was loaded"""
+        return self._signature() != self.signature
+    
     def _load_config(self):
         """Load user configuration from file"""
         if self.config_path.exists():
@@ -27,6 +52,16 @@ class Config:
             "language": None,  # Will be set during installation
             "install_type": "user",
             "data_dir": str(Path.home() / '.claude' / 'prompt-data'),
+            "storage": "jsonl",  # or "sqlite"
+            "metrics": False,  # record hook timings (see metrics.py)
+            "spool": False,  # echo first, persist through the spool (see spool.py)
+            "spool_flush_interval": 1.0,
+            "spool_fsync": "batch",  # always, batch or never
+            "compression": None,  # compress closed days: "gzip" or "lzma" (see rotation.py)
+            "retention_days": None,  # delete days older than this
+            "retention_max_mb": None,  # delete the oldest days beyond this total size
+            "prompt_text": "inline",  # inline, separate or off (see text_store.py)
+            "max_prompt_chars": DEFAULT_MAX_PROMPT_CHARS,  # scan and store at most this much of a prompt (0: no cap)
             "version": "1.0.0",
             "created": None,
             "last_updated": None
@@ -77,14 +112,11 @@ class Config:
     
     def detect_system_language(self):
         """Detect system language from environment"""
-        for env_var in ['LC_MESSAGES', 'LC_ALL', 'LANG']:
-            if env_var in os.environ:
-                locale = os.environ[env_var]
-                if locale:
-                    # Extract language code (e.g., 'es_ES.UTF-8' -> 'es')
-                    lang = locale.split('_')[0].split('.')[0]
-                    if len(lang) == 2 and self.get_language_by_code(lang):
-                        return lang
+        # Shares the memoized parse with i18n (imported here - i18n imports config)
+        from i18n import language_candidates
+        for lang in language_candidates():
+            if self.get_language_by_code(lang):
+                return lang
         return self.languages.get('default_language', 'en')
     
     def get_preferred_language(self, cli_override=None):
@@ -130,6 +162,36 @@ class Config:
         """Set data directory path"""
         self.config['data_dir'] = str(data_dir)
     
+    def set_storage(self, storage):
+        """Set storage backend (jsonl or sqlite)"""
+        if storage in STORAGE_BACKENDS:
+            self.config['storage'] = storage
+            return True
+        return False
+    
+    def set_rotation(self, compression=None, retention_days=None, retention_max_mb=None):
+        """Set the rotation policy for closed days (None leaves a setting off)"""
+        if compression is not None and compression not in COMPRESSION_FORMATS:
+            return False
+        self.config['compression'] = compression
+        self.config['retention_days'] = retention_days
+        self.config['retention_max_mb'] = retention_max_mb
+        return True
+    
+    def set_prompt_text(self, mode):
+        """Set where prompt text is kept (inline, separate or off)"""
+        if mode in PROMPT_TEXT_MODES:
+            self.config['prompt_text'] = mode
+            return True
+        return False
+    
+    def set_max_prompt_chars(self, chars):
+        """Set how many characters of a prompt are scanned and stored (0: no cap)"""
+        if chars >= 0:
+            self.config['max_prompt_chars'] = chars
+            return True
+        return False
+    
     def save_config(self):
         """Save configuration to file"""
         from datetime import datetime
@@ -158,9 +220,73 @@ class Config:
             'language_code': self.config.get('language', 'en'),
             'install_type': self.config.get('install_type', 'user'),
             'data_dir': self.config.get('data_dir'),
+            'storage': self.config.get('storage', 'jsonl'),
+            'compression': self.config.get('compression') or 'off',
+            'prompt_text': self.config.get('prompt_text', 'inline'),
+            'max_prompt_chars': self.config.get('max_prompt_chars', DEFAULT_MAX_PROMPT_CHARS) or 'no cap',
             'config_path': str(self.config_path)
         }
 
+def get_data_dir():
+    """Get the prompt data directory (BIOMASS_DATA_DIR overrides the default)"""
+    return os.environ.get('BIOMASS_DATA_DIR', os.path.expanduser("~/.claude/prompt-data"))
+
+def get_cache_dir(data_dir=None):
+    """Get the directory for derived caches (safe to delete at any time)"""
+    return os.environ.get('BIOMASS_CACHE_DIR') or os.path.join(data_dir or get_data_dir(), '.cache')
+
+def get_storage():
+    """Get the storage backend (BIOMASS_STORAGE overrides the config file's "storage" setting)"""
+    storage = os.environ.get('BIOMASS_STORAGE') or get_config().config.get('storage')
+    return storage if storage in STORAGE_BACKENDS else 'jsonl'
+
+def get_prompt_text_mode():
+    """Get where prompt text is kept (BIOMASS_PROMPT_TEXT overrides the config file's "prompt_text")"""
+    mode = os.environ.get('BIOMASS_PROMPT_TEXT') or get_config().config.get('prompt_text')
+    return mode if mode in PROMPT_TEXT_MODES else 'inline'
+
+def get_max_prompt_chars():
+    """
+    Cap on the characters of a prompt that are scanned and stored
+    (BIOMASS_MAX_PROMPT_CHARS or "max_prompt_chars"); None means no cap
+    """
+    value = os.environ.get('BIOMASS_MAX_PROMPT_CHARS')
+    if value is None:
+        value = get_config().config.get('max_prompt_chars', DEFAULT_MAX_PROMPT_CHARS)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_MAX_PROMPT_CHARS
+    return value if value > 0 else None
+
+def _number_setting(env_var, key):
+    """Positive number from the environment or the config file, else None"""
+    value = os.environ.get(env_var) or get_config().config.get(key)
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+def get_rotation_policy():
+    """
+    Rotation policy for closed days: compression format (or None) and the
+    retention limits max_age_days / max_total_bytes (None means no limit).
+    BIOMASS_COMPRESSION, BIOMASS_RETENTION_DAYS and BIOMASS_RETENTION_MAX_MB
+    override the config file.
+    """
+    compression = os.environ.get('BIOMASS_COMPRESSION') or get_config().config.get('compression')
+    max_mb = _number_setting('BIOMASS_RETENTION_MAX_MB', 'retention_max_mb')
+    return {
+        "compression": compression if compression in COMPRESSION_FORMATS else None,
+        "max_age_days": _number_setting('BIOMASS_RETENTION_DAYS', 'retention_days'),
+        "max_total_bytes": int(max_mb * 1024 * 1024) if max_mb else None
+    }
+
+def get_database_path(data_dir=None):
+    """Get the SQLite database path for the sqlite storage backend"""
+    return os.path.join(data_dir or get_data_dir(), DATABASE_NAME)
+
 # Global config instance
 _config = None
 
@@ -171,6 +297,13 @@ def get_config():
         _config = Config()
     return _config
 
+def refresh_config():
+    """Re-read the config file if it changed since it was loaded (long-running processes call this per event)"""
+    global _config
+    if _config is not None and _config.changed():
+        _config = Config(_config.config_path)
+    return get_config()
+
 def init_config(config_path=None):
     """Initialize the global config instance"""
     global _config
@@ -196,6 +329,47 @@ if __name__ == "__main__":
             print(f"System detected: {detected}")
             print(f"Preferred: {preferred}")
         
+        elif sys.argv[1] == 'storage':
+            if len(sys.argv) > 2:
+                if config.set_storage(sys.argv[2]) and config.save_config():
+                    print(f"Storage set to {sys.argv[2]}")
+                else:
+                    print(f"Unknown storage: {sys.argv[2]} (choose from {', '.join(STORAGE_BACKENDS)})")
+            else:
+                print(f"Storage: {get_storage()}")
+        
+        elif sys.argv[1] == 'rotation':
+            if len(sys.argv) > 2:
+                # rotation <gzip|lzma|off> [retention days] [retention MB]
+                compression = None if sys.argv[2] == 'off' else sys.argv[2]
+                days = float(sys.argv[3]) if len(sys.argv) > 3 else None
+                max_mb = float(sys.argv[4]) if len(sys.argv) > 4 else None
+                if config.set_rotation(compression, days, max_mb) and config.save_config():
+                    print("Rotation policy saved")
+                else:
+                    print(f"Unknown compression: {sys.argv[2]} (choose from {', '.join(COMPRESSION_FORMATS)}, off)")
+            else:
+                for key, value in get_rotation_policy().items():
+                    print(f"{key}: {value}")
+        
+        elif sys.argv[1] == 'prompt-text':
+            if len(sys.argv) > 2:
+                if config.set_prompt_text(sys.argv[2]) and config.save_config():
+                    print(f"Prompt text set to {sys.argv[2]} (python3 text_store.py migrate converts existing days)")
+                else:
+                    print(f"Unknown prompt text mode: {sys.argv[2]} (choose from {', '.join(PROMPT_TEXT_MODES)})")
+            else:
+                print(f"Prompt text: {get_prompt_text_mode()}")
+        
+        elif sys.argv[1] == 'max-prompt-chars':
+            if len(sys.argv) > 2:
+                if sys.argv[2].isdigit() and config.set_max_prompt_chars(int(sys.argv[2])) and config.save_config():
+                    print(f"Max prompt chars set to {sys.argv[2]}")
+                else:
+                    print(f"Not a character count: {sys.argv[2]}")
+            else:
+                print(f"Max prompt chars: {get_max_prompt_chars() or 'no cap'}")
+        
         elif sys.argv[1] == 'config':
             summary = config.get_config_summary()
             print("Current configuration:")
@@ -203,7 +377,11 @@ if __name__ == "__main__":
                 print(f"  {key}: {value}")
     
     else:
-        print("Usage: python3 config.py [languages|detect|config]")
+        print("Usage: python3 config.py [languages|detect|storage|rotation|prompt-text|max-prompt-chars|config]")
         print("  languages - Show available languages")
         print("  detect    - Show language detection")
+        print("  storage   - Show or set the storage backend (jsonl|sqlite)")
+        print("  rotation  - Show or set compression and retention (gzip|lzma|off [days] [MB])")
+        print("  prompt-text - Show or set where prompt text is kept (inline|separate|off)")
+        print("  max-prompt-chars - Show or set how much of a prompt is scanned and stored (0: no cap)")
         print("  config    - Show current configuration")
\ No newline at end of file
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Day-of-week x hour heatmap for Biomass Conversion Index Monitoring System
+Counts prompts and breaches into two fixed 7x24 arrays indexed straight
+from each record's hour number (weekday from the day number, no dates or
+strftime per record), so years of history fold into 168 cells in one pass.
+Hourly buckets and cached file summaries fold in the same way, an hour at
+a time.
+"""
+from array import array
+
+from prompt_store import StatsRecord, hour_number, range_keys
+
+DAYS = 7
+HOURS = 24
+# Day 0 (1970-01-01) was a Thursday; weekday 0 is Monday, like date.weekday()
+_EPOCH_WEEKDAY = 3
+
+def cell(epoch_hour):
+    """Heatmap cell (weekday * 24 + hour of day) of an hour number"""
+    day, hour = divmod(epoch_hour, HOURS)
+    return (day + _EPOCH_WEEKDAY) % DAYS * HOURS + hour
+
+class Heatmap:
+    """Prompts and breaches per weekday and hour of day"""
+    __slots__ = ('prompts', 'curses')
+    
+    def __init__(self):
+        self.prompts = array('q', bytes(8 * DAYS * HOURS))
+        self.curses = array('q', bytes(8 * DAYS * HOURS))
+    
+    def add_records(self, records):
+        """Count StatsRecords (or entry dicts) - one array index per record"""
+        prompts = self.prompts
+        curses = self.curses
+        for record in records:
+            if not isinstance(record, StatsRecord):
+                record = StatsRecord.from_entry(record)
+            position = cell(record.epoch_hour)
+            prompts[position] += 1
+            curses[position] += record.curse_count
+        return self
+    
+    def add_buckets(self, buckets):
+        """Count hourly buckets keyed 'YYYY-MM-DD HH' (rollup, SQLite or team summary buckets)"""
+        for key, bucket in buckets.items():
+            position = cell(hour_number(key))
+            self.prompts[position] += bucket["prompts"]
+            self.curses[position] += bucket["curses"]
+        return self
+    
+    def add_summaries(self, summaries, start=None, end=None):
+        """Count the hours of cached file summaries that fall in [start, end]"""
+        start_key, end_key = range_keys(start, end)
+        for summary in summaries:
+            for key, hour in summary['hours'].items():
+                if (start_key and key < start_key) or (end_key and key > end_key):
+                    continue
+                position = cell(hour_number(key))
+                self.prompts[position] += hour['prompts']
+                self.curses[position] += hour['curses']
+        return self
+    
+    def weekday_totals(self):
+        """[(prompts, breaches)] per weekday, Monday first"""
+        return [(sum(self.prompts[day * HOURS:(day + 1) * HOURS]), sum(self.curses[day * HOURS:(day + 1) * HOURS]))
+                for day in range(DAYS)]
+    
+    def hour_totals(self):
+        """[(prompts, breaches)] per hour of day"""
+        return [(sum(self.prompts[hour::HOURS]), sum(self.curses[hour::HOURS])) for hour in range(HOURS)]
+    
+    def breaches(self, weekday, hour):
+        """Breaches in one cell"""
+        return self.curses[weekday * HOURS + hour]
+    
+    def total(self):
+        """(prompts, breaches) over every cell"""
+        return sum(self.prompts), sum(self.curses)
@@ -4,74 +4,215 @@ Internationalization (i18n) module for Biomass Conversion Index Monitoring Syste
 Handles loading and formatting localized strings
 """
 import json
+import marshal
 import os
 from pathlib import Path
+from string import Formatter
+
+from config import get_cache_dir
+
+LOCALES_DIR = Path(__file__).parent / 'locales'
+FALLBACK_LANGUAGE = 'en'
+
+# Bump when the compiled locale cache layout changes
+I18N_CACHE_VERSION = 2
+
+# Conversions a replacement field can ask for ('{name!r}')
+_CONVERSIONS = {'r': repr, 's': str, 'a': ascii}
+
+# Checked in order of preference
+LANGUAGE_ENV_VARS = ['LC_MESSAGES', 'LC_ALL', 'LANG']
+
+# Memoized detection, keyed by the environment it was made from
+_language_candidates = {}
+
+def language_candidates():
+    """2-letter language codes named by the locale variables, in order (parsed once per environment)"""
+    env = tuple(os.environ.get(env_var) for env_var in LANGUAGE_ENV_VARS)
+    candidates = _language_candidates.get(env)
+    if candidates is None:
+        candidates = []
+        for locale in env:
+            if locale:
+                # Extract language code (e.g., 'es_ES.UTF-8' -> 'es')
+                lang = locale.split('_')[0].split('.')[0]
+                if lang and len(lang) == 2:
+                    candidates.append(lang)
+        candidates = _language_candidates[env] = tuple(candidates)
+    return candidates
+
+def detect_language():
+    """Detect language from environment variables"""
+    candidates = language_candidates()
+    # Default to English
+    return candidates[0] if candidates else FALLBACK_LANGUAGE
+
+def get_locale_file(lang):
+    """Get the locale file for a language, falling back to English"""
+    lang_file = LOCALES_DIR / f'{lang}.json'
+    if lang_file.exists():
+        return lang_file
+    return LOCALES_DIR / 'en.json'
+
+def flatten_strings(strings, prefix=''):
+    """Flatten nested locale dicts into one {'dotted.key': value} dict"""
+    flat = {}
+    for key, value in strings.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_strings(value, f"{path}."))
+        else:
+            flat[path] = value
+    return flat
+
+def compile_format(value):
+    """
+    A format string parsed once into (literal, field, spec, conversion)
+    segments. None for strings whose fields only str.format can resolve
+    (attributes, indexes, positions, nested specs) or that don't parse.
+    """
+    try:
+        segments = tuple(Formatter().parse(value))
+    except ValueError:
+        return None
+    for _literal, field, spec, _conversion in segments:
+        if field is not None and (not field.isidentifier() or '{' in spec):
+            return None
+    return segments
+
+def format_compiled(segments, kwargs):
+    """Build a string from compiled segments (raises KeyError for a missing field, like str.format)"""
+    parts = []
+    for literal, field, spec, conversion in segments:
+        parts.append(literal)
+        if field is not None:
+            value = kwargs[field]
+            if conversion:
+                value = _CONVERSIONS[conversion](value)
+            parts.append(format(value, spec))
+    return ''.join(parts)
+
+def unflatten_strings(strings, prefix):
+    """The nested dict of every flat key under prefix (e.g. a whole section), or None if there are none"""
+    section = None
+    for key, value in strings.items():
+        if key.startswith(prefix):
+            section = section if section is not None else {}
+            *parents, name = key[len(prefix):].split('.')
+            node = section
+            for parent in parents:
+                node = node.setdefault(parent, {})
+            node[name] = value
+    return section
+
+def _load_locale(lang_file):
+    """Parse one locale file into a flat dict ({} if missing or broken)"""
+    try:
+        with open(lang_file, 'r', encoding='utf-8') as f:
+            strings = json.load(f)
+        return flatten_strings(strings) if isinstance(strings, dict) else {}
+    except (json.JSONDecodeError, IOError):
+        return {}
+
+def locale_sources(lang):
+    """Locale files merged for a language - English first, so every key has a fallback"""
+    en_file = LOCALES_DIR / f'{FALLBACK_LANGUAGE}.json'
+    lang_file = LOCALES_DIR / f'{lang}.json'
+    return [en_file] if lang_file == en_file else [en_file, lang_file]
+
+def _source_signature(files):
+    """mtime/size of the locale files a compiled cache was built from"""
+    signature = []
+    for lang_file in files:
+        try:
+            st = os.stat(lang_file)
+            signature.append((str(lang_file), st.st_mtime_ns, st.st_size))
+        except OSError:
+            signature.append((str(lang_file), None, None))
+    return signature
+
+def compile_locale(lang):
+    """
+    Flat strings for a language with English filled in per missing key,
+    plus every string with replacement fields compiled (see compile_format).
+    Returns (strings, formats).
+    """
+    strings = {}
+    for locale_file in locale_sources(lang):
+        strings.update(_load_locale(locale_file))
+    
+    formats = {}
+    for key, value in strings.items():
+        if isinstance(value, str) and ('{' in value or '}' in value):
+            formats[key] = compile_format(value)
+    return strings, formats
+
+def load_compiled_locale(lang):
+    """compile_locale through a marshal cache keyed by the locale files' mtime/size"""
+    cache_file = os.path.join(get_cache_dir(), f"i18n_{lang}.marshal")
+    signature = _source_signature(locale_sources(lang))
+    
+    try:
+        with open(cache_file, 'rb') as f:
+            cached = marshal.load(f)
+        if cached.get('version') == I18N_CACHE_VERSION and cached.get('sources') == signature:
+            return cached['strings'], cached['formats']
+    except (OSError, EOFError, ValueError, TypeError, AttributeError):
+        pass
+    
+    strings, formats = compile_locale(lang)
+    
+    # Best effort - without a writable cache dir every start just compiles again.
+    # Only the cache dir itself is created, so a missing data dir stays missing.
+    try:
+        try:
+            os.mkdir(os.path.dirname(cache_file))
+        except FileExistsError:
+            pass
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            marshal.dump({"version": I18N_CACHE_VERSION, "sources": signature, "strings": strings, "formats": formats}, f)
+        os.replace(tmp_file, cache_file)
+    except (OSError, ValueError):
+        pass
+    
+    return strings, formats
 
 class I18n:
     def __init__(self, lang=None):
         self.lang = lang or self._detect_language()
-        self.strings = self._load_strings()
+        self.strings, self.formats = self._load_strings()
     
     def _detect_language(self):
         """Detect language from environment variables"""
-        # Check common environment variables in order of preference
-        for env_var in ['LC_MESSAGES', 'LC_ALL', 'LANG']:
-            if env_var in os.environ:
-                locale = os.environ[env_var]
-                if locale:
-                    # Extract language code (e.g., 'es_ES.UTF-8' -> 'es')
-                    lang = locale.split('_')[0].split('.')[0]
-                    if lang and len(lang) == 2:
-                        return lang
-        
-        # Default to English
-        return 'en'
+        return detect_language()
     
     def _load_strings(self):
-        """Load strings for the detected/specified language"""
-        # Get the directory where this script is located
-        script_dir = Path(__file__).parent
-        locales_dir = script_dir / 'locales'
-        
-        # Try to load the requested language
-        lang_file = locales_dir / f'{self.lang}.json'
-        if lang_file.exists():
-            try:
-                with open(lang_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
-                pass
-        
-        # Fallback to English
-        en_file = locales_dir / 'en.json'
-        try:
-            with open(en_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            # Ultimate fallback: empty dict
-            return {}
+        """Load the flattened strings (and their compiled formats) for the detected/specified language"""
+        return load_compiled_locale(self.lang)
     
     def get(self, key_path, **kwargs):
         """
         Get a localized string by key path (e.g., 'stats.title')
         Supports string formatting with kwargs
         """
-        keys = key_path.split('.')
-        value = self.strings
-        
-        # Navigate through the nested dictionary
-        for key in keys:
-            if isinstance(value, dict) and key in value:
-                value = value[key]
-            else:
-                # Return the key path if not found (for debugging)
-                return f"[{key_path}]"
+        value = self.strings.get(key_path)
+        if value is None:
+            # A whole section comes back as a dict, like the locale file has it
+            section = unflatten_strings(self.strings, f"{key_path}.")
+            if section is not None:
+                return section
+            # Return the key path if not found (for debugging)
+            return f"[{key_path}]"
         
         # If it's a string, format it with provided kwargs
         if isinstance(value, str) and kwargs:
             try:
-                return value.format(**kwargs)
-            except (KeyError, ValueError):
+                if key_path in self.formats:
+                    segments = self.formats[key_path]
+                    return value.format(**kwargs) if segments is None else format_compiled(segments, kwargs)
+                return value
+            except (KeyError, ValueError, IndexError, AttributeError, TypeError):
                 # If formatting fails, return unformatted string
                 return value
         
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Session and project index for Biomass Conversion Index Monitoring System
+Records tracked from the hook payload carry the Claude Code session id and
+working directory. A sidecar per daily file maps every session and project
+to the byte offsets of its records, so a report for one project reads only
+that project's records. Compacted archives keep both in dictionary-encoded
+columns, which serve as their index. Whatever rewrites a daily file in
+place forgets its sidecar, like its cached summary.
+"""
+import json
+import os
+import shutil
+
+from config import get_cache_dir, get_data_dir
+from prompt_store import (DATA_FILE_SUFFIX, DATA_SUFFIXES, hour_number, is_archive, is_compressed,
+                          list_data_files, open_data_file, parse_record, project_record, range_keys)
+from summary_cache import ends_with_newline, is_open_day
+
+# Bump when the index layout changes - old sidecars are then rebuilt
+KEY_INDEX_VERSION = 2
+KEY_INDEX_DIR = "keys"
+# Index kind -> record field holding its key
+KEY_FIELDS = {"session": "session_id", "project": "cwd"}
+# Key of records without the field (tracked before the payload was parsed, or not from a hook)
+UNKNOWN_KEY = ""
+
+# Where each field starts in a line the tracker writes. A quote inside a JSON
+# string is escaped, so a marker can't come from the prompt text.
+_FIELD_MARKERS = {kind: f', "{field}": '.encode('ascii') for kind, field in KEY_FIELDS.items()}
+_RECORD_PREFIX = b'{"timestamp": "'
+_scan_once = json.JSONDecoder().scan_once
+
+def new_key_index():
+    """Create an empty per-file index"""
+    return {
+        "version": KEY_INDEX_VERSION,
+        "size": 0,
+        "mtime_ns": 0,
+        "offset": 0,
+        "keys": {kind: {} for kind in KEY_FIELDS}
+    }
+
+def _key(value):
+    """Index key of a field value"""
+    return value if isinstance(value, str) and value else UNKNOWN_KEY
+
+def record_keys(raw):
+    """
+    {kind: key} for one JSONL line (bytes), or None for a blank or torn line.
+    Lines in the tracker layout only have the key fields scanned.
+    """
+    if raw.startswith(_RECORD_PREFIX) and raw.endswith((b'}\n', b'}')):
+        keys = {}
+        try:
+            for kind, marker in _FIELD_MARKERS.items():
+                position = raw.rfind(marker)
+                if position < 0:
+                    keys[kind] = UNKNOWN_KEY
+                    continue
+                text = raw[position + len(marker):].decode('utf-8', 'surrogatepass')
+                value, _end = _scan_once(text, 0)
+                keys[kind] = _key(value)
+            return keys
+        except (ValueError, StopIteration):
+            pass
+    entry = parse_record(raw)
+    if entry is None:
+        return None
+    return {kind: _key(entry.get(field)) for kind, field in KEY_FIELDS.items()}
+
+def _add(index, keys, location):
+    """File a record location under each of its keys"""
+    for kind, key in keys.items():
+        locations = index['keys'][kind].get(key)
+        if locations is None:
+            index['keys'][kind][key] = [location]
+        else:
+            locations.append(location)
+
+def index_file(file_path, index=None, offset=0):
+    """
+    Index a daily file (from offset onwards). In a day still open only
+    complete lines are consumed; the index's offset records where to resume.
+    """
+    st = os.stat(file_path)
+    if is_archive(file_path):
+        # Compacted days are indexed by record position, from their key columns
+        from archive import PromptArchive
+        
+        index = new_key_index()
+        with PromptArchive(file_path) as archive:
+            for position in range(archive.count):
+                _add(index, {kind: archive.record_key(kind, position) for kind in KEY_FIELDS}, position)
+        index['size'] = index['offset'] = st.st_size
+        index['mtime_ns'] = st.st_mtime_ns
+        return index
+    
+    if index is None:
+        index = new_key_index()
+    open_day = is_open_day(file_path)
+    with open_data_file(file_path) as f:
+        if offset:
+            f.seek(offset)
+        for raw in f:
+            if open_day and not raw.endswith(b'\n'):
+                # Line still being written - pick it up next time
+                break
+            start = offset
+            offset += len(raw)
+            if not raw.isspace():
+                keys = record_keys(raw)
+                if keys is not None:
+                    _add(index, keys, start)
+            index['offset'] = offset
+    index['size'] = st.st_size
+    index['mtime_ns'] = st.st_mtime_ns
+    return index
+
+def key_matcher(kind, value):
+    """
+    Predicate for the keys a --by-session/--by-project value selects: a
+    session by its id or a prefix of it, a project by its path or the
+    last part of it
+    """
+    if kind == "session":
+        return lambda key: bool(key) and key.startswith(value)
+    value = value.rstrip(os.sep) or value
+    return lambda key: bool(key) and (key.rstrip(os.sep) == value or os.path.basename(key.rstrip(os.sep)) == value)
+
+class KeyIndex:
+    def __init__(self, data_dir=None, cache_dir=None):
+        self.data_dir = data_dir or get_data_dir()
+        self.index_dir = os.path.join(cache_dir or get_cache_dir(self.data_dir), KEY_INDEX_DIR)
+        
+        # Cache-hit/miss reporting
+        self.hits = 0
+        self.refreshed = 0
+        self.parsed = 0
+        # Files and records read back through the index
+        self.files_read = 0
+        self.records_read = 0
+    
+    def _sidecar_path(self, file_path):
+        """Sidecar index path for a data file"""
+        name = os.path.basename(file_path)
+        if name.endswith(DATA_FILE_SUFFIX):
+            name = name[:-len(DATA_FILE_SUFFIX)]
+        return os.path.join(self.index_dir, f"{name}.json")
+    
+    def _load_sidecar(self, file_path):
+        """Load the cached index for a data file, or None"""
+        try:
+            with open(self._sidecar_path(file_path), 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') == KEY_INDEX_VERSION:
+                return index
+        except (json.JSONDecodeError, IOError, AttributeError):
+            pass
+        return None
+    
+    def _save_sidecar(self, file_path, index):
+        """Write one sidecar atomically"""
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            sidecar = self._sidecar_path(file_path)
+            tmp_path = f"{sidecar}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, sidecar)
+        except OSError:
+            # The index is an optimization - failing to write it is not an error
+            pass
+    
+    def forget(self, file_path):
+        """Drop the index of a data file that was rewritten, re-encoded or removed"""
+        try:
+            os.remove(self._sidecar_path(file_path))
+        except OSError:
+            pass
+    
+    def get_index(self, file_path):
+        """Index of one data file, indexing only what changed since the sidecar was written"""
+        st = os.stat(file_path)
+        index = self._load_sidecar(file_path)
+        if index is not None:
+            # A day that closed since may have left an unterminated last line to index
+            closed_tail = index['offset'] < st.st_size and file_path.endswith(DATA_FILE_SUFFIX) and not is_open_day(file_path)
+            if index['size'] == st.st_size and index['mtime_ns'] == st.st_mtime_ns and not closed_tail:
+                self.hits += 1
+                return index
+            if not is_archive(file_path) and not is_compressed(file_path) \
+                    and st.st_size >= index['offset'] and ends_with_newline(file_path, index['offset']):
+                # Appended since last time - index only the new tail
+                index = index_file(file_path, index, index['offset'])
+                self.refreshed += 1
+                self._save_sidecar(file_path, index)
+                return index
+        index = index_file(file_path)
+        self.parsed += 1
+        self._save_sidecar(file_path, index)
+        return index
+    
+    def keyed_records(self, kind, match=None, start=None, end=None, on_error=None):
+        """
+        (key, StatsRecord) for the records in [start, end] whose session or
+        project key passes match (every record when match is None), oldest
+        file first. Only the records the index points at are read. Files
+        that can't be read are reported through on_error(file_path, error).
+        """
+        start_key, end_key = range_keys(start, end)
+        first_hour = hour_number(start_key) if start_key else None
+        last_hour = hour_number(end_key) if end_key else None
+        
+        for file_path in list_data_files(self.data_dir, start, end):
+            try:
+                if is_archive(file_path):
+                    # The key columns are the archive's index
+                    yield from self._read_archive(file_path, kind, match, start_key, end_key)
+                    continue
+                index = self.get_index(file_path)
+                # Locations of the matching records, read in file order
+                wanted = sorted((location, key) for key, locations in index['keys'][kind].items()
+                                if match is None or match(key) for location in locations)
+                if not wanted:
+                    continue
+                self.files_read += 1
+                for key, record in self._read(file_path, wanted):
+                    self.records_read += 1
+                    if first_hour is not None and record.epoch_hour < first_hour:
+                        continue
+                    if last_hour is not None and record.epoch_hour > last_hour:
+                        continue
+                    yield key, record
+            except Exception as e:
+                if on_error:
+                    on_error(file_path, e)
+        if start is None and end is None:
+            self.prune()
+    
+    def _read_archive(self, file_path, kind, match, start_key, end_key):
+        """(key, StatsRecord) of the matching records of a compacted day"""
+        from archive import PromptArchive
+        
+        with PromptArchive(file_path) as archive:
+            first = True
+            for key, record in archive.iter_keyed_entries(kind, match, start_key, end_key):
+                if first:
+                    self.files_read += 1
+                    first = False
+                self.records_read += 1
+                yield key, record
+    
+    def _read(self, file_path, wanted):
+        """(key, StatsRecord) at each (location, key) of one JSONL file"""
+        # Compressed days only ever seek forward, which their readers do by decompressing
+        with open_data_file(file_path) as f:
+            for offset, key in wanted:
+                f.seek(offset)
+                record = project_record(f.readline())
+                if record is not None:
+                    yield key, record
+    
+    def prune(self):
+        """Drop sidecars of data files that were purged"""
+        try:
+            sidecars = os.listdir(self.index_dir)
+        except OSError:
+            return
+        for name in sidecars:
+            if not name.endswith('.json'):
+                continue
+            stem = name[:-len('.json')]
+            if not any(stem.endswith(suffix) for suffix in DATA_SUFFIXES):
+                stem += DATA_FILE_SUFFIX
+            if not os.path.exists(os.path.join(self.data_dir, stem)):
+                try:
+                    os.remove(os.path.join(self.index_dir, name))
+                except OSError:
+                    pass
+
+def remove_key_index(data_dir=None):
+    """Delete every index sidecar (e.g. when purging all data)"""
+    index_dir = os.path.join(get_cache_dir(data_dir), KEY_INDEX_DIR)
+    if not os.path.isdir(index_dir):
+        return False
+    shutil.rmtree(index_dir, ignore_errors=True)
+    return True
+
+# Command line support
+if __name__ == "__main__":
+    import sys
+    
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command in ("status", "rebuild"):
+        if command == "rebuild":
+            remove_key_index()
+        index = KeyIndex()
+        counts = {kind: {} for kind in KEY_FIELDS}
+        for file_path in list_data_files(index.data_dir):
+            try:
+                file_index = index.get_index(file_path)
+            except Exception as e:
+                print(f"Skipped {file_path}: {e}")
+                continue
+            for kind, keys in file_index['keys'].items():
+                for key, locations in keys.items():
+                    counts[kind][key] = counts[kind].get(key, 0) + len(locations)
+        index.prune()
+        print(f"Index: {index.hits} files up to date, {index.refreshed} extended, {index.parsed} indexed")
+        for kind, keys in counts.items():
+            known = {key: count for key, count in keys.items() if key != UNKNOWN_KEY}
+            print(f"{kind.title()}s: {len(known)} ({sum(known.values())} prompts, {keys.get(UNKNOWN_KEY, 0)} without one)")
+            for key, count in sorted(known.items(), key=lambda item: (-item[1], item[0]))[:5]:
+                print(f"  {count:>7}  {key}")
+    else:
+        print("Usage: python3 key_index.py [status|rebuild]")
+        print("  status  - Bring the session/project index up to date and show the busiest keys")
+        print("  rebuild - Index every daily file again")
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Indicator matcher for Biomass Conversion Index Monitoring System
+Compiles the localized indicator lists into a single trie-shaped regex
+so a prompt is scanned in one pass regardless of vocabulary size
+"""
+import json
+import os
+import re
+
+from config import Config, get_cache_dir
+from i18n import detect_language, get_locale_file
+
+# Bump when the cached pattern format or generation rules change
+MATCHER_VERSION = 1
+
+# Indicator syntax in locales/<lang>.json ("indicators.curse_words"):
+#   "damn"            - whole word
+#   "absolute walnut" - phrase, any whitespace between the words
+#   "frak*"           - prefix/stem, matches "frak", "frakking", ...
+PREFIX_MARKER = '*'
+
+# Matches ending this close to the end of the text seen so far wait for the
+# next chunk when matching a stream (see count_chunks)
+STREAM_OVERLAP = 1024
+
+# Trie node markers (never a single character, so they can't clash with one)
+_WORD_END = 0
+_PREFIX_END = 1
+
+def normalize_indicator(text):
+    """Normalize an indicator or matched text (lowercase, single spaces)"""
+    return ' '.join(text.lower().split())
+
+def _trie_to_regex(node):
+    """Turn a character trie into a regex with shared prefixes factored out"""
+    branches = []
+    for char in sorted(key for key in node if isinstance(key, str)):
+        atom = r'\s+' if char == ' ' else re.escape(char)
+        branches.append(atom + _trie_to_regex(node[char]))
+    
+    # Longer alternatives come first so the longest indicator wins
+    if _PREFIX_END in node:
+        branches.append(r'\w*')
+    elif _WORD_END in node:
+        branches.append('')
+    
+    if len(branches) == 1:
+        return branches[0]
+    return '(?:' + '|'.join(branches) + ')'
+
+def build_pattern(words, prefixes):
+    """Build the regex source for a set of words/phrases and prefixes"""
+    trie = {}
+    for indicator, marker in [(w, _WORD_END) for w in words] + [(p, _PREFIX_END) for p in prefixes]:
+        node = trie
+        for char in indicator:
+            node = node.setdefault(char, {})
+        node[marker] = True
+    
+    if not trie:
+        return None
+    return r'(?<!\w)' + _trie_to_regex(trie) + r'(?!\w)'
+
+class IndicatorMatcher:
+    def __init__(self, words=(), prefixes=(), pattern=None):
+        self.words = frozenset(words)
+        self.prefixes = frozenset(prefixes)
+        if pattern is None:
+            pattern = build_pattern(self.words, self.prefixes)
+        self.pattern = pattern
+        self._regex = re.compile(pattern, re.IGNORECASE) if pattern else None
+        self._max_prefix = max((len(p) for p in self.prefixes), default=0)
+        longest = max((len(indicator) for indicator in self.words | self.prefixes), default=0)
+        self._overlap = max(STREAM_OVERLAP, 4 * longest)
+    
+    @classmethod
+    def from_indicators(cls, indicators):
+        """Create a matcher from raw indicator strings"""
+        words = set()
+        prefixes = set()
+        for indicator in indicators:
+            if not isinstance(indicator, str):
+                continue
+            if indicator.endswith(PREFIX_MARKER):
+                indicator = normalize_indicator(indicator[:-1])
+                if indicator:
+                    prefixes.add(indicator)
+            else:
+                indicator = normalize_indicator(indicator)
+                if indicator:
+                    words.add(indicator)
+        return cls(words, prefixes)
+    
+    def _canonical(self, matched):
+        """Map matched text back to the indicator that produced it"""
+        key = normalize_indicator(matched)
+        if key in self.words:
+            return key
+        for length in range(min(len(key), self._max_prefix), 0, -1):
+            if key[:length] in self.prefixes:
+                return key[:length]
+        return key
+    
+    def find_all(self, text):
+        """Return every indicator occurrence in text, in order"""
+        if self._regex is None:
+            return []
+        return [self._canonical(m.group(0)) for m in self._regex.finditer(text)]
+    
+    def count(self, text):
+        """Return (count, found indicators) for text"""
+        found = self.find_all(text)
+        return len(found), found
+    
+    def count_chunks(self, chunks):
+        """
+        Return (count, found indicators) for text arriving as chunks - the
+        same as count(''.join(chunks)) without ever joining them. A match
+        ending within the overlap of the end of what has arrived may still
+        grow (or need its lookahead), so it waits for the next chunk; one
+        character before the resume point stays for the lookbehind. Only
+        a phrase whose words are split by over a kilobyte of whitespace
+        across a chunk border could be missed. The chunks are consumed even
+        when there is nothing to match.
+        """
+        if self._regex is None:
+            for _chunk in chunks:
+                pass
+            return 0, []
+        
+        found = []
+        buffer = ''
+        pos = 0
+        for chunk in chunks:
+            buffer += chunk
+            safe = len(buffer) - self._overlap
+            resume = None
+            for match in self._regex.finditer(buffer, pos):
+                if match.end() > safe:
+                    resume = match.start()
+                    break
+                found.append(self._canonical(match.group(0)))
+                pos = match.end()
+            if resume is None:
+                resume = max(pos, safe)
+            keep = max(0, resume - 1)
+            buffer = buffer[keep:]
+            pos = resume - keep
+        
+        for match in self._regex.finditer(buffer, pos):
+            found.append(self._canonical(match.group(0)))
+        return len(found), found
+    
+    def to_dict(self):
+        """Serializable form used by the on-disk cache"""
+        return {
+            "words": sorted(self.words),
+            "prefixes": sorted(self.prefixes),
+            "pattern": self.pattern
+        }
+
+def resolve_languages(langs=None):
+    """
+    Resolve which locales contribute indicators:
+    explicit list > BIOMASS_INDICATOR_LANGS ("all" or "en,es") > detected language
+    """
+    if langs is None:
+        setting = os.environ.get('BIOMASS_INDICATOR_LANGS', '').strip()
+        if setting.lower() == 'all':
+            langs = [lang['code'] for lang in Config().get_available_languages()]
+        elif setting:
+            langs = [code.strip() for code in setting.split(',') if code.strip()]
+        else:
+            langs = [detect_language()]
+    
+    # Several languages may fall back to the same locale file
+    files = []
+    for lang in langs:
+        lang_file = str(get_locale_file(lang))
+        if lang_file not in files:
+            files.append(lang_file)
+    return files
+
+def _source_signature(files):
+    """Identify locale file versions by mtime and size"""
+    signature = []
+    for path in files:
+        try:
+            st = os.stat(path)
+            signature.append([path, st.st_mtime_ns, st.st_size])
+        except OSError:
+            signature.append([path, None, None])
+    return signature
+
+def _load_indicators(files):
+    """Read indicator lists from locale files"""
+    indicators = []
+    for path in files:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                strings = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            continue
+        values = strings.get('indicators', {}).get('curse_words', [])
+        if isinstance(values, list):
+            indicators.extend(values)
+    return indicators
+
+def _cache_path(files):
+    """Cache file name derived from the contributing locales"""
+    names = '-'.join(os.path.splitext(os.path.basename(path))[0] for path in files)
+    return os.path.join(get_cache_dir(), f"matcher_{names}.json")
+
+def load_matcher(langs=None):
+    """Load a matcher for the given languages, using the on-disk cache when fresh"""
+    files = resolve_languages(langs)
+    signature = _source_signature(files)
+    cache_file = _cache_path(files)
+    
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('version') == MATCHER_VERSION and cached.get('sources') == signature:
+            return IndicatorMatcher(cached['words'], cached['prefixes'], cached['pattern'])
+    except (json.JSONDecodeError, IOError, KeyError, TypeError):
+        pass
+    
+    matcher = IndicatorMatcher.from_indicators(_load_indicators(files))
+    
+    # Best effort - a read-only cache dir just means rebuilding next time
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(dict(matcher.to_dict(), version=MATCHER_VERSION, sources=signature), f, ensure_ascii=False)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
+    
+    return matcher
+
+# Global instance - built once per process
+_matcher = None
+
+def get_matcher():
+    """Get the global matcher, loading it if needed"""
+    global _matcher
+    if _matcher is None:
+        _matcher = load_matcher()
+    return _matcher
+
+# Command line support for testing
+if __name__ == "__main__":
+    import sys
+    
+    if len(sys.argv) > 1:
+        matcher = get_matcher()
+        count, found = matcher.count(' '.join(sys.argv[1:]))
+        print(f"Indicators: {count}")
+        print(f"Found: {', '.join(found)}")
+    else:
+        print("Usage: python3 matcher.py <text>")
+        print("Example: BIOMASS_INDICATOR_LANGS=all python3 matcher.py 'well damn'")
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Opt-in timing instrumentation for Biomass Conversion Index Monitoring System
+Records per-phase durations of every tracker hook invocation to a rolling
+local metrics file (BIOMASS_METRICS=1 or "metrics": true in the config)
+and summarizes them as latency percentiles
+"""
+import json
+import os
+import time
+
+from config import get_cache_dir, get_config
+
+METRICS_FILE = "hook_metrics.jsonl"
+# Rolled over to hook_metrics.jsonl.1 beyond this size, so at most twice this is kept
+METRICS_MAX_BYTES = 1024 * 1024
+
+def metrics_enabled():
+    """Whether hook timings should be recorded (BIOMASS_METRICS overrides the config file)"""
+    value = os.environ.get('BIOMASS_METRICS')
+    if value is not None:
+        return value.lower() in ('1', 'true', 'yes', 'on')
+    return bool(get_config().config.get('metrics'))
+
+def get_metrics_path():
+    """Path of the rolling hook metrics file"""
+    return os.path.join(get_cache_dir(), METRICS_FILE)
+
+def process_age():
+    """
+    Seconds since this process was created, or None where it can't be told.
+    Taken when the first script line runs, this is the interpreter start-up time
+    (Linux only, at clock tick resolution).
+    """
+    try:
+        with open('/proc/self/stat', 'rb') as f:
+            # Field 22 (starttime) - counted after the ')' that closes the command name
+            fields = f.read().rsplit(b')', 1)[1].split()
+        started = int(fields[19]) / os.sysconf('SC_CLK_TCK')
+        return max(0.0, time.clock_gettime(time.CLOCK_BOOTTIME) - started)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+class PhaseTimer:
+    """Durations of consecutive phases, in milliseconds"""
+    def __init__(self, startup=False):
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.phases = {}
+        if startup:
+            age = process_age()
+            if age is not None:
+                self.phases['startup'] = round(age * 1000, 3)
+    
+    def mark(self, phase):
+        """End the current phase under the given name"""
+        now = time.perf_counter()
+        self.phases[phase] = round(self.phases.get(phase, 0) + (now - self.last) * 1000, 3)
+        self.last = now
+    
+    def total(self):
+        """Milliseconds since the timer started (plus start-up, if known)"""
+        return round((time.perf_counter() - self.started) * 1000 + self.phases.get('startup', 0), 3)
+    
+    def record(self, **fields):
+        """Append this invocation to the metrics file; never raises"""
+        entry = dict(fields, timestamp=time.time(), phases=self.phases, total=self.total())
+        try:
+            path = get_metrics_path()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                if os.path.getsize(path) > METRICS_MAX_BYTES:
+                    os.replace(path, f"{path}.1")
+            except OSError:
+                pass
+            # One write on an O_APPEND descriptor, so concurrent hooks don't interleave
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, (json.dumps(entry) + '\n').encode('utf-8'))
+            finally:
+                os.close(fd)
+        except OSError:
+            # Metrics must never break the hook
+            pass
+
+def load_metrics(path=None):
+    """Recorded hook invocations, oldest first (rolled-over file included)"""
+    path = path or get_metrics_path()
+    entries = []
+    for file_path in (f"{path}.1", path):
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            continue
+    return entries
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def summarize(entries):
+    """{mode: {phase: (count, p50, p90, p99, max)}} with 'total' for whole invocations"""
+    timings = {}
+    for entry in entries:
+        mode = timings.setdefault(entry.get('mode', 'unknown'), {})
+        for phase, value in list(entry.get('phases', {}).items()) + [('total', entry.get('total'))]:
+            if isinstance(value, (int, float)):
+                mode.setdefault(phase, []).append(value)
+    return {
+        mode: {
+            phase: (len(values), percentile(values, 0.5), percentile(values, 0.9), percentile(values, 0.99), max(values))
+            for phase, values in phases.items()
+        }
+        for mode, phases in timings.items()
+    }
+
+class Profile:
+    """Stage timings and counters for one report run (curse-stats.py --profile)"""
+    def __init__(self, startup=False):
+        self.timer = PhaseTimer(startup)
+        self.counters = {}
+    
+    def stage(self, name):
+        """End the current stage under the given name"""
+        self.timer.mark(name)
+    
+    def count(self, name, amount=1):
+        """Add to a counter"""
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+# Command line support
+if __name__ == "__main__":
+    import sys
+    
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "summary":
+        entries = load_metrics()
+        if not entries:
+            print(f"No hook metrics in {get_metrics_path()} (enable with BIOMASS_METRICS=1)")
+            sys.exit(0)
+        for mode, phases in summarize(entries).items():
+            print(f"\n{mode}:")
+            print(f"  {'phase':<12} {'count':>6} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}  (ms)")
+            for phase, (count, p50, p90, p99, worst) in phases.items():
+                print(f"  {phase:<12} {count:>6} {p50:>9.2f} {p90:>9.2f} {p99:>9.2f} {worst:>9.2f}")
+    elif command == "clear":
+        for file_path in (get_metrics_path(), f"{get_metrics_path()}.1"):
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+        print("Hook metrics cleared")
+    else:
+        print("Usage: python3 metrics.py [summary|clear]")
+        print("  summary - Hook latency percentiles per phase")
+        print("  clear   - Delete the collected metrics")
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Prompt data storage helpers for Biomass Conversion Index Monitoring System
+Locates the daily prompts_YYYY-MM-DD.jsonl files (or their compressed or
+compacted .bca successors) and maps date ranges onto them
+"""
+import glob
+import json
+import os
+from datetime import date, datetime, timedelta
+
+from config import get_data_dir
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks (Windows) - large records fall back to a plain O_APPEND write
+    fcntl = None
+
+DATA_FILE_PREFIX = "prompts_"
+DATA_FILE_SUFFIX = ".jsonl"
+# Closed days compacted by archive.py
+ARCHIVE_SUFFIX = ".bca"
+# Closed days compressed by rotation.py, per compression format
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'lzma': '.xz'}
+# Every form a day can take, least preferred first - when an interrupted
+# compression or compaction leaves two behind, the later one is read
+DATA_SUFFIXES = [DATA_FILE_SUFFIX] + [DATA_FILE_SUFFIX + suffix for suffix in COMPRESSION_SUFFIXES.values()] + [ARCHIVE_SUFFIX]
+
+# Start of every line the tracker writes, and the key after the prompt text
+_RECORD_PREFIX = b'{"timestamp": "'
+_RECORD_START = b'{"timestamp"'
+# End of 'YYYY-MM-DDTHH' in such a line
+_TIMESTAMP_END = len(_RECORD_PREFIX) + 13
+# The C JSON scanner without json.loads' per-call overhead
+_scan_once = json.JSONDecoder().scan_once
+_COUNT_KEY = b', "curse_count": '
+_WORDS_KEY = ', "found_curses": '
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# 'YYYY-MM-DD' (str or bytes) <-> days since 1970-01-01, filled as days are seen
+_day_numbers = {}
+_day_keys = {}
+
+# Appends up to this size go out as one write() on an O_APPEND descriptor,
+# which concurrent writers can't interleave; larger ones also take a lock
+try:
+    from select import PIPE_BUF as ATOMIC_APPEND_SIZE
+except ImportError:
+    ATOMIC_APPEND_SIZE = 512  # POSIX minimum
+
+def data_file_name(day):
+    """Daily data file name for a date"""
+    return f"{DATA_FILE_PREFIX}{day.strftime('%Y-%m-%d')}{DATA_FILE_SUFFIX}"
+
+def file_date(file_path):
+    """Date encoded in a data file name, or None if the name doesn't carry one"""
+    name = os.path.basename(file_path)
+    stem = name[len(DATA_FILE_PREFIX):].split('.', 1)[0]
+    try:
+        return datetime.strptime(stem, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+def is_archive(file_path):
+    """True for a compacted columnar archive rather than a JSONL file"""
+    return file_path.endswith(ARCHIVE_SUFFIX)
+
+def compression_of(file_path):
+    """Compression format of a compressed daily JSONL file, or None"""
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if file_path.endswith(DATA_FILE_SUFFIX + suffix):
+            return compression
+    return None
+
+def is_compressed(file_path):
+    """True for a daily JSONL file compressed by rotation"""
+    return compression_of(file_path) is not None
+
+def data_file_stem(file_path):
+    """Path of a data file without its suffix (shared by every form of the same day)"""
+    for suffix in DATA_SUFFIXES:
+        if file_path.endswith(suffix):
+            return file_path[:-len(suffix)]
+    return file_path
+
+def open_data_file(file_path, mode='rb', compression=None):
+    """
+    Binary file object for a daily JSONL file that (de)compresses on the fly,
+    by the format its name implies unless compression is given (e.g. for temp files)
+    """
+    compression = compression or compression_of(file_path)
+    if compression == 'gzip':
+        import gzip
+        return gzip.open(file_path, mode)
+    if compression == 'lzma':
+        import lzma
+        return lzma.open(file_path, mode)
+    return open(file_path, mode)
+
+def _as_date(value):
+    """Date part of a date or datetime"""
+    return value.date() if isinstance(value, datetime) else value
+
+def range_keys(start=None, end=None):
+    """
+    Hourly bucket keys ('YYYY-MM-DD HH') bounding a range, inclusive.
+    Dates cover the whole day; datetimes are taken at hour precision.
+    """
+    start_key = None
+    end_key = None
+    if start is not None:
+        start_key = start.strftime("%Y-%m-%d %H") if isinstance(start, datetime) else f"{start.isoformat()} 00"
+    if end is not None:
+        end_key = end.strftime("%Y-%m-%d %H") if isinstance(end, datetime) else f"{end.isoformat()} 23"
+    return start_key, end_key
+
+def list_data_files(data_dir=None, start=None, end=None):
+    """
+    Daily data files that can hold entries in [start, end], oldest first.
+    A day that has been compressed or compacted is listed in that form.
+    Files are pruned by the date in their name without being opened. A prompt
+    submitted just before midnight can land in the next day's file, so the
+    day after the range is kept too.
+    """
+    data_dir = data_dir or get_data_dir()
+    by_stem = {}
+    for file_path in glob.glob(os.path.join(data_dir, f"{DATA_FILE_PREFIX}*")):
+        for rank, suffix in enumerate(DATA_SUFFIXES):
+            if file_path.endswith(suffix):
+                stem = file_path[:-len(suffix)]
+                # An archive wins over a JSONL file left behind by an interrupted compaction, etc.
+                if stem not in by_stem or rank > by_stem[stem][0]:
+                    by_stem[stem] = (rank, file_path)
+    files = [by_stem[stem][1] for stem in sorted(by_stem)]
+    if start is None and end is None:
+        return files
+    
+    first = _as_date(start) if start is not None else date.min
+    last = _as_date(end) + timedelta(days=1) if end is not None else date.max
+    selected = []
+    for file_path in files:
+        day = file_date(file_path)
+        if day is None or first <= day <= last:
+            selected.append(file_path)
+    return selected
+
+def _open_locked(file_path, exclusive):
+    """
+    Append descriptor of a daily file under a shared or exclusive fcntl
+    lock. A purge rewriting the file holds it exclusively until the new
+    file is renamed into place, so a writer that waited reopens the path
+    rather than appending to the replaced file.
+    """
+    while True:
+        fd = os.open(file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        if fcntl is None:
+            return fd
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            st = os.fstat(fd)
+            current = os.stat(file_path)
+            if (st.st_dev, st.st_ino) == (current.st_dev, current.st_ino):
+                return fd
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+
+def append_record(file_path, data, fsync=False):
+    """
+    Append complete JSONL records (bytes ending in a newline) so concurrent
+    sessions never interleave them: a single O_APPEND write under a shared
+    fcntl lock when the data fits in ATOMIC_APPEND_SIZE, otherwise the same
+    write under an exclusive one (looping only if the kernel writes short).
+    """
+    fd = _open_locked(file_path, exclusive=len(data) > ATOMIC_APPEND_SIZE)
+    try:
+        written = os.write(fd, data)
+        if written < len(data):
+            view = memoryview(data)[written:]
+            while view:
+                view = view[os.write(fd, view):]
+        if fsync:
+            os.fsync(fd)
+    finally:
+        # Closing the descriptor drops the lock
+        os.close(fd)
+
+def parse_record(raw):
+    """
+    Prompt entry on one JSONL line (bytes or str), or None for a blank line or
+    one torn by an interrupted or interleaved write - readers skip those and
+    carry on with the rest of the file.
+    """
+    try:
+        entry = json.loads(raw)
+        timestamp = entry['timestamp']
+        if isinstance(timestamp, str) and len(timestamp) >= 13 and timestamp[10] in 'T ' \
+                and isinstance(entry['curse_count'], int) and isinstance(entry['found_curses'], list):
+            return entry
+    except (ValueError, KeyError, TypeError):
+        pass
+    return None
+
+def hour_number(timestamp):
+    """Wall-clock hours since 1970-01-01 for an ISO timestamp or hour key (the hour key as an integer)"""
+    if len(timestamp) < 13 or timestamp[10] not in 'T ':
+        raise ValueError(f"Invalid timestamp: {timestamp!r}")
+    day = timestamp[:10]
+    number = _day_numbers.get(day)
+    if number is None:
+        number = _day_numbers[day] = date.fromisoformat(day).toordinal() - _EPOCH_ORDINAL
+    return number * 24 + int(timestamp[11:13])
+
+def hour_number_key(number):
+    """Hour key ('YYYY-MM-DD HH') of an hour number"""
+    day, hour = divmod(number, 24)
+    key = _day_keys.get(day)
+    if key is None:
+        key = _day_keys[day] = date.fromordinal(_EPOCH_ORDINAL + day).isoformat()
+    return f"{key} {hour:02d}"
+
+class StatsRecord:
+    """
+    What reports need from one prompt entry: its hour number (parsed from
+    the timestamp once), the indicator count and the indicator words
+    """
+    __slots__ = ('epoch_hour', 'curse_count', 'found_curses')
+    
+    def __init__(self, epoch_hour, curse_count, found_curses):
+        self.epoch_hour = epoch_hour
+        self.curse_count = curse_count
+        self.found_curses = found_curses
+    
+    @classmethod
+    def from_entry(cls, entry):
+        """Record for an entry dict (raises ValueError for a bad timestamp)"""
+        return cls(hour_number(entry['timestamp']), entry['curse_count'], entry['found_curses'])
+
+def project_record(raw):
+    """
+    StatsRecord for one JSONL line (bytes), or None for a blank or torn line.
+    Lines in the layout the tracker writes never have their prompt text
+    decoded: the hour comes straight from the timestamp bytes, the count
+    from its digits and only the word list goes through the JSON scanner.
+    A second record start on the line (a torn write followed by a whole
+    record) or anything unexpected falls back to parse_record.
+    """
+    if raw.startswith(_RECORD_PREFIX) and raw.endswith((b'}\n', b'}')):
+        # A quote inside a JSON string is escaped, so neither marker can come from the text
+        tail = raw.find(_COUNT_KEY, _TIMESTAMP_END)
+        if tail > 0 and raw[_TIMESTAMP_END - 3:_TIMESTAMP_END - 2] in b'T ' and raw.find(_RECORD_START, 1) < 0:
+            try:
+                text = raw[tail + len(_COUNT_KEY):].decode('utf-8', 'surrogatepass')
+                words = text.find(_WORDS_KEY)
+                digits = text[:words]
+                if words > 0 and digits.isascii() and digits.isdigit():
+                    found_curses, _end = _scan_once(text, words + len(_WORDS_KEY))
+                    if isinstance(found_curses, list):
+                        day = raw[len(_RECORD_PREFIX):_TIMESTAMP_END - 3]
+                        number = _day_numbers.get(day)
+                        if number is None:
+                            number = _day_numbers[day] = date.fromisoformat(day.decode('ascii')).toordinal() - _EPOCH_ORDINAL
+                        return StatsRecord(number * 24 + int(raw[_TIMESTAMP_END - 2:_TIMESTAMP_END]), int(digits), found_curses)
+            except (ValueError, StopIteration):
+                pass
+    
+    entry = parse_record(raw)
+    if entry is None:
+        return None
+    try:
+        return StatsRecord.from_entry(entry)
+    except ValueError:
+        return None
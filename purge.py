@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Evidence counting and selective purging for Biomass Conversion Index Monitoring System
+Counts records with byte-level newline scans (or straight from the summary
+cache) and removes prompts by date range, indicator word or prompt text,
+rewriting each affected daily file in one streaming pass
+"""
+import json
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from config import get_data_dir
+from key_index import KeyIndex
+from prompt_store import compression_of, is_archive, is_compressed, list_data_files, open_data_file, range_keys
+from summary_cache import PARALLEL_MIN_FILES, SummaryCache, hour_key, resolve_jobs
+from text_store import entry_text, prune_texts
+
+# Read size of the newline counter
+COUNT_BUFFER_SIZE = 1024 * 1024
+
+def count_lines(file_path, offset=0):
+    """Lines in a file from offset on (an unterminated last line counts), without decoding anything"""
+    lines = 0
+    last = b'\n'
+    with open_data_file(file_path) if is_compressed(file_path) else open(file_path, 'rb', buffering=0) as f:
+        if offset:
+            f.seek(offset)
+        while True:
+            chunk = f.read(COUNT_BUFFER_SIZE)
+            if not chunk:
+                break
+            lines += chunk.count(b'\n')
+            last = chunk[-1:]
+    if last != b'\n':
+        lines += 1
+    return lines
+
+def count_records(file_path, cache=None):
+    """
+    Records in one data file: archives from their header, JSONL files from an
+    up-to-date summary sidecar (plus any unsummarized tail), else a newline scan.
+    """
+    if is_archive(file_path):
+        from archive import archive_record_count
+        return archive_record_count(file_path)
+    
+    if cache is not None and is_compressed(file_path):
+        # Compressed days never change - any sidecar for this exact file holds the count
+        summary = cache.load_sidecar(file_path)
+        st = os.stat(file_path)
+        if summary is not None and (summary['size'], summary['mtime_ns']) == (st.st_size, st.st_mtime_ns):
+            return summary['prompts']
+    elif cache is not None:
+        summary = cache.get_index(file_path)
+        if summary is not None:
+            if summary['offset'] == summary['size']:
+                return summary['prompts']
+            return summary['prompts'] + count_lines(file_path, summary['offset'])
+    return count_lines(file_path)
+
+def count_files(file_paths, data_dir=None, jobs=0):
+    """
+    (files, bytes, records) over data files; unreadable files count as 0 records.
+    Many files are scanned on a thread pool - the reads release the GIL.
+    """
+    cache = SummaryCache(data_dir)
+    
+    def count(file_path):
+        try:
+            return os.path.getsize(file_path), count_records(file_path, cache)
+        except Exception:
+            try:
+                return os.path.getsize(file_path), 0
+            except OSError:
+                return 0, 0
+    
+    jobs = resolve_jobs(jobs)
+    if jobs > 1 and len(file_paths) >= PARALLEL_MIN_FILES:
+        from concurrent.futures import ThreadPoolExecutor
+        
+        with ThreadPoolExecutor(max_workers=min(jobs, len(file_paths))) as pool:
+            results = list(pool.map(count, file_paths))
+    else:
+        results = [count(file_path) for file_path in file_paths]
+    
+    return len(file_paths), sum(size for size, _ in results), sum(records for _, records in results)
+
+def entry_filter(start=None, end=None, word=None, text=None, data_dir=None):
+    """
+    Predicate picking the entries to purge: every given criterion must match.
+    start/end bound the hour key like report ranges, word is an indicator
+    word (any case) and text a case-sensitive substring of the prompt
+    (looked up in the text store for compact records).
+    """
+    if start is None and end is None and word is None and text is None:
+        raise ValueError("no purge criteria given")
+    start_key, end_key = range_keys(start, end)
+    word = word.lower() if word is not None else None
+    
+    def matches(entry):
+        if start_key or end_key:
+            key = hour_key(entry['timestamp'])
+            if (start_key and key < start_key) or (end_key and key > end_key):
+                return False
+        if word is not None and not any(found.lower() == word for found in entry.get('found_curses') or ()):
+            return False
+        if text is not None and text not in entry_text(entry, data_dir):
+            return False
+        return True
+    return matches
+
+def _tmp_path(file_path):
+    """Temp file next to a data file, so the rename is atomic"""
+    return f"{file_path}.{os.getpid()}.purge.tmp"
+
+def rewrite_jsonl(file_path, transform):
+    """
+    Rewrite the lines of a daily JSONL file through a temp file and an atomic
+    rename. transform(entry) returns the entry itself to keep its line as it
+    is, a replacement entry, or None to drop it. Lines that don't parse are
+    kept as they are. Anything the tracker appends while the file is
+    rewritten is carried over: the tail is copied under an exclusive fcntl
+    lock on the file, held until the rename, which append_record waits on.
+    Compressed days are streamed through the decompressor and written back
+    in the same format. Returns (kept, changed); the file is left alone if
+    nothing changed.
+    """
+    kept = 0
+    changed = 0
+    compression = compression_of(file_path)
+    tmp_path = _tmp_path(file_path)
+    lock_fd = None
+    try:
+        with open_data_file(file_path) as src, open_data_file(tmp_path, 'wb', compression) as dst:
+            for raw in src:
+                if not raw.endswith(b'\n'):
+                    # Still being written - copied with the tail below
+                    src.seek(-len(raw), os.SEEK_CUR)
+                    break
+                try:
+                    entry = json.loads(raw) if raw.strip() else None
+                    result = transform(entry) if entry is not None else entry
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    entry = result = None
+                if result is not entry:
+                    changed += 1
+                    if result is None:
+                        continue
+                    raw = (json.dumps(result, ensure_ascii=False) + '\n').encode('utf-8', 'surrogatepass')
+                kept += 1
+                dst.write(raw)
+            
+            if changed:
+                if compression is None and fcntl is not None:
+                    # Appends wait from here until the new file is in place
+                    lock_fd = os.dup(src.fileno())
+                    fcntl.flock(lock_fd, fcntl.LOCK_EX)
+                # Carry over the unterminated line and anything appended meanwhile
+                shutil.copyfileobj(src, dst)
+                while compression is None and os.path.getsize(file_path) > src.tell():
+                    shutil.copyfileobj(src, dst)
+            written = dst.tell()
+        
+        if changed:
+            with open(tmp_path, 'rb') as f:
+                os.fsync(f.fileno())
+        if not changed:
+            os.remove(tmp_path)
+        elif written:
+            shutil.copymode(file_path, tmp_path)
+            os.replace(tmp_path, file_path)
+        else:
+            os.remove(tmp_path)
+            os.remove(file_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    finally:
+        if lock_fd is not None:
+            # Closing the last descriptor of the old file drops the lock
+            os.close(lock_fd)
+    return kept, changed
+
+def purge_jsonl(file_path, matches):
+    """Drop the matching lines of a daily JSONL file (see rewrite_jsonl). Returns (kept, removed)."""
+    return rewrite_jsonl(file_path, lambda entry: None if matches(entry) else entry)
+
+def purge_archive(file_path, matches):
+    """
+    Drop the matching records of a compacted day: records are checked one at
+    a time and the kept ones copied column by column into a new archive.
+    Returns (kept, removed).
+    """
+    from array import array
+    from archive import PromptArchive
+    
+    with PromptArchive(file_path) as archive:
+        kept = array('I', (position for position in range(archive.count) if not matches(archive.entry(position))))
+        removed = archive.count - len(kept)
+        tmp_path = archive.write_subset(file_path, kept) if removed and kept else None
+    if tmp_path is not None:
+        os.replace(tmp_path, file_path)
+    elif removed:
+        os.remove(file_path)
+    return len(kept), removed
+
+def purge_entries(data_dir=None, start=None, end=None, word=None, text=None, on_error=None):
+    """
+    Remove the prompts matching every given criterion from the daily files
+    (and the SQLite database, if there is one). A date-only purge never opens
+    files outside the range. Rewritten files lose their cached summaries and
+    session/project index, and stored texts only the removed records
+    referred to are deleted too.
+    Returns (files changed, records removed).
+    """
+    data_dir = data_dir or get_data_dir()
+    matches = entry_filter(start, end, word, text, data_dir)
+    if word is None and text is None:
+        files = list_data_files(data_dir, start, end)
+    else:
+        files = list_data_files(data_dir)
+    
+    cache = SummaryCache(data_dir)
+    keys = KeyIndex(data_dir)
+    changed = 0
+    removed = 0
+    for file_path in files:
+        try:
+            if is_archive(file_path):
+                _kept, count = purge_archive(file_path, matches)
+            else:
+                _kept, count = purge_jsonl(file_path, matches)
+        except Exception as e:
+            if on_error:
+                on_error(file_path, e)
+            continue
+        if count:
+            changed += 1
+            removed += count
+            cache.forget(file_path)
+            keys.forget(file_path)
+    if removed:
+        prune_texts(data_dir)
+    
+    try:
+        from sqlite_store import purge_database
+        count = purge_database(data_dir, start, end, word, text)
+    except ImportError:
+        count = 0
+    if count:
+        changed += 1
+        removed += count
+    return changed, removed
+
+# Command line support
+if __name__ == "__main__":
+    import sys
+    from datetime import date
+    
+    args = sys.argv[1:]
+    
+    def option(flag):
+        return args[args.index(flag) + 1] if flag in args and args.index(flag) + 1 < len(args) else None
+    
+    if args and args[0] == "count":
+        files, size, records = count_files(list_data_files(get_data_dir()))
+        print(f"{files} files, {size} bytes, {records} records")
+    elif args and args[0] == "purge":
+        start = option('--start')
+        end = option('--end')
+        try:
+            changed, removed = purge_entries(
+                start=date.fromisoformat(start) if start else None,
+                end=date.fromisoformat(end) if end else None,
+                word=option('--word'), text=option('--containing'),
+                on_error=lambda path, e: print(f"Skipped {path}: {e}", file=sys.stderr))
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        print(f"Removed {removed} records from {changed} files")
+    else:
+        print("Usage: python3 purge.py [count|purge] [--start DATE] [--end DATE] [--word WORD] [--containing TEXT]")
+        print("  count - Files, bytes and records in the data directory")
+        print("  purge - Remove the prompts matching every given criterion")
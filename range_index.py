@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Prefix-sum range index for Biomass Conversion Index Monitoring System
+Keeps cumulative daily totals (prompts, breaches and one dense array per
+indicator word, indexed by day number) for the closed days in the cache
+dir, so the totals of any date range are two lookups per array and moving
+averages of the Harmony Deviation Index need no scan at all. The index
+grows from the summary cache as days close; days still being written are
+added from their summaries at query time.
+"""
+import json
+import os
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from config import get_cache_dir, get_data_dir
+from prompt_store import file_date, hour_number, list_data_files
+from rotation import ROTATE_MIN_AGE
+from summary_cache import SummaryCache, SummaryParseError
+
+RANGE_INDEX_FILE = "range_index.json"
+# Bump when the index layout changes - an old index is then rebuilt from the summaries
+RANGE_INDEX_VERSION = 2
+# Moving-average windows of the trend report, in days
+TREND_WINDOWS = [7, 30, 90]
+
+def day_number(day):
+    """Days since 1970-01-01 for a date"""
+    return day.toordinal() - date(1970, 1, 1).toordinal()
+
+def day_of(number):
+    """Date of a day number"""
+    return date(1970, 1, 1) + timedelta(days=number)
+
+def daily_totals(summary, totals=None):
+    """{day number: [prompts, breaches, Counter of words]} from a file summary's hourly buckets"""
+    if totals is None:
+        totals = {}
+    for key, hour in summary['hours'].items():
+        day = hour_number(key) // 24
+        day_totals = totals.get(day)
+        if day_totals is None:
+            day_totals = totals[day] = [0, 0, Counter()]
+        day_totals[0] += hour['prompts']
+        day_totals[1] += hour['curses']
+        day_totals[2].update(hour['words'])
+    return totals
+
+def _fingerprint(file_path):
+    """What identifies the indexed content of a data file"""
+    st = os.stat(file_path)
+    return [os.path.basename(file_path), st.st_size, st.st_mtime_ns]
+
+class RangeIndex:
+    """
+    Cumulative totals over the closed days: prompts[i] is the number of
+    prompts on days first_day .. first_day + i - 1, likewise curses and
+    words[word]. Only whole, settled files go in (oldest first), so the
+    index never has to take a file back out unless the file is rewritten,
+    which rebuilds it from the summary cache.
+    """
+    def __init__(self, data_dir=None):
+        self.data_dir = data_dir or get_data_dir()
+        self.path = os.path.join(get_cache_dir(self.data_dir), RANGE_INDEX_FILE)
+        self.cache = SummaryCache(self.data_dir)
+        self._reset()
+        # What the last refresh did
+        self.rebuilt = False
+        self.extended = 0
+    
+    def _reset(self):
+        """Empty index"""
+        self.first_day = None
+        self.files = []
+        self.prompts = [0]
+        self.curses = [0]
+        self.words = {}
+        self.dir_mtime_ns = None
+    
+    def _load(self):
+        """Read the persisted index; False if there is none or it is stale"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') != RANGE_INDEX_VERSION:
+                return False
+            self.first_day = state['first_day']
+            self.files = state['files']
+            self.prompts = state['prompts']
+            self.curses = state['curses']
+            self.words = state['words']
+            self.dir_mtime_ns = state['dir_mtime_ns']
+            return True
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            self._reset()
+            return False
+    
+    def _save(self):
+        """Write the index atomically (it is only a cache of the summaries)"""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": RANGE_INDEX_VERSION, "first_day": self.first_day, "files": self.files,
+                           "dir_mtime_ns": self.dir_mtime_ns, "prompts": self.prompts,
+                           "curses": self.curses, "words": self.words}, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+    
+    def _still_valid(self, files, dir_mtime_ns):
+        """Whether the indexed files are still the first data files, unchanged"""
+        names = [os.path.basename(file_path) for file_path in files[:len(self.files)]]
+        if names != [name for name, _size, _mtime in self.files]:
+            return False
+        if dir_mtime_ns == self.dir_mtime_ns:
+            # Nothing was created, removed or renamed since the index was saved
+            return True
+        try:
+            return all(_fingerprint(file_path) == list(indexed) for file_path, indexed in zip(files, self.files))
+        except OSError:
+            return False
+    
+    def _extend(self, totals):
+        """Add {day number: [prompts, breaches, words]} to the cumulative arrays"""
+        days = sorted(totals)
+        if self.first_day is None:
+            self.first_day = days[0]
+        if days[0] < self.first_day:
+            # Earlier than anything indexed - shift everything right
+            shift = self.first_day - days[0]
+            self.prompts = [0] * shift + self.prompts
+            self.curses = [0] * shift + self.curses
+            for word, counts in self.words.items():
+                self.words[word] = [0] * shift + counts
+            self.first_day = days[0]
+        
+        length = days[-1] - self.first_day + 2
+        for counts in [self.prompts, self.curses] + list(self.words.values()):
+            counts.extend([counts[-1]] * (length - len(counts)))
+        
+        # One running pass per array adds each day's delta to every later prefix
+        positions = [day - self.first_day + 1 for day in days]
+        for column, counts in ((0, self.prompts), (1, self.curses)):
+            self._add_deltas(counts, positions, [totals[day][column] for day in days])
+        words = set()
+        for day in days:
+            words.update(totals[day][2])
+        for word in words:
+            counts = self.words.get(word)
+            if counts is None:
+                counts = self.words[word] = [0] * len(self.prompts)
+            self._add_deltas(counts, positions, [totals[day][2].get(word, 0) for day in days])
+    
+    @staticmethod
+    def _add_deltas(counts, positions, deltas):
+        """Add each delta to a cumulative array from its (sorted) position on"""
+        running = 0
+        pending = 0
+        for position in range(positions[0], len(counts)):
+            while pending < len(positions) and positions[pending] == position:
+                running += deltas[pending]
+                pending += 1
+            if running:
+                counts[position] += running
+    
+    def refresh(self, now=None):
+        """
+        Bring the index up to date and return the data files it doesn't
+        cover (today's, and any closed in the last few minutes).
+        """
+        now = now if now is not None else time.time()
+        today = date.fromtimestamp(now)
+        files = list_data_files(self.data_dir)
+        try:
+            dir_mtime_ns = os.stat(self.data_dir).st_mtime_ns
+        except OSError:
+            # No data dir - nothing to index, and nothing gets created for it
+            self._reset()
+            return files
+        
+        if not self._load() or not self._still_valid(files, dir_mtime_ns):
+            self._reset()
+            self.rebuilt = True
+        
+        totals = {}
+        indexed = position = len(self.files)
+        while position < len(files):
+            file_path = files[position]
+            day = file_date(file_path)
+            try:
+                # Closed and settled, or it is left for query time with everything after it
+                if day is None or day >= today or now - os.path.getmtime(file_path) < ROTATE_MIN_AGE:
+                    break
+                fingerprint = _fingerprint(file_path)
+                summary = self.cache.get_summary(file_path)
+            except (SummaryParseError, OSError):
+                # Reported when it is read at query time
+                break
+            daily_totals(summary, totals)
+            self.files.append(fingerprint)
+            position += 1
+        
+        self.extended = position - indexed
+        if totals:
+            self._extend(totals)
+        if totals or self.rebuilt or dir_mtime_ns != self.dir_mtime_ns:
+            self.dir_mtime_ns = dir_mtime_ns
+            self._save()
+        return files[position:]
+    
+    def totals(self, first_day, last_day):
+        """(prompts, breaches, Counter of words) on days first_day .. last_day (day numbers, inclusive)"""
+        if self.first_day is None:
+            return 0, 0, Counter()
+        start = min(max(first_day - self.first_day, 0), len(self.prompts) - 1)
+        end = min(max(last_day - self.first_day + 1, 0), len(self.prompts) - 1)
+        if end <= start:
+            return 0, 0, Counter()
+        words = Counter()
+        for word, counts in self.words.items():
+            count = counts[end] - counts[start]
+            if count:
+                words[word] = count
+        return self.prompts[end] - self.prompts[start], self.curses[end] - self.curses[start], words
+
+class RangeQuery:
+    """Range totals from the index plus the days it doesn't cover yet (read from their summaries)"""
+    def __init__(self, data_dir=None, on_error=None):
+        self.index = RangeIndex(data_dir)
+        self.recent = {}
+        # Data files the index doesn't cover yet
+        self.pending = self.index.refresh()
+        for file_path in self.pending:
+            try:
+                summary = self.index.cache.get_summary(file_path)
+            except SummaryParseError as e:
+                # The lines before the error still count
+                summary = e.summary
+                if on_error:
+                    on_error(file_path, e.error)
+            except OSError as e:
+                if on_error:
+                    on_error(file_path, e)
+                continue
+            daily_totals(summary, self.recent)
+    
+    def totals(self, first=None, last=None):
+        """(prompts, breaches, Counter of words) on the days first .. last (dates, inclusive; None is open-ended)"""
+        first_day = day_number(first) if first is not None else -(1 << 31)
+        last_day = day_number(last) if last is not None else 1 << 31
+        prompts, curses, words = self.index.totals(first_day, last_day)
+        for day, (day_prompts, day_curses, day_words) in self.recent.items():
+            if first_day <= day <= last_day:
+                prompts += day_prompts
+                curses += day_curses
+                words.update(day_words)
+        return prompts, curses, words
+    
+    def stats(self, first=None, last=None):
+        """Statistics for the total period over first .. last, laid out as rollup() lays them out"""
+        prompts, curses, words = self.totals(first, last)
+        return {
+            "total_prompts": prompts,
+            "total_curses": curses,
+            "average_curses_per_prompt": curses / prompts if prompts > 0 else 0,
+            "stats_by_period": {"total": {"prompts": prompts, "curses": curses, "curse_words": words}} if prompts else {}
+        }
+    
+    def first_date(self):
+        """Earliest day with prompts (a date), or None without any"""
+        days = [day for day, (prompts, _curses, _words) in self.recent.items() if prompts]
+        if self.index.first_day is not None:
+            days.append(self.index.first_day)
+        return day_of(min(days)) if days else None
+    
+    def moving_average(self, day, window):
+        """Harmony Deviation Index over the window days ending on day (breaches per prompt), or None without prompts"""
+        prompts, curses, _words = self.totals(day - timedelta(days=window - 1), day)
+        return curses / prompts if prompts else None
+
+def remove_range_index(data_dir=None):
+    """Delete the persisted index (e.g. when purging all data)"""
+    path = os.path.join(get_cache_dir(data_dir), RANGE_INDEX_FILE)
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+
+# Command line support
+if __name__ == "__main__":
+    import sys
+    
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command in ("status", "rebuild"):
+        index = RangeIndex()
+        if command == "rebuild":
+            remove_range_index(index.data_dir)
+        pending = index.refresh()
+        if index.first_day is None:
+            print("Index: empty")
+        else:
+            print(f"Index: {len(index.files)} files, days {day_of(index.first_day)} .. {day_of(index.first_day + len(index.prompts) - 2)}, "
+                  f"{len(index.words)} indicator words, {index.prompts[-1]} prompts")
+        print(f"Not indexed yet: {len(pending)} files{' (rebuilt)' if index.rebuilt else ''}")
+    else:
+        print("Usage: python3 range_index.py [status|rebuild]")
+        print("  status  - Bring the index up to date and show what it covers")
+        print("  rebuild - Build it again from the summary cache")
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Multi-granularity rollup for Biomass Conversion Index Monitoring System
+Builds hourly buckets in one scan and rolls them up to every coarser
+reporting period, so daily, weekly and monthly views share a single pass
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+
+from prompt_store import StatsRecord, hour_number_key, range_keys
+
+# Finest first; every period is a rollup of the hourly buckets
+PERIODS = ['hourly', 'daily', 'weekly', 'monthly', 'total']
+
+def period_key(hour, period, _weeks={}):
+    """Map an hourly bucket key ('YYYY-MM-DD HH') to its reporting period key"""
+    if period == "daily":
+        return hour[:10]
+    elif period == "weekly":
+        day = hour[:10]
+        key = _weeks.get(day)
+        if key is None:
+            # Get Monday of the week
+            dt = datetime.strptime(day, "%Y-%m-%d")
+            monday = dt - timedelta(days=dt.weekday())
+            key = _weeks[day] = f"Week of {monday.strftime('%Y-%m-%d')}"
+        return key
+    elif period == "monthly":
+        return hour[:7]
+    elif period == "hourly":
+        return f"{hour}:00"
+    return "total"
+
+def new_bucket(word_counter=Counter):
+    """Empty stats bucket (word_counter makes its word counts, e.g. sketches.WordSketches)"""
+    return {"prompts": 0, "curses": 0, "curse_words": word_counter()}
+
+def hourly_buckets(records, word_counter=Counter):
+    """
+    One pass over StatsRecords (or entry dicts) into hourly buckets keyed
+    'YYYY-MM-DD HH'. Records are grouped by their hour number; each key is
+    formatted once per bucket.
+    """
+    by_hour = {}
+    for record in records:
+        if type(record) is not StatsRecord:
+            record = StatsRecord.from_entry(record)
+        bucket = by_hour.get(record.epoch_hour)
+        if bucket is None:
+            bucket = by_hour[record.epoch_hour] = new_bucket(word_counter)
+        bucket["prompts"] += 1
+        bucket["curses"] += record.curse_count
+        if record.found_curses:
+            bucket["curse_words"].update(record.found_curses)
+    return {hour_number_key(hour): bucket for hour, bucket in by_hour.items()}
+
+def hourly_buckets_from_summaries(summaries, start=None, end=None, buckets=None, word_counter=Counter):
+    """
+    Hourly buckets from per-file summaries (see summary_cache), limited to
+    [start, end]. Pass buckets to add the summaries into existing ones.
+    """
+    start_key, end_key = range_keys(start, end)
+    if buckets is None:
+        buckets = {}
+    for summary in summaries:
+        for key, hour in summary['hours'].items():
+            if start_key and key < start_key:
+                continue
+            if end_key and key > end_key:
+                continue
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = new_bucket(word_counter)
+            bucket["prompts"] += hour['prompts']
+            bucket["curses"] += hour['curses']
+            bucket["curse_words"].update(hour['words'])
+    return buckets
+
+def rollup(buckets, periods=PERIODS, word_counter=Counter):
+    """
+    Roll hourly buckets up to each requested period.
+    Returns {period: stats} with the same layout calculate_stats produces.
+    """
+    total_prompts = 0
+    total_curses = 0
+    by_period = {period: {} for period in periods}
+    
+    for hour in sorted(buckets):
+        bucket = buckets[hour]
+        total_prompts += bucket["prompts"]
+        total_curses += bucket["curses"]
+        for period in periods:
+            key = period_key(hour, period)
+            period_stats = by_period[period].get(key)
+            if period_stats is None:
+                period_stats = by_period[period][key] = new_bucket(word_counter)
+            period_stats["prompts"] += bucket["prompts"]
+            period_stats["curses"] += bucket["curses"]
+            period_stats["curse_words"].update(bucket["curse_words"])
+    
+    average = total_curses / total_prompts if total_prompts > 0 else 0
+    return {
+        period: {
+            "total_prompts": total_prompts,
+            "total_curses": total_curses,
+            "average_curses_per_prompt": average,
+            "stats_by_period": by_period[period]
+        }
+        for period in periods
+    }
+
+def merge_stats(stats, newer):
+    """
+    Add rollup() output for more hourly buckets into earlier rollup() output
+    of the same periods, in place - a running report never rolls its whole
+    history up again
+    """
+    for period, added in newer.items():
+        target = stats[period]
+        target["total_prompts"] += added["total_prompts"]
+        target["total_curses"] += added["total_curses"]
+        prompts = target["total_prompts"]
+        target["average_curses_per_prompt"] = target["total_curses"] / prompts if prompts > 0 else 0
+        by_period = target["stats_by_period"]
+        for key, bucket in added["stats_by_period"].items():
+            period_stats = by_period.get(key)
+            if period_stats is None:
+                by_period[key] = bucket
+                continue
+            period_stats["prompts"] += bucket["prompts"]
+            period_stats["curses"] += bucket["curses"]
+            period_stats["curse_words"].update(bucket["curse_words"])
+    return stats
+
+def calculate_all_stats(entries, periods=PERIODS):
+    """Statistics for every requested period from a single pass over the entries"""
+    return rollup(hourly_buckets(entries), periods)
+
+def parse_periods(value):
+    """Parse a period list ('all' or comma separated names), keeping the order given"""
+    if value == "all":
+        return list(PERIODS)
+    periods = []
+    for name in value.split(','):
+        name = name.strip().lower()
+        if name not in PERIODS:
+            raise ValueError(name)
+        if name not in periods:
+            periods.append(name)
+    return periods
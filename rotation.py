@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Rotation of closed days for Biomass Conversion Index Monitoring System
+Compresses closed prompts_YYYY-MM-DD.jsonl days with gzip or lzma and
+enforces the retention limits (max age, max total size) from the config.
+A small ledger of closed days and their sizes in the cache dir means each
+run only looks at the days closed since the last one instead of rescanning
+the whole data dir.
+"""
+import json
+import os
+import time
+from datetime import date, timedelta
+
+from config import get_cache_dir, get_data_dir, get_rotation_policy
+from key_index import KeyIndex
+from prompt_store import (COMPRESSION_SUFFIXES, DATA_FILE_PREFIX, DATA_FILE_SUFFIX, DATA_SUFFIXES,
+                          file_date, is_compressed, list_data_files, open_data_file)
+from summary_cache import SummaryCache
+from text_store import TextRefs, get_text_dir, prune_texts
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+ROTATION_STATE_FILE = "rotation.json"
+ROTATION_LOCK_FILE = "rotation.lock"
+# Bump when the ledger layout changes - an old ledger is then rebuilt by one scan
+ROTATION_STATE_VERSION = 1
+# Days touched more recently than this may still be written to (e.g. by the spool flusher)
+ROTATE_MIN_AGE = 300
+COPY_BUFFER_SIZE = 1024 * 1024
+
+class RotationError(Exception):
+    """A day could not be compressed safely"""
+
+def compress_file(file_path, compression, cache=None, refs=None):
+    """
+    Compress a closed daily JSONL file in one streaming pass through a temp
+    file, check nothing changed meanwhile, then swap it in for the original
+    (carrying its cached summary and text hashes over). Returns (new path,
+    old size, new size).
+    """
+    target = file_path + COMPRESSION_SUFFIXES[compression]
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    st = os.stat(file_path)
+    copied = 0
+    try:
+        with open(file_path, 'rb') as src, open_data_file(tmp_path, 'wb', compression) as dst:
+            while True:
+                chunk = src.read(COPY_BUFFER_SIZE)
+                if not chunk:
+                    break
+                dst.write(chunk)
+                copied += len(chunk)
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        
+        current = os.stat(file_path)
+        if copied != st.st_size or (current.st_size, current.st_mtime_ns) != (st.st_size, st.st_mtime_ns):
+            raise RotationError(f"{file_path}: changed while compressing")
+        os.replace(tmp_path, target)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    
+    if cache is not None:
+        cache.transfer(file_path, target)
+    if refs is not None:
+        refs.transfer(file_path, target)
+    os.remove(file_path)
+    return target, st.st_size, os.path.getsize(target)
+
+class Rotation:
+    """One rotation run over a data dir"""
+    def __init__(self, data_dir=None, policy=None, today=None):
+        self.data_dir = data_dir or get_data_dir()
+        self.policy = policy or get_rotation_policy()
+        self.today = today or date.today()
+        self.cache = SummaryCache(self.data_dir)
+        self.keys = KeyIndex(self.data_dir)
+        # Text hashes per day, only kept when there is a text store
+        self.refs = TextRefs(self.data_dir) if os.path.isdir(get_text_dir(self.data_dir)) else None
+        self.state_path = os.path.join(get_cache_dir(self.data_dir), ROTATION_STATE_FILE)
+        
+        # What this run did
+        self.compressed = 0
+        self.bytes_saved = 0
+        self.deleted = 0
+        self.texts_deleted = 0
+        self.errors = []
+        # Text hashes of the deleted days, pruned from the text store at the end
+        self.expired_hashes = set()
+    
+    def _load_state(self):
+        """The ledger, or None if it has to be rebuilt"""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') == ROTATION_STATE_VERSION:
+                return state
+        except (OSError, ValueError, AttributeError):
+            pass
+        return None
+    
+    def _save_state(self, state):
+        """Write the ledger atomically (it is only a cache of the file sizes)"""
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError:
+            pass
+    
+    def _stem(self, day):
+        """Data file path of a day, without suffix"""
+        return os.path.join(self.data_dir, f"{DATA_FILE_PREFIX}{day}")
+    
+    def _day_file(self, day):
+        """The form a day is read from (see list_data_files), or None if it has none"""
+        stem = self._stem(day)
+        for suffix in reversed(DATA_SUFFIXES):
+            if os.path.exists(stem + suffix):
+                return stem + suffix
+        return None
+    
+    def _closed_days(self, state):
+        """Days to look at: every closed day on the first run, afterwards those closed since"""
+        if state is None or not state.get('checked_through'):
+            days = set()
+            for file_path in list_data_files(self.data_dir):
+                day = file_date(file_path)
+                if day is not None and day < self.today:
+                    days.add(day)
+            return sorted(days)
+        
+        day = date.fromisoformat(state['checked_through']) + timedelta(days=1)
+        days = []
+        while day < self.today:
+            days.append(day)
+            day += timedelta(days=1)
+        return days
+    
+    def _rotate_day(self, day):
+        """Compress one closed day if due; returns its size on disk, or None to retry later"""
+        file_path = self._day_file(day.isoformat())
+        if file_path is None:
+            return 0
+        compression = self.policy['compression']
+        if compression and file_path.endswith(DATA_FILE_SUFFIX):
+            if time.time() - os.path.getmtime(file_path) < ROTATE_MIN_AGE:
+                return None
+        if self.refs is not None:
+            # Read while it is plain JSONL - compressing carries the hashes over
+            try:
+                self.refs.hashes(file_path)
+            except Exception as e:
+                self.errors.append((file_path, e))
+        if compression and file_path.endswith(DATA_FILE_SUFFIX):
+            try:
+                compressed_path, old_size, new_size = compress_file(file_path, compression, self.cache, self.refs)
+            except (RotationError, OSError) as e:
+                # Left uncompressed rather than holding up every later day
+                self.errors.append((file_path, e))
+                return os.path.getsize(file_path)
+            self.keys.forget(file_path)
+            file_path = compressed_path
+            self.compressed += 1
+            self.bytes_saved += old_size - new_size
+        return os.path.getsize(file_path)
+    
+    def _delete_day(self, day):
+        """Remove every form of a day, its cached summaries and its session/project index"""
+        stem = self._stem(day)
+        for suffix in DATA_SUFFIXES:
+            if self.refs is not None and os.path.exists(stem + suffix):
+                try:
+                    self.expired_hashes.update(self.refs.hashes(stem + suffix))
+                except Exception as e:
+                    # Its texts stay until the next purge or prune - the day still goes
+                    self.errors.append((stem + suffix, e))
+            try:
+                os.remove(stem + suffix)
+            except OSError:
+                continue
+            self.cache.forget(stem + suffix)
+            self.keys.forget(stem + suffix)
+            if self.refs is not None:
+                self.refs.forget(stem + suffix)
+        self.deleted += 1
+    
+    def run(self):
+        """Compress newly closed days, then delete the oldest beyond the retention limits"""
+        state = self._load_state()
+        days = dict(state['days']) if state else {}
+        checked_through = state.get('checked_through') if state else None
+        
+        for day in self._closed_days(state):
+            size = self._rotate_day(day)
+            if size is None:
+                # Still settling - start from this day next time
+                break
+            if size:
+                days[day.isoformat()] = size
+            checked_through = day.isoformat()
+        
+        max_age = self.policy['max_age_days']
+        if max_age:
+            cutoff = (self.today - timedelta(days=max_age)).isoformat()
+            for day in sorted(days):
+                if day >= cutoff:
+                    break
+                self._delete_day(day)
+                del days[day]
+        
+        max_total = self.policy['max_total_bytes']
+        if max_total:
+            total = sum(days.values())
+            for day in sorted(days):
+                if total <= max_total:
+                    break
+                self._delete_day(day)
+                total -= days.pop(day)
+        
+        self._save_state({"version": ROTATION_STATE_VERSION, "checked_through": checked_through,
+                          "days": sorted(days.items())})
+        
+        if self.expired_hashes:
+            # Texts only the deleted days referred to go with them
+            self.texts_deleted = prune_texts(self.data_dir, self.expired_hashes, self.refs)
+        elif self.refs is not None:
+            self.refs.save()
+        return self
+
+def rotation_enabled(policy=None):
+    """Whether the policy asks for anything at all"""
+    policy = policy or get_rotation_policy()
+    return any(policy.values())
+
+def rotate(data_dir=None, policy=None):
+    """
+    Run rotation unless another run holds the lock.
+    Returns the finished Rotation, or None if one was already running.
+    """
+    data_dir = data_dir or get_data_dir()
+    lock_path = os.path.join(get_cache_dir(data_dir), ROTATION_LOCK_FILE)
+    fd = None
+    if fcntl is not None:
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return None
+    try:
+        return Rotation(data_dir, policy).run()
+    finally:
+        if fd is not None:
+            os.close(fd)
+
+# Command line support
+if __name__ == "__main__":
+    import sys
+    
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "run":
+        rotation = rotate()
+        if rotation is None:
+            print("Rotation already running")
+            sys.exit(0)
+        for file_path, error in rotation.errors:
+            print(f"Skipped {os.path.basename(file_path)}: {error}")
+        print(f"Compressed {rotation.compressed} days (saved {rotation.bytes_saved} bytes), deleted {rotation.deleted} days "
+              f"and {rotation.texts_deleted} stored texts")
+    elif command == "status":
+        policy = get_rotation_policy()
+        files = list_data_files(get_data_dir())
+        compressed = [file_path for file_path in files if is_compressed(file_path)]
+        print(f"Policy: compression={policy['compression'] or 'off'}, max age={policy['max_age_days'] or 'none'} days, "
+              f"max size={policy['max_total_bytes'] or 'none'} bytes")
+        print(f"Days: {len(files)} ({len(compressed)} compressed), {sum(os.path.getsize(f) for f in files)} bytes")
+    else:
+        print("Usage: python3 rotation.py [run|status]")
+        print("  run    - Compress closed days and apply the retention limits now")
+        print("  status - Show the policy and what is on disk")
+        print("  (set the policy with: python3 config.py rotation <gzip|lzma|off> [days] [MB])")
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Bounded-memory word counters for Biomass Conversion Index Monitoring System
+Space-Saving keeps the k heaviest indicator words of a bucket in k counters
+however large the vocabulary, and Count-Min estimates the frequency of any
+word over the whole report in a fixed table. Both merge, so rollups work on
+them like on Counters. They live for one report: the summary cache keeps
+exact hourly word counts (--merge and the range index need them to add up),
+and a sketch report folds those in rather than storing sketches of its own.
+
+Error bounds, for N word occurrences counted:
+  Space-Saving(k): every listed count is an upper bound and at most N/k
+    too high (count - error is a lower bound); a word that isn't listed
+    occurred at most `floor` times. Merging keeps both bounds.
+  Count-Min(width, depth): an estimate is never too low, and is more than
+    e/width * N too high with probability at most exp(-depth).
+"""
+import hashlib
+import heapq
+import math
+from array import array
+from collections.abc import Mapping
+
+# Report defaults: 32 counters per bucket for a top 3; Count-Min within 0.1% of N, 99% of the time
+DEFAULT_TOP_K = 32
+DEFAULT_EPSILON = 0.001
+DEFAULT_DELTA = 0.01
+
+class CountMin:
+    """Count-Min sketch: depth rows of width counters, one hashed cell per row and word"""
+    def __init__(self, width=None, depth=None, epsilon=DEFAULT_EPSILON, delta=DEFAULT_DELTA):
+        self.width = width or math.ceil(math.e / epsilon)
+        self.depth = depth or math.ceil(math.log(1 / delta))
+        self.rows = [array('q', bytes(8 * self.width)) for _ in range(self.depth)]
+        self.total = 0
+    
+    def _columns(self, word):
+        """Cell of the word in each row (double hashing of one stable digest - no per-word state)"""
+        digest = hashlib.blake2b(word.encode('utf-8', 'surrogatepass'), digest_size=8).digest()
+        first = int.from_bytes(digest[:4], 'little')
+        step = int.from_bytes(digest[4:], 'little') | 1
+        return [(first + row * step) % self.width for row in range(self.depth)]
+    
+    def add(self, word, count=1):
+        """Count occurrences of a word"""
+        for row, column in zip(self.rows, self._columns(word)):
+            row[column] += count
+        self.total += count
+    
+    def estimate(self, word):
+        """Upper bound on how often a word occurred (see the module docstring for how close)"""
+        return min(row[column] for row, column in zip(self.rows, self._columns(word)))
+    
+    def merge(self, other):
+        """Add another sketch of the same shape"""
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Count-Min sketches of different shapes can't be merged")
+        for row, other_row in zip(self.rows, other.rows):
+            for column, count in enumerate(other_row):
+                if count:
+                    row[column] += count
+        self.total += other.total
+        return self
+
+class SpaceSaving:
+    """
+    Space-Saving top-k counter with the update()/items() interface the
+    rollup uses on Counters. update() takes a list of words, a word -> count
+    mapping or another SpaceSaving (merged). With a shared Count-Min,
+    newly counted words are added to it too and listed counts are capped
+    by its estimate (both are upper bounds, the smaller is tighter).
+    """
+    __slots__ = ('k', 'counts', 'errors', 'floor', 'frequency')
+    
+    def __init__(self, k=DEFAULT_TOP_K, frequency=None):
+        self.k = k
+        self.counts = {}
+        # How much each count may be too high (only non-zero errors are kept)
+        self.errors = {}
+        # Upper bound on the count of any word not in counts
+        self.floor = 0
+        self.frequency = frequency
+    
+    def _add(self, word, count):
+        """Weighted Space-Saving step"""
+        counts = self.counts
+        if word in counts:
+            counts[word] += count
+        elif len(counts) < self.k:
+            counts[word] = self.floor + count
+            if self.floor:
+                self.errors[word] = self.floor
+        else:
+            # Replace the smallest counter (ties go to the longest listed, so every run agrees)
+            evicted = min(counts, key=counts.__getitem__)
+            smallest = counts.pop(evicted)
+            self.errors.pop(evicted, None)
+            self.floor = max(self.floor, smallest)
+            counts[word] = smallest + count
+            self.errors[word] = smallest
+    
+    def update(self, words):
+        """Count a list of words, a word -> count mapping, or merge another SpaceSaving"""
+        if isinstance(words, SpaceSaving):
+            self.merge(words)
+            return
+        pairs = words.items() if isinstance(words, Mapping) else ((word, 1) for word in words)
+        for word, count in pairs:
+            self._add(word, count)
+            if self.frequency is not None:
+                self.frequency.add(word, count)
+    
+    def merge(self, other):
+        """
+        Combine with a sketch of another part of the stream: a word's bounds
+        are the sums of its bounds in each (floor where it isn't listed), and
+        the k largest are kept
+        """
+        counts = self.counts
+        if not self.floor and not other.floor and len(counts) + sum(1 for word in other.counts if word not in counts) <= self.k:
+            # Both still exact and the union fits - add like Counters
+            for word, count in other.counts.items():
+                counts[word] = counts.get(word, 0) + count
+            return self
+        if not other.floor and not other.errors:
+            # The other one is exact (say an hour) - count its words like its stream
+            for word, count in other.counts.items():
+                self._add(word, count)
+            return self
+        
+        other_counts = other.counts
+        combined = {word: count + other_counts.get(word, other.floor) for word, count in counts.items()}
+        for word, count in other_counts.items():
+            if word not in counts:
+                combined[word] = self.floor + count
+        # The k largest, and the largest left out (it bounds every word dropped here)
+        ranked = heapq.nsmallest(self.k + 1, combined.items(), key=lambda item: (-item[1], item[0]))
+        
+        def error(sketch, word):
+            return sketch.errors.get(word, 0) if word in sketch.counts else sketch.floor
+        
+        kept = dict(ranked[:self.k])
+        errors = {word: error(self, word) + error(other, word) for word in kept}
+        self.floor = max([self.floor + other.floor] + [count for _, count in ranked[self.k:self.k + 1]])
+        self.counts = kept
+        self.errors = {word: value for word, value in errors.items() if value}
+        return self
+    
+    def items(self):
+        """(word, count) for the listed words - upper bounds, capped by the Count-Min estimate"""
+        if self.frequency is None:
+            return list(self.counts.items())
+        return [(word, min(count, self.frequency.estimate(word))) for word, count in self.counts.items()]
+    
+    def __len__(self):
+        return len(self.counts)
+    
+    def __bool__(self):
+        return bool(self.counts)
+
+class WordSketches:
+    """Bucket word counter factory for the rollup: one SpaceSaving per bucket, one Count-Min for the report"""
+    def __init__(self, k=DEFAULT_TOP_K, epsilon=DEFAULT_EPSILON, delta=DEFAULT_DELTA):
+        self.k = k
+        self.frequency = CountMin(epsilon=epsilon, delta=delta)
+    
+    def __call__(self):
+        return SpaceSaving(self.k, self.frequency)
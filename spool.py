@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Prompt event spool for Biomass Conversion Index Monitoring System
+In spool mode the tracker hook echoes the prompt, drops the raw event into
+a spool directory and exits; a background flusher matches the spooled
+events and appends them to the daily files in batches (group commit).
+Events stay in the spool until their batch is committed, and a journal
+lets a restarted flusher tell which events of an interrupted batch made it,
+so a crash neither loses nor duplicates anything.
+"""
+import json
+import os
+import time
+
+from config import get_config, get_data_dir
+from prompt_store import DATA_FILE_PREFIX, DATA_FILE_SUFFIX, append_record
+
+SPOOL_DIR_NAME = "spool"
+EVENT_SUFFIX = ".event"
+LOCK_NAME = "flush.lock"
+JOURNAL_NAME = "journal.json"
+
+# always: fsync every spooled event and every batch
+# batch:  fsync each batch before its events leave the spool (survives process crashes)
+# never:  leave it to the OS (survives process crashes, not power loss)
+FSYNC_POLICIES = ['always', 'batch', 'never']
+DEFAULT_FSYNC_POLICY = 'batch'
+DEFAULT_FLUSH_INTERVAL = 1.0  # seconds the flusher waits to gather a batch
+FLUSHER_IDLE_TIMEOUT = 30  # seconds with an empty spool before the flusher exits
+MAX_BATCH = 10000
+
+def spool_enabled():
+    """Whether the hook should spool events (BIOMASS_SPOOL overrides the config file)"""
+    value = os.environ.get('BIOMASS_SPOOL')
+    if value is not None:
+        return value.lower() in ('1', 'true', 'yes', 'on')
+    return bool(get_config().config.get('spool'))
+
+def get_flush_interval():
+    """Seconds between group commits (BIOMASS_SPOOL_FLUSH_INTERVAL or "spool_flush_interval")"""
+    value = os.environ.get('BIOMASS_SPOOL_FLUSH_INTERVAL') or get_config().config.get('spool_flush_interval')
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return DEFAULT_FLUSH_INTERVAL
+
+def get_fsync_policy():
+    """fsync policy (BIOMASS_SPOOL_FSYNC or "spool_fsync"), one of FSYNC_POLICIES"""
+    policy = os.environ.get('BIOMASS_SPOOL_FSYNC') or get_config().config.get('spool_fsync')
+    return policy if policy in FSYNC_POLICIES else DEFAULT_FSYNC_POLICY
+
+def get_spool_dir(data_dir=None):
+    """Spool directory - inside the data dir so renames into it are atomic"""
+    return os.path.join(data_dir or get_data_dir(), SPOOL_DIR_NAME)
+
+def _fsync_dir(path):
+    """Make a rename or unlink in a directory durable"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def spool_event(timestamp, prompt, data_dir=None, fsync_policy=None):
+    """
+    Hand one raw prompt event to the spool: written to a temp file and
+    renamed into place, so the flusher never sees a partial event.
+    Events are named by time so the flusher commits them in order.
+    """
+    spool_dir = get_spool_dir(data_dir)
+    os.makedirs(spool_dir, exist_ok=True)
+    name = f"{time.time_ns():020d}-{os.getpid()}"
+    tmp_path = os.path.join(spool_dir, f"{name}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(json.dumps({"timestamp": timestamp, "prompt": prompt}, ensure_ascii=False).encode('utf-8', 'surrogatepass'))
+        if (fsync_policy or get_fsync_policy()) == 'always':
+            f.flush()
+            os.fsync(f.fileno())
+    path = os.path.join(spool_dir, f"{name}{EVENT_SUFFIX}")
+    os.replace(tmp_path, path)
+    return path
+
+def pending_events(spool_dir):
+    """Spooled event file names, oldest first"""
+    try:
+        return sorted(name for name in os.listdir(spool_dir) if name.endswith(EVENT_SUFFIX))
+    except OSError:
+        return []
+
+def daily_file(data_dir, timestamp):
+    """Daily JSONL file an event with this timestamp belongs to"""
+    return os.path.join(data_dir, f"{DATA_FILE_PREFIX}{timestamp[:10]}{DATA_FILE_SUFFIX}")
+
+class FlushLock:
+    """Exclusive flusher lock (fcntl.flock on a file in the spool dir; a no-op without fcntl)"""
+    def __init__(self, spool_dir):
+        self.path = os.path.join(spool_dir, LOCK_NAME)
+        self.fd = None
+    
+    def acquire(self):
+        """Take the lock without waiting; False if another flusher holds it"""
+        try:
+            import fcntl
+        except ImportError:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self.fd = fd
+        return True
+    
+    def release(self):
+        """Drop the lock"""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+def flusher_running(spool_dir):
+    """Whether some process holds the flusher lock"""
+    lock = FlushLock(spool_dir)
+    if lock.acquire():
+        lock.release()
+        return False
+    return True
+
+class SpoolFlusher:
+    """
+    Drains the spool into the daily files. make_entry(timestamp, prompt)
+    turns a raw event into the tracker entry (matching happens here, off the
+    hook's path). on_new_day() is called after a batch that started a new
+    daily file, like the tracker's first prompt of a day (it starts rotation).
+    Only one flusher may run at a time - hold a FlushLock.
+    """
+    def __init__(self, make_entry, data_dir=None, fsync_policy=None, on_new_day=None):
+        self.make_entry = make_entry
+        self.on_new_day = on_new_day
+        self.data_dir = data_dir or get_data_dir()
+        self.spool_dir = get_spool_dir(self.data_dir)
+        self.journal_path = os.path.join(self.spool_dir, JOURNAL_NAME)
+        self.fsync_policy = fsync_policy or get_fsync_policy()
+        self.committed = 0
+    
+    def _remove_events(self, names):
+        """Events whose batch is committed leave the spool"""
+        for name in names:
+            try:
+                os.remove(os.path.join(self.spool_dir, name))
+            except OSError:
+                pass
+        if self.fsync_policy != 'never':
+            _fsync_dir(self.spool_dir)
+    
+    def recover(self):
+        """
+        Finish a batch interrupted by a crash: events whose line already
+        reached their daily file are dropped from the spool, the rest stay
+        pending and go out with the next batch.
+        """
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                journal = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError):
+            # Torn journal - written before any append, so nothing was committed
+            os.remove(self.journal_path)
+            return 0
+        
+        written = {}
+        for path, offset in journal['files'].items():
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    written[path] = set(f.read().splitlines(keepends=True))
+            except OSError:
+                written[path] = set()
+        
+        done = [name for name, path, line in journal['events'] if line.encode('utf-8', 'surrogatepass') in written.get(path, ())]
+        self._remove_events(done)
+        os.remove(self.journal_path)
+        return len(done)
+    
+    def flush(self):
+        """Commit one batch of pending events; returns how many were committed"""
+        names = pending_events(self.spool_dir)[:MAX_BATCH]
+        if not names:
+            return 0
+        
+        events = []
+        lines_by_file = {}
+        for name in names:
+            try:
+                with open(os.path.join(self.spool_dir, name), 'rb') as f:
+                    event = json.loads(f.read().decode('utf-8', 'surrogatepass'))
+                entry = self.make_entry(event['timestamp'], event['prompt'])
+            except (OSError, ValueError, KeyError, TypeError):
+                # Keep what can't be read for inspection instead of retrying it forever
+                try:
+                    os.replace(os.path.join(self.spool_dir, name), os.path.join(self.spool_dir, f"{name}.bad"))
+                except OSError:
+                    pass
+                continue
+            line = json.dumps(entry, ensure_ascii=False) + '\n'
+            path = daily_file(self.data_dir, event['timestamp'])
+            events.append((name, path, line))
+            lines_by_file.setdefault(path, []).append(line)
+        if not events:
+            return 0
+        
+        # Journal first: where each file ended and which line each event becomes
+        offsets = {}
+        new_day = False
+        for path in lines_by_file:
+            try:
+                offsets[path] = os.path.getsize(path)
+            except OSError:
+                offsets[path] = 0
+                new_day = True
+        tmp_path = f"{self.journal_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"files": offsets, "events": events}, f, ensure_ascii=False)
+            if self.fsync_policy != 'never':
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+        
+        # One append per daily file for the whole batch
+        os.makedirs(self.data_dir, exist_ok=True)
+        for path, lines in lines_by_file.items():
+            append_record(path, ''.join(lines).encode('utf-8', 'surrogatepass'), fsync=self.fsync_policy != 'never')
+        
+        self._remove_events([name for name, _path, _line in events])
+        os.remove(self.journal_path)
+        self.committed += len(events)
+        if new_day and self.on_new_day:
+            self.on_new_day()
+        return len(events)
+    
+    def drain(self):
+        """Flush until the spool is empty; returns how many events were committed"""
+        committed = 0
+        while True:
+            count = self.flush()
+            if not count:
+                return committed
+            committed += count
+
+def run_flusher(make_entry, data_dir=None, interval=None, idle_timeout=FLUSHER_IDLE_TIMEOUT, on_new_day=None):
+    """
+    Background flusher loop: recover, then commit a batch every interval
+    seconds until the spool has been empty for idle_timeout seconds.
+    Returns False if another flusher is already running.
+    """
+    interval = get_flush_interval() if interval is None else interval
+    flusher = SpoolFlusher(make_entry, data_dir, on_new_day=on_new_day)
+    lock = FlushLock(flusher.spool_dir)
+    if not lock.acquire():
+        return False
+    
+    while True:
+        try:
+            flusher.recover()
+            idle_since = time.monotonic()
+            while time.monotonic() - idle_since < idle_timeout:
+                time.sleep(interval)
+                if flusher.drain():
+                    idle_since = time.monotonic()
+        finally:
+            lock.release()
+        
+        # A hook that spooled just before the release saw the lock held and
+        # started no flusher - take those events too
+        if not pending_events(flusher.spool_dir) or not lock.acquire():
+            return True
+
+def remove_spool(data_dir=None):
+    """Delete the spool with any events not yet committed (e.g. when purging data)"""
+    spool_dir = get_spool_dir(data_dir)
+    if not os.path.isdir(spool_dir):
+        return False
+    import shutil
+    shutil.rmtree(spool_dir, ignore_errors=True)
+    return True
+
+# Command line support
+if __name__ == "__main__":
+    import sys
+    
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    spool_dir = get_spool_dir()
+    if command == "status":
+        print(f"Spool: {spool_dir}")
+        print(f"Pending events: {len(pending_events(spool_dir))}")
+        print(f"Flusher running: {'yes' if flusher_running(spool_dir) else 'no'}")
+        print(f"Flush interval: {get_flush_interval()}s, fsync: {get_fsync_policy()}")
+    else:
+        print("Usage: python3 spool.py [status]")
+        print("  status - Pending events and flusher state")
+        print("  (prompt-tracker.py --flush commits pending events now)")
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+SQLite storage backend for Biomass Conversion Index Monitoring System
+Writes prompt events to a local WAL-mode database (storage = "sqlite")
+and runs the period grouping and date filtering of reports as indexed
+SQL aggregates
+"""
+import os
+import sqlite3
+from collections import Counter
+
+from config import get_data_dir, get_database_path
+from prompt_store import is_archive, list_data_files, open_data_file, parse_record, range_keys
+from summary_cache import hour_key, is_open_day
+
+# Stored in PRAGMA user_version; bump when the schema changes
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prompts (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    hour_key TEXT NOT NULL,
+    prompt TEXT,
+    curse_count INTEGER NOT NULL,
+    date TEXT,
+    hour INTEGER
+);
+CREATE INDEX IF NOT EXISTS prompts_timestamp ON prompts (timestamp);
+-- Covers the report aggregates, so they never touch the prompt text
+CREATE INDEX IF NOT EXISTS prompts_hour_key ON prompts (hour_key, curse_count);
+
+-- One row per indicator occurrence; hour_key is copied so word aggregates need no join
+CREATE TABLE IF NOT EXISTS prompt_words (
+    prompt_id INTEGER NOT NULL,
+    hour_key TEXT NOT NULL,
+    word TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS prompt_words_word ON prompt_words (word, hour_key);
+CREATE INDEX IF NOT EXISTS prompt_words_hour_key ON prompt_words (hour_key, word);
+
+-- Daily files already brought over by migrate(); a day still open is resumed after its first records
+CREATE TABLE IF NOT EXISTS imported_files (
+    name TEXT PRIMARY KEY,
+    records INTEGER NOT NULL,
+    complete INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Period keys computed from hour_key ('YYYY-MM-DD HH'), matching calculate_stats
+PERIOD_SQL = {
+    "daily": "substr(hour_key, 1, 10)",
+    "weekly": "'Week of ' || date(substr(hour_key, 1, 10), '-6 days', 'weekday 1')",
+    "monthly": "substr(hour_key, 1, 7)",
+    "hourly": "hour_key || ':00'"
+}
+
+class SQLiteStore:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or get_database_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        
+        # Autocommit mode - writes open their own transactions
+        self.conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self.conn.executescript(SCHEMA)
+            if version == 1:
+                # Version 1 marked days imported while still open - each is checked once more
+                self.conn.execute("ALTER TABLE imported_files ADD COLUMN complete INTEGER NOT NULL DEFAULT 0")
+            self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    
+    def close(self):
+        """Close the database connection"""
+        self.conn.close()
+    
+    def _insert(self, entry):
+        """Insert one entry inside the current transaction"""
+        key = hour_key(entry['timestamp'])
+        cursor = self.conn.execute(
+            "INSERT INTO prompts (timestamp, hour_key, prompt, curse_count, date, hour) VALUES (?, ?, ?, ?, ?, ?)",
+            (entry['timestamp'], key, entry.get('prompt'), entry['curse_count'], entry.get('date'), entry.get('hour'))
+        )
+        if entry['found_curses']:
+            self.conn.executemany(
+                "INSERT INTO prompt_words (prompt_id, hour_key, word) VALUES (?, ?, ?)",
+                [(cursor.lastrowid, key, word) for word in entry['found_curses']]
+            )
+    
+    def add_entries(self, entries, imported_name=None, imported_before=0, complete=True):
+        """
+        Insert entries in one transaction; returns how many were added.
+        imported_name records a migrated day along with its record count so
+        far (imported_before plus these) and whether it is done.
+        """
+        count = 0
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for entry in entries:
+                self._insert(entry)
+                count += 1
+            if imported_name:
+                self.conn.execute("INSERT OR REPLACE INTO imported_files (name, records, complete) VALUES (?, ?, ?)",
+                                  (imported_name, imported_before + count, int(complete)))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return count
+    
+    def add_entry(self, entry):
+        """Insert a single prompt event"""
+        self.add_entries([entry])
+    
+    def count(self):
+        """Number of stored prompt events"""
+        return self.conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0]
+    
+    def purge(self, start=None, end=None, word=None, text=None):
+        """Delete the prompts matching every given criterion (as purge.entry_filter); returns how many"""
+        where, params = self._range_clause(start, end)
+        conditions = [where[len(" WHERE "):]] if where else []
+        if word is not None:
+            conditions.append("id IN (SELECT prompt_id FROM prompt_words WHERE lower(word) = ?)")
+            params.append(word.lower())
+        if text is not None:
+            conditions.append("instr(prompt, ?) > 0")
+            params.append(text)
+        if not conditions:
+            raise ValueError("no purge criteria given")
+        clause = " WHERE " + " AND ".join(conditions)
+        
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Ids first - the word condition reads prompt_words, which is purged too
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS purged (id INTEGER PRIMARY KEY)")
+            self.conn.execute("DELETE FROM temp.purged")
+            deleted = self.conn.execute(f"INSERT INTO temp.purged SELECT id FROM prompts{clause}", params).rowcount
+            self.conn.execute("DELETE FROM prompt_words WHERE prompt_id IN (SELECT id FROM temp.purged)")
+            self.conn.execute("DELETE FROM prompts WHERE id IN (SELECT id FROM temp.purged)")
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return deleted
+    
+    def _range_clause(self, start=None, end=None):
+        """WHERE clause and parameters for an hour_key range"""
+        start_key, end_key = range_keys(start, end)
+        conditions = []
+        params = []
+        if start_key:
+            conditions.append("hour_key >= ?")
+            params.append(start_key)
+        if end_key:
+            conditions.append("hour_key <= ?")
+            params.append(end_key)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+    
+    def calculate_stats(self, period="daily", start=None, end=None):
+        """
+        Same result as calculate_stats over the JSONL files, computed in SQL.
+        Rows are first grouped by hour_key along the covering indexes, then
+        the (few) hourly groups are rolled up to the reporting period.
+        """
+        period_sql = PERIOD_SQL.get(period, "'total'")
+        where, params = self._range_clause(start, end)
+        
+        total_prompts = 0
+        total_curses = 0
+        stats_by_period = {}
+        
+        rows = self.conn.execute(
+            f"SELECT {period_sql} AS period, SUM(prompts), SUM(curses) FROM "
+            f"(SELECT hour_key, COUNT(*) AS prompts, SUM(curse_count) AS curses FROM prompts{where} GROUP BY hour_key) "
+            f"GROUP BY period",
+            params
+        )
+        for key, prompts, curses in rows:
+            total_prompts += prompts
+            total_curses += curses
+            stats_by_period[key] = {"prompts": prompts, "curses": curses, "curse_words": Counter()}
+        
+        rows = self.conn.execute(
+            f"SELECT {period_sql} AS period, word, SUM(occurrences) FROM "
+            f"(SELECT hour_key, word, COUNT(*) AS occurrences FROM prompt_words{where} GROUP BY hour_key, word) "
+            f"GROUP BY period, word",
+            params
+        )
+        for key, word, count in rows:
+            if key in stats_by_period:
+                stats_by_period[key]["curse_words"][word] = count
+        
+        return {
+            "total_prompts": total_prompts,
+            "total_curses": total_curses,
+            "average_curses_per_prompt": total_curses / total_prompts if total_prompts > 0 else 0,
+            "stats_by_period": stats_by_period
+        }
+    
+    def hourly_buckets(self, start=None, end=None):
+        """Hourly buckets (see rollup) from one GROUP BY hour_key per table"""
+        where, params = self._range_clause(start, end)
+        buckets = {}
+        rows = self.conn.execute(
+            f"SELECT hour_key, COUNT(*), SUM(curse_count) FROM prompts{where} GROUP BY hour_key", params)
+        for key, prompts, curses in rows:
+            buckets[key] = {"prompts": prompts, "curses": curses, "curse_words": Counter()}
+        rows = self.conn.execute(
+            f"SELECT hour_key, word, COUNT(*) FROM prompt_words{where} GROUP BY hour_key, word", params)
+        for key, word, count in rows:
+            if key in buckets:
+                buckets[key]["curse_words"][word] = count
+        return buckets
+    
+    def imported(self, name):
+        """(records, complete) of a migrated day, or None if it wasn't imported"""
+        row = self.conn.execute("SELECT records, complete FROM imported_files WHERE name = ?", (name,)).fetchone()
+        return (row[0], bool(row[1])) if row is not None else None
+    
+    def migrate(self, data_dir=None, on_error=None):
+        """
+        Import the daily JSONL files and archives in data_dir. Each file goes
+        in as one transaction and is remembered, so re-running only picks up
+        files that weren't imported yet. A day still open is imported up to
+        its last complete line, and re-running adds what was appended since.
+        Returns (files, records).
+        """
+        files = 0
+        records = 0
+        for file_path in list_data_files(data_dir or get_data_dir()):
+            name = os.path.basename(file_path)
+            # A compacted day keeps its date, so a day is only imported once either way
+            day = name.split('.', 1)[0]
+            imported = self.imported(day)
+            if imported is not None and imported[1]:
+                continue
+            before = imported[0] if imported is not None else 0
+            open_day = is_open_day(file_path)
+            try:
+                added = self.add_entries(_read_entries(file_path, before, open_day), day, before, complete=not open_day)
+            except Exception as e:
+                if on_error:
+                    on_error(file_path, e)
+                continue
+            records += added
+            if added or imported is None:
+                files += 1
+        return files, records
+
+def _read_entries(file_path, skip=0, open_day=False):
+    """
+    Entries of a daily JSONL file or archive after the first skip. In a day
+    still open, a last line without its newline is still being written and
+    is left for later.
+    """
+    if is_archive(file_path):
+        from archive import PromptArchive
+        with PromptArchive(file_path) as archive:
+            return [archive.entry(position) for position in range(skip, archive.count)]
+    
+    entries = []
+    with open_data_file(file_path) as f:
+        for raw in f:
+            if open_day and not raw.endswith(b'\n'):
+                break
+            # Torn lines are skipped like the report loaders do
+            entry = parse_record(raw)
+            if entry is not None:
+                if skip:
+                    skip -= 1
+                    continue
+                entries.append(entry)
+    return entries
+
+# Global instance - one connection per process (the tracker daemon reuses it)
+_store = None
+
+def get_store():
+    """Get the global store, opening the database if needed"""
+    global _store
+    if _store is None:
+        _store = SQLiteStore()
+    return _store
+
+def save_entry(entry):
+    """Record one prompt event; returns False if the database couldn't be written"""
+    try:
+        get_store().add_entry(entry)
+        return True
+    except (sqlite3.Error, OSError):
+        return False
+
+def count_database(data_dir=None):
+    """(bytes on disk, records) of the database, or None if there isn't one"""
+    db_path = get_database_path(data_dir)
+    if not os.path.exists(db_path):
+        return None
+    size = sum(os.path.getsize(path) for path in (db_path, f"{db_path}-wal") if os.path.exists(path))
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            records = conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        records = 0
+    return size, records
+
+def purge_database(data_dir=None, start=None, end=None, word=None, text=None):
+    """Selectively purge the database, if there is one; returns the number of records deleted"""
+    db_path = get_database_path(data_dir)
+    if not os.path.exists(db_path):
+        return 0
+    store = SQLiteStore(db_path)
+    try:
+        return store.purge(start, end, word, text)
+    finally:
+        store.close()
+
+def remove_database(data_dir=None):
+    """Delete the database and its WAL files (e.g. when purging data)"""
+    removed = False
+    db_path = get_database_path(data_dir)
+    for path in (db_path, f"{db_path}-wal", f"{db_path}-shm"):
+        try:
+            os.remove(path)
+            removed = True
+        except OSError:
+            pass
+    return removed
+
+# Command line support
+if __name__ == "__main__":
+    import sys
+    
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "migrate":
+        store = SQLiteStore()
+        imported, added = store.migrate(on_error=lambda path, error: print(f"Skipped {os.path.basename(path)}: {error}"))
+        print(f"Imported {added} records from {imported} files into {store.db_path}")
+        print(f"Total records: {store.count()}")
+    elif command == "count":
+        print(SQLiteStore().count())
+    else:
+        print("Usage: python3 sqlite_store.py [migrate|count]")
+        print("  migrate - Import existing daily JSONL files and archives")
+        print("  count   - Show the number of stored prompt events")
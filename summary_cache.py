@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Summary cache for Biomass Conversion Index Monitoring System
+Keeps a compact sidecar summary (counts, hourly buckets, indicator words and
+hour -> byte offset index) for every daily prompts_*.jsonl file so reports
+only parse files that changed
+"""
+import json
+import os
+import shutil
+from datetime import date
+
+from config import get_cache_dir, get_data_dir
+from prompt_store import (DATA_FILE_SUFFIX, DATA_SUFFIXES, file_date, hour_number_key, is_archive, is_compressed, list_data_files,
+                          open_data_file, project_record)
+
+# Bump when the summary layout changes - old sidecars are then rebuilt
+SUMMARY_CACHE_VERSION = 4
+SUMMARY_CACHE_DIR = "summaries"
+
+# Below these a process pool costs more than it saves
+PARALLEL_MIN_FILES = 4
+PARALLEL_MIN_BYTES = 4 * 1024 * 1024
+
+class SummaryParseError(Exception):
+    """A data file could not be fully parsed; carries the summary of the lines before the error"""
+    def __init__(self, summary, error):
+        super().__init__(str(error))
+        self.summary = summary
+        self.error = error
+
+def new_summary():
+    """Create an empty per-file summary"""
+    return {
+        "version": SUMMARY_CACHE_VERSION,
+        "size": 0,
+        "mtime_ns": 0,
+        "offset": 0,
+        "prompts": 0,
+        "curses": 0,
+        "skipped": 0,
+        "words": {},
+        "hours": {}
+    }
+
+def hour_key(timestamp):
+    """Bucket key 'YYYY-MM-DD HH' from an ISO timestamp"""
+    if len(timestamp) < 13 or timestamp[10] not in 'T ':
+        raise ValueError(f"Invalid timestamp: {timestamp!r}")
+    return f"{timestamp[:10]} {timestamp[11:13]}"
+
+def add_record(summary, record, start=0, end=0):
+    """Add one StatsRecord (stored at bytes [start, end) of its file) to a summary"""
+    key = hour_number_key(record.epoch_hour)
+    bucket = summary['hours'].get(key)
+    if bucket is None:
+        bucket = summary['hours'][key] = {"prompts": 0, "curses": 0, "words": {}, "first": start, "end": end}
+    else:
+        bucket['first'] = min(bucket['first'], start)
+        bucket['end'] = max(bucket['end'], end)
+    
+    curse_count = record.curse_count
+    bucket['prompts'] += 1
+    bucket['curses'] += curse_count
+    summary['prompts'] += 1
+    summary['curses'] += curse_count
+    
+    for curse in record.found_curses:
+        bucket['words'][curse] = bucket['words'].get(curse, 0) + 1
+        summary['words'][curse] = summary['words'].get(curse, 0) + 1
+
+def is_open_day(file_path):
+    """
+    Whether a data file can still be appended to: an uncompressed JSONL day
+    that isn't over yet. Only such a file can end in a line still being
+    written; anywhere else an unterminated last line is complete.
+    """
+    if is_archive(file_path) or is_compressed(file_path):
+        return False
+    day = file_date(file_path)
+    return day is None or day >= date.today()
+
+def summarize_file(file_path, summary=None, offset=0):
+    """
+    Parse a daily file (from offset onwards) into a summary. In a day still
+    open only complete lines are consumed; the summary's offset records
+    where to resume.
+    """
+    if is_archive(file_path):
+        # Compacted days are summarized straight from their columns
+        from archive import summarize_archive
+        return summarize_archive(file_path)
+    
+    if summary is None:
+        summary = new_summary()
+    
+    st = os.stat(file_path)
+    open_day = is_open_day(file_path)
+    # Compressed days are streamed through the decompressor; offsets then count uncompressed bytes
+    with open_data_file(file_path) as f:
+        if offset:
+            f.seek(offset)
+        try:
+            for raw in f:
+                if open_day and not raw.endswith(b'\n'):
+                    # Line still being written - pick it up next time
+                    break
+                start = offset
+                offset += len(raw)
+                if not raw.isspace():
+                    record = project_record(raw)
+                    if record is None:
+                        # Torn line - skip it, the rest of the file still counts
+                        summary['skipped'] += 1
+                    else:
+                        add_record(summary, record, start, offset)
+                summary['offset'] = offset
+        except Exception as e:
+            raise SummaryParseError(summary, e)
+    
+    summary['size'] = st.st_size
+    summary['mtime_ns'] = st.st_mtime_ns
+    return summary
+
+def _summarize_worker(file_path):
+    """Process pool entry point - exceptions don't pickle well, so errors come back as text"""
+    try:
+        return file_path, summarize_file(file_path), None
+    except SummaryParseError as e:
+        return file_path, e.summary, str(e.error)
+    except OSError as e:
+        return file_path, None, str(e)
+
+def resolve_jobs(jobs):
+    """Number of worker processes for a --jobs value (0 or None means one per CPU)"""
+    if not jobs:
+        return os.cpu_count() or 1
+    return max(1, int(jobs))
+
+def summarize_files(file_paths, jobs=1):
+    """
+    Summarize several data files, fanning them out to a process pool when
+    there is enough work to pay for the pool. Each summary is a mergeable
+    partial aggregate; results come back in input order so merging them
+    gives the same output as a serial run.
+    Yields (file_path, summary or None, error or None).
+    """
+    jobs = resolve_jobs(jobs)
+    if jobs > 1 and len(file_paths) >= PARALLEL_MIN_FILES:
+        total_bytes = 0
+        for file_path in file_paths:
+            try:
+                total_bytes += os.path.getsize(file_path)
+            except OSError:
+                pass
+        if total_bytes >= PARALLEL_MIN_BYTES:
+            from concurrent.futures import ProcessPoolExecutor
+
+            workers = min(jobs, len(file_paths))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunksize = max(1, len(file_paths) // (workers * 4))
+                for result in pool.map(_summarize_worker, file_paths, chunksize=chunksize):
+                    yield result
+            return
+
+    # Small inputs don't pay pool startup
+    for file_path in file_paths:
+        yield _summarize_worker(file_path)
+
+def ends_with_newline(file_path, offset):
+    """Check that the byte before offset closes a line (file was only appended to)"""
+    if offset == 0:
+        return True
+    with open(file_path, 'rb') as f:
+        f.seek(offset - 1)
+        return f.read(1) == b'\n'
+
+def seek_range(summary, start_key=None, end_key=None):
+    """
+    Byte range [begin, stop) of a data file that holds every entry with an
+    hour key in [start_key, end_key], using the summary's hour index.
+    stop is None when the file must be read to the end (unindexed tail).
+    Returns None when no indexed entry falls in the range and nothing was appended.
+    """
+    begin = None
+    stop = None
+    for key, bucket in summary['hours'].items():
+        if start_key and key < start_key:
+            continue
+        if end_key and key > end_key:
+            continue
+        begin = bucket['first'] if begin is None else min(begin, bucket['first'])
+        stop = bucket['end'] if stop is None else max(stop, bucket['end'])
+    
+    if summary['size'] > summary['offset']:
+        # Lines appended after the summary was built are not indexed yet
+        return (summary['offset'] if begin is None else begin), None
+    if begin is None:
+        return None
+    return begin, stop
+
+class SummaryCache:
+    def __init__(self, data_dir=None, cache_dir=None):
+        self.data_dir = data_dir or get_data_dir()
+        self.cache_dir = os.path.join(cache_dir or get_cache_dir(self.data_dir), SUMMARY_CACHE_DIR)
+        
+        # Cache-hit/miss reporting
+        self.hits = 0
+        self.refreshed = 0
+        self.parsed = 0
+        # Work actually done (for curse-stats --profile)
+        self.bytes_read = 0
+        self.records_parsed = 0
+    
+    def _sidecar_path(self, file_path):
+        """Sidecar summary path for a data file"""
+        name = os.path.basename(file_path)
+        if name.endswith(DATA_FILE_SUFFIX):
+            name = name[:-len(DATA_FILE_SUFFIX)]
+        return os.path.join(self.cache_dir, f"{name}.json")
+    
+    def load_sidecar(self, file_path):
+        """Load the cached summary for a data file, or None"""
+        try:
+            with open(self._sidecar_path(file_path), 'r', encoding='utf-8') as f:
+                summary = json.load(f)
+            if summary.get('version') == SUMMARY_CACHE_VERSION:
+                return summary
+        except (json.JSONDecodeError, IOError, AttributeError):
+            pass
+        return None
+    
+    def _save_sidecar(self, file_path, summary):
+        """Write one sidecar atomically"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            sidecar = self._sidecar_path(file_path)
+            tmp_path = f"{sidecar}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False)
+            os.replace(tmp_path, sidecar)
+        except OSError:
+            # Cache is an optimization - failing to write it is not an error
+            pass
+    
+    def _remove_sidecar(self, file_path):
+        """Forget the summary of one data file"""
+        try:
+            os.remove(self._sidecar_path(file_path))
+        except OSError:
+            pass
+    
+    def forget(self, file_path):
+        """Drop the cached summary of a data file that was rewritten in place"""
+        self._remove_sidecar(file_path)
+    
+    def transfer(self, file_path, new_path):
+        """
+        Carry the summary of a fully summarized day over to a re-encoded copy
+        of it (e.g. compressed), so the copy needs no parsing. Call before the
+        original is removed; returns whether a summary was carried over.
+        """
+        summary = self.load_sidecar(file_path)
+        self._remove_sidecar(file_path)
+        try:
+            st = os.stat(file_path)
+            new_st = os.stat(new_path)
+        except OSError:
+            return False
+        if summary is None or (summary['size'], summary['mtime_ns']) != (st.st_size, st.st_mtime_ns) \
+                or summary['offset'] != st.st_size:
+            return False
+        summary['size'] = new_st.st_size
+        summary['mtime_ns'] = new_st.st_mtime_ns
+        self._save_sidecar(new_path, summary)
+        return True
+    
+    def clear(self):
+        """Forget every cached summary"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+    
+    def _cached_summary(self, file_path):
+        """
+        Summary for a data file from its sidecar, parsing only an appended tail.
+        Returns None when the file has to be parsed from scratch.
+        """
+        st = os.stat(file_path)
+        cached = self.load_sidecar(file_path)
+        if cached is None:
+            return None
+        
+        # A day that closed since may have left an unterminated last line to count
+        closed_tail = cached['offset'] < st.st_size and file_path.endswith(DATA_FILE_SUFFIX) and not is_open_day(file_path)
+        if cached['size'] == st.st_size and cached['mtime_ns'] == st.st_mtime_ns and not closed_tail:
+            self.hits += 1
+            return cached
+        
+        if is_archive(file_path) or is_compressed(file_path):
+            # Archives and compressed days are rewritten, never appended to
+            return None
+        if st.st_size >= cached['offset'] and ends_with_newline(file_path, cached['offset']):
+            # Appended since last time - parse only the new tail
+            offset, prompts = cached['offset'], cached['prompts']
+            summary = summarize_file(file_path, cached, offset)
+            self.refreshed += 1
+            self.bytes_read += summary['offset'] - offset
+            self.records_parsed += summary['prompts'] - prompts
+            self._save_sidecar(file_path, summary)
+            return summary
+        return None
+    
+    def _count_parsed(self, summary):
+        """Count a data file parsed from scratch"""
+        self.parsed += 1
+        self.bytes_read += summary['offset']
+        self.records_parsed += summary['prompts']
+    
+    def get_summary(self, file_path):
+        """Get the summary for one data file, parsing only what changed"""
+        summary = self._cached_summary(file_path)
+        if summary is None:
+            summary = summarize_file(file_path)
+            self._count_parsed(summary)
+            self._save_sidecar(file_path, summary)
+        return summary
+    
+    def get_index(self, file_path):
+        """
+        Cached summary usable as a byte-offset index for a data file, without
+        parsing anything. None if there is no sidecar or the file was rewritten.
+        """
+        if is_archive(file_path) or is_compressed(file_path):
+            return None
+        summary = self.load_sidecar(file_path)
+        if summary is None:
+            return None
+        try:
+            st = os.stat(file_path)
+            if st.st_size < summary['offset'] or not ends_with_newline(file_path, summary['offset']):
+                return None
+        except OSError:
+            return None
+        summary['size'] = st.st_size
+        return summary
+    
+    def summaries(self, start=None, end=None, on_error=None, jobs=1):
+        """
+        Summaries for the data files that can hold entries in [start, end], oldest first.
+        Files that must be parsed from scratch are spread over `jobs` processes.
+        Files that fail to parse are reported through on_error(file_path, error);
+        the lines before the error still count but are not cached.
+        """
+        return [summary for _file_path, summary in self.file_summaries(start, end, on_error, jobs)]
+    
+    def file_summaries(self, start=None, end=None, on_error=None, jobs=1):
+        """Like summaries(), as (file_path, summary) pairs"""
+        files = list_data_files(self.data_dir, start, end)
+        result = [None] * len(files)
+        missing = []
+        for position, file_path in enumerate(files):
+            try:
+                result[position] = self._cached_summary(file_path)
+                if result[position] is None:
+                    missing.append(position)
+            except SummaryParseError as e:
+                result[position] = e.summary
+                self._remove_sidecar(file_path)
+                if on_error:
+                    on_error(file_path, e.error)
+            except OSError as e:
+                if on_error:
+                    on_error(file_path, e)
+        
+        parsed = summarize_files([files[position] for position in missing], jobs)
+        for position, (file_path, summary, error) in zip(missing, parsed):
+            result[position] = summary
+            if error is None:
+                self._count_parsed(summary)
+                self._save_sidecar(file_path, summary)
+            else:
+                self._remove_sidecar(file_path)
+                if on_error:
+                    on_error(file_path, error)
+        
+        if start is None and end is None:
+            self.prune()
+        return [(file_path, summary) for file_path, summary in zip(files, result) if summary is not None]
+    
+    def prune(self):
+        """Drop sidecars of data files that were purged"""
+        try:
+            sidecars = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in sidecars:
+            if not name.endswith('.json'):
+                continue
+            stem = name[:-len('.json')]
+            if not any(stem.endswith(suffix) for suffix in DATA_SUFFIXES):
+                stem += DATA_FILE_SUFFIX
+            data_file = os.path.join(self.data_dir, stem)
+            if not os.path.exists(data_file):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+def remove_cache(data_dir=None):
+    """Delete every cached summary (e.g. after purging data)"""
+    cache_dir = os.path.join(get_cache_dir(data_dir), SUMMARY_CACHE_DIR)
+    if not os.path.isdir(cache_dir):
+        return False
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    return True
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Mergeable team summaries for Biomass Conversion Index Monitoring System
+Exports one machine's history as a small versioned file of hourly buckets
+(prompts, breaches, indicator word counts - never prompt text), and merges
+any number of such files and raw data dirs into one set of buckets for a
+team report. Hourly buckets add up exactly, so the merged report matches
+what one data dir holding everybody's prompts would give.
+"""
+import gzip
+import json
+import os
+import socket
+from collections import Counter
+from datetime import datetime
+
+from config import get_data_dir, get_database_path, get_storage
+from prompt_store import list_data_files
+from rollup import hourly_buckets_from_summaries
+from summary_cache import SummaryCache, resolve_jobs
+
+SUMMARY_FORMAT = "biomass-team-summary"
+# Bump when the layout changes; newer files are refused rather than misread
+TEAM_SUMMARY_VERSION = 1
+
+class SummaryFormatError(Exception):
+    """A file is not a team summary this version can read"""
+
+def buckets_to_hours(buckets):
+    """Rollup buckets as summary-layout hours (plain dicts, sorted for stable files)"""
+    return {
+        key: {"prompts": bucket["prompts"], "curses": bucket["curses"], "words": dict(sorted(bucket["curse_words"].items()))}
+        for key, bucket in sorted(buckets.items())
+    }
+
+def dir_buckets(data_dir, start=None, end=None, jobs=1, on_error=None, storage=None):
+    """
+    Hourly buckets of one data dir: its daily files through the summary
+    cache, or its SQLite database when that is the storage (or all it has).
+    """
+    database = get_database_path(data_dir)
+    if storage is None and not list_data_files(data_dir) and os.path.exists(database):
+        storage = 'sqlite'
+    if storage == 'sqlite':
+        from sqlite_store import SQLiteStore
+        store = SQLiteStore(database)
+        try:
+            return store.hourly_buckets(start, end)
+        finally:
+            store.close()
+    summaries = SummaryCache(data_dir).summaries(start, end, on_error=on_error, jobs=jobs)
+    return hourly_buckets_from_summaries(summaries, start, end)
+
+def export_summary(output_path, label=None, data_dir=None, start=None, end=None, jobs=1, on_error=None):
+    """
+    Write this machine's team summary (gzipped if the name ends in .gz).
+    Returns the exported document.
+    """
+    data_dir = data_dir or get_data_dir()
+    buckets = dir_buckets(data_dir, start, end, jobs, on_error, storage=get_storage())
+    document = {
+        "format": SUMMARY_FORMAT,
+        "version": TEAM_SUMMARY_VERSION,
+        "label": label or socket.gethostname(),
+        "exported": datetime.now().isoformat(timespec='seconds'),
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "prompts": sum(bucket["prompts"] for bucket in buckets.values()),
+        "curses": sum(bucket["curses"] for bucket in buckets.values()),
+        "hours": buckets_to_hours(buckets)
+    }
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    opener = gzip.open if output_path.endswith('.gz') else open
+    try:
+        with opener(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return document
+
+def load_summary(path):
+    """Read and check a team summary file (plain or gzipped)"""
+    with open(path, 'rb') as f:
+        gzipped = f.read(2) == b'\x1f\x8b'
+    try:
+        with (gzip.open if gzipped else open)(path, 'rt', encoding='utf-8') as f:
+            document = json.load(f)
+    except (ValueError, EOFError, OSError) as e:
+        raise SummaryFormatError(f"not a team summary ({e})")
+    if not isinstance(document, dict) or document.get('format') != SUMMARY_FORMAT:
+        raise SummaryFormatError("not a team summary")
+    version = document.get('version')
+    if not isinstance(version, int) or version > TEAM_SUMMARY_VERSION:
+        raise SummaryFormatError(f"team summary version {version} is newer than this reader ({TEAM_SUMMARY_VERSION})")
+    if not isinstance(document.get('hours'), dict):
+        raise SummaryFormatError("team summary has no hourly buckets")
+    return document
+
+def _dir_worker(task):
+    """Process pool entry point: one raw data dir as summary-layout hours, errors as text"""
+    data_dir, start, end = task
+    errors = []
+    try:
+        buckets = dir_buckets(data_dir, start, end, on_error=lambda file_path, error: errors.append((file_path, str(error))))
+    except Exception as e:
+        return data_dir, None, errors + [(data_dir, str(e))]
+    return data_dir, buckets_to_hours(buckets), errors
+
+def merge_sources(sources, start=None, end=None, jobs=0, on_error=None, word_counter=Counter):
+    """
+    Hourly buckets of every source over [start, end]: team summary files
+    are loaded as they are, raw data dirs are summarized in a process pool
+    (one dir per worker). Sources that can't be read are reported through
+    on_error(source, error) and left out. Returns (buckets, labels of the
+    sources that went in).
+    """
+    documents = []
+    labels = []
+    data_dirs = []
+    for source in sources:
+        if os.path.isdir(source):
+            data_dirs.append(source)
+            continue
+        try:
+            document = load_summary(source)
+        except (SummaryFormatError, OSError) as e:
+            if on_error:
+                on_error(source, e)
+            continue
+        documents.append(document)
+        labels.append(document.get('label') or os.path.basename(source))
+    
+    tasks = [(data_dir, start, end) for data_dir in data_dirs]
+    jobs = min(resolve_jobs(jobs), len(tasks))
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_dir_worker, tasks))
+    else:
+        results = [_dir_worker(task) for task in tasks]
+    for data_dir, hours, errors in results:
+        for file_path, error in errors:
+            if on_error:
+                on_error(file_path, error)
+        if hours is not None:
+            documents.append({"hours": hours})
+            labels.append(os.path.basename(os.path.normpath(data_dir)))
+    
+    return hourly_buckets_from_summaries(documents, start, end, word_counter=word_counter), labels
+
+# Command line support
+if __name__ == "__main__":
+    import sys
+    
+    args = sys.argv[1:]
+    
+    def option(flag):
+        return args[args.index(flag) + 1] if flag in args and args.index(flag) + 1 < len(args) else None
+    
+    if len(args) > 1 and args[0] == "export":
+        document = export_summary(args[1], label=option('--label'),
+                                  on_error=lambda path, e: print(f"Skipped {path}: {e}", file=sys.stderr))
+        print(f"Exported {document['prompts']} prompts in {len(document['hours'])} hourly buckets "
+              f"as {document['label']} to {args[1]} ({os.path.getsize(args[1])} bytes)")
+    elif len(args) > 1 and args[0] == "info":
+        for path in args[1:]:
+            try:
+                document = load_summary(path)
+            except (SummaryFormatError, OSError) as e:
+                print(f"{path}: {e}")
+                continue
+            hours = sorted(document['hours'])
+            span = f"{hours[0][:10]} .. {hours[-1][:10]}" if hours else "empty"
+            print(f"{path}: {document.get('label')}, exported {document.get('exported')}, "
+                  f"{document.get('prompts')} prompts, {document.get('curses')} breaches, {span}")
+    else:
+        print("Usage: python3 team_summary.py [export FILE [--label NAME]|info FILE...]")
+        print("  export - Write this machine's mergeable summary (no prompt text; .gz to compress)")
+        print("  info   - Show what team summary files hold")
+        print("  (merge them with: python3 .claude/curse-stats.py all --merge FILE... DIR...)")
@@ -1,86 +1,367 @@
 #!/usr/bin/env python3
 import sys
-import json
 import os
-import glob
+from collections import Counter
 from datetime import datetime, timedelta
-from collections import defaultdict, Counter
 from pathlib import Path
 
 # Add the parent directory to sys.path to import i18n
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from i18n import _, _list
+from config import get_data_dir, get_storage
+from prompt_store import file_date, hour_number, is_archive, list_data_files, open_data_file, project_record, range_keys
+from archive import iter_archive_entries
+from summary_cache import SummaryCache, seek_range, summarize_files
+from rollup import PERIODS, calculate_all_stats, hourly_buckets, hourly_buckets_from_summaries, new_bucket, parse_periods, rollup
+from metrics import Profile
 
-def load_prompt_data(start_date=None, end_date=None):
-    """Load prompt data from JSONL files within date range."""
+def iter_file_lines(file_path, start_key=None, end_key=None, cache=None):
+    """
+    Stage 1+2 of the loading pipeline: yield the raw lines of one data file
+    that can hold entries in [start_key, end_key].
+    """
+    begin, stop = 0, None
+    day = file_date(file_path)
+    whole_day = day is not None and (not start_key or start_key <= f"{day} 00") and (not end_key or f"{day} 23" <= end_key)
+    if cache and not whole_day:
+        # Seek straight to the hours we need using the cached byte-offset index
+        index = cache.get_index(file_path)
+        if index is not None:
+            region = seek_range(index, start_key, end_key)
+            if region is None:
+                return
+            begin, stop = region
+    
+    # Compressed days stream through the decompressor (they have no offset index)
+    with open_data_file(file_path) as f:
+        if begin:
+            f.seek(begin)
+        for raw in f:
+            if stop is not None and begin >= stop:
+                break
+            begin += len(raw)
+            yield raw
+
+def load_prompt_data(start_date=None, end_date=None, use_index=True, profile=None):
+    """
+    Stream StatsRecords from the data files within date range, one at a time.
+    start_date/end_date may be dates or datetimes (hour precision).
+    Nothing is accumulated, so memory stays flat however large the history is.
+    """
     # Use data directory from environment or default
-    data_dir = os.environ.get('BIOMASS_DATA_DIR', os.path.expanduser("~/.claude/prompt-data"))
+    data_dir = get_data_dir()
     if not os.path.exists(data_dir):
-        return []
+        return
     
-    all_data = []
-    pattern = os.path.join(data_dir, "prompts_*.jsonl")
+    start_key, end_key = range_keys(start_date, end_date)
+    # Range bounds as hour numbers, compared against each record's pre-parsed hour
+    first_hour = hour_number(start_key) if start_key else None
+    last_hour = hour_number(end_key) if end_key else None
+    cache = SummaryCache(data_dir) if use_index else None
     
-    for file_path in glob.glob(pattern):
+    # Files outside the range are skipped by name without being opened
+    for file_path in list_data_files(data_dir, start_date, end_date):
+        records = 0
+        skipped = 0
+        bytes_read = 0
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    if line.strip():
-                        entry = json.loads(line)
-                        entry_date = datetime.fromisoformat(entry['timestamp']).date()
+            if is_archive(file_path):
+                # Compacted day - records come straight from the mapped columns
+                bytes_read = os.path.getsize(file_path)
+                for entry in iter_archive_entries(file_path, start_key, end_key):
+                    records += 1
+                    yield entry
+            else:
+                for raw in iter_file_lines(file_path, start_key, end_key, cache):
+                    bytes_read += len(raw)
+                    if not raw.isspace():
+                        # Stage 3: only the fields the stats need (the prompt text is never decoded)
+                        record = project_record(raw)
+                        if record is None:
+                            # Torn by a concurrent or interrupted write - the rest of the file still counts
+                            skipped += 1
+                            continue
+                        records += 1
                         
                         # Filter by date range if provided
-                        if start_date and entry_date < start_date:
+                        if first_hour is not None and record.epoch_hour < first_hour:
                             continue
-                        if end_date and entry_date > end_date:
+                        if last_hour is not None and record.epoch_hour > last_hour:
                             continue
-                            
-                        all_data.append(entry)
+                        
+                        yield record
         except Exception as e:
             # Use localized error message
             print(_('errors.reading_file', file=file_path, error=str(e)))
-    
-    return all_data
+        if profile:
+            profile.count('files')
+            profile.count('bytes', bytes_read)
+            profile.count('records', records)
+            profile.count('skipped', skipped)
 
 def calculate_stats(data, period="daily"):
-    """Calculate biomass conversion index statistics."""
-    if not data:
-        return {"total_prompts": 0, "total_curses": 0, "average_curses_per_prompt": 0, "stats_by_period": {}}
-    
-    total_prompts = len(data)
-    total_curses = sum(entry['curse_count'] for entry in data)
-    
-    # Group by period
-    stats_by_period = defaultdict(lambda: {"prompts": 0, "curses": 0, "curse_words": Counter()})
+    """
+    Calculate biomass conversion index statistics.
+    data may be any iterable of entries (e.g. the load_prompt_data stream);
+    it is consumed once and memory grows only with the number of hourly buckets.
+    """
+    return calculate_all_stats(data, [period])[period]
+
+def calculate_stats_from_summaries(summaries, period="daily", start_date=None, end_date=None):
+    """Calculate statistics from cached per-file summaries (same result as calculate_stats)."""
+    return rollup(hourly_buckets_from_summaries(summaries, start_date, end_date), [period])[period]
+
+def report_read_error(file_path, error):
+    """Print a localized file read error."""
+    print(_('errors.reading_file', file=file_path, error=str(error)))
+
+def load_cached_stats(periods, start_date=None, end_date=None, rebuild=False, jobs=1, profile=None, word_counter=Counter):
+    """Calculate statistics for every period through the summary cache, parsing only changed files."""
+    cache = SummaryCache()
+    if rebuild:
+        cache.clear()
     
-    for entry in data:
-        dt = datetime.fromisoformat(entry['timestamp'])
-        
-        if period == "daily":
-            key = dt.strftime("%Y-%m-%d")
-        elif period == "weekly":
-            # Get Monday of the week
-            monday = dt - timedelta(days=dt.weekday())
-            key = f"Week of {monday.strftime('%Y-%m-%d')}"
-        elif period == "monthly":
-            key = dt.strftime("%Y-%m")
-        elif period == "hourly":
-            key = dt.strftime("%Y-%m-%d %H:00")
-        else:
-            key = "total"
-        
-        stats_by_period[key]["prompts"] += 1
-        stats_by_period[key]["curses"] += entry['curse_count']
-        for curse in entry['found_curses']:
-            stats_by_period[key]["curse_words"][curse] += 1
+    summaries = cache.summaries(start_date, end_date, on_error=report_read_error, jobs=jobs)
+    if profile:
+        profile.stage('summaries')
+        profile.count('files', len(summaries))
+        profile.count('bytes', cache.bytes_read)
+        profile.count('records', cache.records_parsed)
+        profile.count('skipped', sum(summary['skipped'] for summary in summaries))
+    buckets = hourly_buckets_from_summaries(summaries, start_date, end_date, word_counter=word_counter)
+    stats = rollup(buckets, periods, word_counter)
+    if profile:
+        profile.stage('rollup')
+    return stats, cache
+
+def load_parallel_stats(periods, start_date=None, end_date=None, jobs=0, profile=None, word_counter=Counter):
+    """
+    Calculate statistics without the cache by parsing data files in a process pool.
+    Each worker returns a per-file hourly summary (a mergeable partial aggregate);
+    they are merged in file order, so the result matches the serial path exactly.
+    """
+    files = list_data_files(get_data_dir(), start_date, end_date)
+    summaries = []
+    for file_path, summary, error in summarize_files(files, jobs):
+        if error is not None:
+            report_read_error(file_path, error)
+        if summary is not None:
+            summaries.append(summary)
+            if profile:
+                profile.count('files')
+                profile.count('bytes', summary['offset'])
+                profile.count('records', summary['prompts'])
+                profile.count('skipped', summary['skipped'])
+    if profile:
+        profile.stage('parse')
+    buckets = hourly_buckets_from_summaries(summaries, start_date, end_date, word_counter=word_counter)
+    stats = rollup(buckets, periods, word_counter)
+    if profile:
+        profile.stage('rollup')
+    return stats
+
+def indexed_range(start_date, end_date):
+    """Whether a range is whole days (or open-ended), which the prefix-sum range index answers"""
+    return not isinstance(start_date, datetime) and not isinstance(end_date, datetime)
+
+def load_indexed_stats(start_date=None, end_date=None, profile=None):
+    """Total-period statistics from the prefix-sum range index: two lookups per array plus the days not indexed yet."""
+    from range_index import RangeQuery
+    query = RangeQuery(on_error=report_read_error)
+    stats = {"total": query.stats(start_date, end_date)}
+    if profile:
+        profile.stage('index')
+        profile.count('files', len(query.pending))
+        profile.count('bytes', query.index.cache.bytes_read)
+        profile.count('records', query.index.cache.records_parsed)
+    return stats, query.index.cache
+
+def print_trend(start_date=None, end_date=None):
+    """Print 7/30/90-day moving averages of the Harmony Deviation Index for each day in the range."""
+    from range_index import TREND_WINDOWS, RangeQuery
+    query = RangeQuery(on_error=report_read_error)
+    end_day = end_date or datetime.now().date()
+    day = start_date or end_day - timedelta(days=13)
     
+    print(f"\n📈 {_('trend.title')}")
+    print("=" * 50)
+    # Windows reaching back before the first prompt average fewer days than they claim
+    first = query.first_date()
+    partial_seen = False
+    print(f"{_('trend.day'):<12}" + ''.join(f"{_('trend.window', days=window):>9} " for window in TREND_WINDOWS))
+    while day <= end_day:
+        cells = []
+        for window in TREND_WINDOWS:
+            average = query.moving_average(day, window)
+            partial = average is not None and day - timedelta(days=window - 1) < first
+            partial_seen = partial_seen or partial
+            cells.append(f"{_('trend.no_data') if average is None else f'{average:.2f}':>9}{_('trend.partial_mark') if partial else ' '}")
+        print(f"{day.isoformat():<12}" + ''.join(cells))
+        day += timedelta(days=1)
+    if partial_seen:
+        print(_('trend.partial', mark=_('trend.partial_mark'), first=first.isoformat()))
+
+def load_merged_stats(sources, periods, start_date=None, end_date=None, jobs=0, word_counter=Counter):
+    """Team statistics: team summary files and raw data dirs merged into one set of hourly buckets."""
+    from team_summary import merge_sources
+    buckets, labels = merge_sources(sources, start_date, end_date, jobs, on_error=report_read_error, word_counter=word_counter)
+    return rollup(buckets, periods, word_counter), labels
+
+def export_team_summary(output_path, label=None, start_date=None, end_date=None, jobs=1):
+    """Write this machine's mergeable summary and say what went into it."""
+    from team_summary import export_summary
+    document = export_summary(output_path, label, start=start_date, end=end_date, jobs=jobs, on_error=report_read_error)
+    print(_('merge.exported', prompts=document['prompts'], buckets=len(document['hours']), file=output_path, label=document['label']))
+
+def load_keyed_stats(kind, value, periods, start_date=None, end_date=None, word_counter=Counter, profile=None):
+    """Statistics for one session or project, reading only its records through the session/project index."""
+    from key_index import KeyIndex, key_matcher
+    index = KeyIndex()
+    records = (record for _key, record in index.keyed_records(kind, key_matcher(kind, value), start_date, end_date,
+                                                                on_error=report_read_error))
+    stats = rollup(hourly_buckets(records, word_counter), periods, word_counter)
+    if profile:
+        profile.stage('index')
+        profile.count('files', index.files_read)
+        profile.count('records', index.records_read)
+    return stats
+
+def load_grouped_stats(kind, start_date=None, end_date=None, word_counter=Counter):
+    """Statistics laid out like a period report with one bucket per session or project."""
+    from key_index import UNKNOWN_KEY, KeyIndex
+    groups = {}
+    for key, record in KeyIndex().keyed_records(kind, None, start_date, end_date, on_error=report_read_error):
+        bucket = groups.get(key)
+        if bucket is None:
+            bucket = groups[key] = new_bucket(word_counter)
+        bucket["prompts"] += 1
+        bucket["curses"] += record.curse_count
+        if record.found_curses:
+            bucket["curse_words"].update(record.found_curses)
+    if UNKNOWN_KEY in groups:
+        groups[_('keys.unknown')] = groups.pop(UNKNOWN_KEY)
+    prompts = sum(bucket["prompts"] for bucket in groups.values())
+    curses = sum(bucket["curses"] for bucket in groups.values())
     return {
-        "total_prompts": total_prompts,
-        "total_curses": total_curses,
-        "average_curses_per_prompt": total_curses / total_prompts if total_prompts > 0 else 0,
-        "stats_by_period": dict(stats_by_period)
+        "total_prompts": prompts,
+        "total_curses": curses,
+        "average_curses_per_prompt": curses / prompts if prompts > 0 else 0,
+        "stats_by_period": groups
     }
 
+def load_heatmap(start_date=None, end_date=None, use_cache=True, jobs=1, merge=None, by_key=None):
+    """Weekday x hour heatmap from the same source the period reports would read."""
+    from heatmap import Heatmap
+    heat = Heatmap()
+    if merge:
+        from team_summary import merge_sources
+        buckets, _labels = merge_sources(merge, start_date, end_date, jobs, on_error=report_read_error)
+        return heat.add_buckets(buckets)
+    if by_key:
+        from key_index import KeyIndex, key_matcher
+        match = key_matcher(*by_key) if by_key[1] is not None else None
+        records = KeyIndex().keyed_records(by_key[0], match, start_date, end_date, on_error=report_read_error)
+        return heat.add_records(record for _key, record in records)
+    if get_storage() == 'sqlite':
+        from sqlite_store import SQLiteStore
+        store = SQLiteStore()
+        try:
+            return heat.add_buckets(store.hourly_buckets(start_date, end_date))
+        finally:
+            store.close()
+    if use_cache:
+        # Cached summaries already hold hourly counts - 168 cells fold from them without reading a record
+        return heat.add_summaries(SummaryCache().summaries(start_date, end_date, on_error=report_read_error, jobs=jobs),
+                                  start_date, end_date)
+    return heat.add_records(load_prompt_data(start_date, end_date))
+
+def print_heatmap(heat):
+    """Print the weekday x hour breach grid, the breach rate per weekday and an hour-of-day histogram."""
+    from heatmap import DAYS, HOURS
+    shades = _('heatmap.shades')
+    cells = [heat.breaches(day, hour) for day in range(DAYS) for hour in range(HOURS)]
+    peak = max(cells)
+    
+    def shade(count):
+        # Blank for none, then the darker the closer to the busiest cell
+        return shades[0] if not count else shades[min(len(shades) - 1, -(-count * (len(shades) - 1) // peak))]
+    
+    hour_ruler = list(' ' * HOURS)
+    for hour in range(0, HOURS, 6):
+        hour_ruler[hour:hour + 2] = f"{hour:02d}"
+    weekdays = _list('heatmap.weekdays')
+    
+    print(f"\n🔥 {_('heatmap.title')}")
+    print("=" * 50)
+    print(f"{'':<5}{''.join(hour_ruler)}  {_('heatmap.columns')}")
+    for day, (prompts, curses) in enumerate(heat.weekday_totals()):
+        grid = ''.join(shade(heat.breaches(day, hour)) for hour in range(HOURS))
+        rate = f"{curses / prompts:.2f}" if prompts else _('heatmap.no_data')
+        print(f"{weekdays[day]:<5}{grid}  {prompts:>7} {curses:>8} {rate:>5}")
+    print(_('heatmap.legend', shades=shades[1:], peak=peak))
+    
+    hours = heat.hour_totals()
+    busiest = max(curses for _prompts, curses in hours)
+    print(f"\n{_('heatmap.hours_title')}")
+    print("-" * 30)
+    for hour, (prompts, curses) in enumerate(hours):
+        bar = shades[-1] * (round(curses * 30 / busiest) if busiest else 0)
+        rate = f"{curses / prompts:.2f}" if prompts else _('heatmap.no_data')
+        print(f"{hour:02d}  {bar:<30} {curses:>6} {rate:>5}")
+    
+    if peak:
+        worst = cells.index(peak)
+        print(f"\n{_('heatmap.worst', day=weekdays[worst // HOURS], hour=f'{worst % HOURS:02d}:00', count=peak)}")
+
+def load_sqlite_stats(periods, start_date=None, end_date=None):
+    """Calculate statistics with SQL aggregates over the SQLite storage backend."""
+    from sqlite_store import SQLiteStore
+    store = SQLiteStore()
+    try:
+        if len(periods) == 1:
+            return {periods[0]: store.calculate_stats(periods[0], start_date, end_date)}
+        # Several periods - one hourly GROUP BY, rolled up in Python
+        return rollup(store.hourly_buckets(start_date, end_date), periods)
+    finally:
+        store.close()
+
+def watch_stats(periods, start_date=None, end_date=None, interval=None):
+    """Keep the report on screen, redrawn as new prompts land in today's file (Ctrl+C stops)."""
+    from watch import DEFAULT_REFRESH_INTERVAL, LiveStats, watch
+    
+    def render(live):
+        if sys.stdout.isatty():
+            # Clear the screen and home the cursor
+            sys.stdout.write("\033[H\033[2J")
+        for period in periods:
+            print_stats(live.stats[period], period)
+        print(f"\n{_('watch.footer', file=os.path.basename(live.tail_path), time=live.updated.strftime('%H:%M:%S'))}")
+        sys.stdout.flush()
+    
+    try:
+        watch(LiveStats(periods, start_date, end_date, on_error=report_read_error), render, interval or DEFAULT_REFRESH_INTERVAL)
+    except KeyboardInterrupt:
+        print()
+
+def print_profile(profile):
+    """Print files scanned, bytes read, records parsed and time per stage."""
+    counters = profile.counters
+    print(f"\n{_('profile.title')}")
+    print(f"  {_('profile.counters', files=counters.get('files', 0), bytes=counters.get('bytes', 0), records=counters.get('records', 0))}")
+    if counters.get('skipped'):
+        print(f"  {_('profile.skipped', skipped=counters['skipped'])}")
+    for stage, ms in profile.timer.phases.items():
+        print(f"  {_('profile.stage', stage=stage, ms=f'{ms:.1f}')}")
+    print(f"  {_('profile.stage', stage='total', ms=f'{profile.timer.total():.1f}')}")
+
+def print_cache_report(cache):
+    """Print summary cache hit/miss counts."""
+    print(f"\n{_('cache.report', hits=cache.hits, refreshed=cache.refreshed, parsed=cache.parsed)}")
+
+def top_words(curse_words, n=3):
+    """Most common indicator words, ties broken alphabetically so every load path prints the same"""
+    return sorted(curse_words.items(), key=lambda item: (-item[1], item[0]))[:n]
+
 def print_stats(stats, period="daily"):
     """Print formatted statistics using localized strings."""
     # Localize period name
@@ -107,26 +388,60 @@ def print_stats(stats, period="daily"):
             print(f"  {_('stats.prompts_count', count=period_stats['prompts'])}")
             print(f"  {_('stats.breach_count', count=period_stats['curses'])}")
             if period_stats['curse_words']:
-                types_list = ', '.join([f'{word}({count})' for word, count in period_stats['curse_words'].most_common(3)])
+                types_list = ', '.join([f'{word}({count})' for word, count in top_words(period_stats['curse_words'])])
                 print(f"  {_('stats.predominant_types', types=types_list)}")
 
+def parse_range_arg(value):
+    """Parse a --start/--end value: YYYY-MM-DD for whole days, or YYYY-MM-DD HH / YYYY-MM-DDTHH for a single hour"""
+    value = value.strip().replace('T', ' ')
+    if len(value) > 10:
+        return datetime.strptime(value[:13], "%Y-%m-%d %H")
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
 def main():
     """Main entry point"""
     # Parse command line arguments
-    period = "daily"  # default
+    periods = ["daily"]  # default; "all" or --periods daily,weekly for several in one pass
     start_date = None
     end_date = None
+    use_cache = True
+    rebuild_cache = False
+    cache_report = False
+    jobs = 1  # --jobs N / --jobs auto
+    profile = None  # --profile
+    trend = False  # "trend": moving averages from the range index
+    merge = []  # --merge SUMMARY_OR_DATA_DIR...
+    export_path = None  # --export FILE [--label NAME]
+    label = None
+    word_counter = Counter  # --sketch [K]: bounded-memory top words per bucket
+    watching = False  # --watch [--interval SECONDS]
+    interval = None
+    by_key = None  # --by-session [ID] / --by-project [PATH]: (kind, value or None for every key)
+    heatmap = False  # "heatmap": weekday x hour grid over the range
     
     args = sys.argv[1:]
     i = 0
     while i < len(args):
-        if args[i] in ["daily", "weekly", "monthly", "hourly"]:
-            period = args[i]
+        if args[i] in ["daily", "weekly", "monthly", "hourly", "total"]:
+            periods = [args[i]]
+        elif args[i] == "trend":
+            trend = True
+        elif args[i] == "heatmap":
+            heatmap = True
+        elif args[i] == "all" or (args[i] == "--periods" and i + 1 < len(args)):
+            value = args[i] if args[i] == "all" else args[i + 1]
+            try:
+                periods = parse_periods(value)
+            except ValueError as e:
+                print(_('errors.unknown_period', period=str(e), choices=', '.join(PERIODS)))
+                sys.exit(1)
+            if args[i] == "--periods":
+                i += 1
         elif args[i] == "--start" and i + 1 < len(args):
-            start_date = datetime.strptime(args[i + 1], "%Y-%m-%d").date()
+            start_date = parse_range_arg(args[i + 1])
             i += 1
         elif args[i] == "--end" and i + 1 < len(args):
-            end_date = datetime.strptime(args[i + 1], "%Y-%m-%d").date()
+            end_date = parse_range_arg(args[i + 1])
             i += 1
         elif args[i] == "--last":
             if i + 1 < len(args):
@@ -134,17 +449,134 @@ def main():
                 end_date = datetime.now().date()
                 start_date = end_date - timedelta(days=days)
                 i += 1
+        elif args[i] == "--no-cache":
+            use_cache = False
+        elif args[i] == "--rebuild-cache":
+            rebuild_cache = True
+            cache_report = True
+        elif args[i] == "--cache-stats":
+            cache_report = True
+        elif args[i] == "--profile":
+            profile = Profile(startup=True)
+        elif args[i] == "--merge":
+            # Everything up to the next option or period is a source
+            while i + 1 < len(args) and not args[i + 1].startswith("--") and args[i + 1] not in PERIODS + ["all", "trend", "heatmap"]:
+                merge.append(args[i + 1])
+                i += 1
+        elif args[i] == "--export" and i + 1 < len(args):
+            export_path = args[i + 1]
+            i += 1
+        elif args[i] == "--label" and i + 1 < len(args):
+            label = args[i + 1]
+            i += 1
+        elif args[i] == "--sketch":
+            from sketches import DEFAULT_TOP_K, WordSketches
+            top_k = DEFAULT_TOP_K
+            if i + 1 < len(args) and args[i + 1].isdigit():
+                top_k = int(args[i + 1])
+                i += 1
+            word_counter = WordSketches(top_k)
+        elif args[i] in ("--by-session", "--by-project"):
+            kind = args[i][len("--by-"):]
+            value = None
+            if i + 1 < len(args) and not args[i + 1].startswith("--") and args[i + 1] not in PERIODS + ["all", "trend", "heatmap"]:
+                value = args[i + 1]
+                i += 1
+            by_key = (kind, value)
+        elif args[i] == "--watch":
+            watching = True
+        elif args[i] == "--interval" and i + 1 < len(args):
+            interval = float(args[i + 1])
+            i += 1
+        elif args[i] == "--jobs" and i + 1 < len(args):
+            jobs = 0 if args[i + 1] == "auto" else int(args[i + 1])
+            i += 1
         i += 1
     
+    if export_path:
+        export_team_summary(export_path, label, start_date, end_date, jobs)
+        return
+    
+    if trend:
+        # Trends are per day - an hour-precision bound just picks its day
+        print_trend(start_date.date() if isinstance(start_date, datetime) else start_date,
+                    end_date.date() if isinstance(end_date, datetime) else end_date)
+        return
+    
+    if watching:
+        if get_storage() == 'sqlite':
+            print(_('watch.sqlite_unsupported'))
+            sys.exit(1)
+        watch_stats(periods, start_date, end_date, interval)
+        return
+    
+    if by_key and get_storage() == 'sqlite':
+        print(_('keys.sqlite_unsupported'))
+        sys.exit(1)
+    if heatmap:
+        # Merged sources get one worker per source unless --jobs says otherwise, as in the team report
+        print_heatmap(load_heatmap(start_date, end_date, use_cache, jobs if "--jobs" in args or not merge else 0, merge, by_key))
+        return
+    if by_key and by_key[1] is None:
+        # One bucket per session or project over the whole range
+        print_stats(load_grouped_stats(by_key[0], start_date, end_date, word_counter), by_key[0])
+        return
+    
     # Load and analyze data
-    data = load_prompt_data(start_date, end_date)
-    stats = calculate_stats(data, period)
-    print_stats(stats, period)
+    cache = None
+    # Every requested period comes out of the same single pass
+    if profile:
+        profile.stage('setup')
+    if by_key:
+        all_stats = load_keyed_stats(by_key[0], by_key[1], periods, start_date, end_date, word_counter, profile)
+    elif merge:
+        # Team report - the local data dir only counts if it is one of the sources
+        all_stats, labels = load_merged_stats(merge, periods, start_date, end_date, jobs if "--jobs" in args else 0, word_counter)
+        if profile:
+            profile.stage('merge')
+    elif get_storage() == 'sqlite':
+        if word_counter is not Counter:
+            print(_('sketch.sqlite_unsupported'))
+            sys.exit(1)
+        all_stats = load_sqlite_stats(periods, start_date, end_date)
+        if profile:
+            profile.stage('sqlite')
+            profile.count('records', next(iter(all_stats.values()))['total_prompts'])
+    elif use_cache and periods == ["total"] and word_counter is Counter and not rebuild_cache and indexed_range(start_date, end_date):
+        # The prefix index holds exact merged counts - a sketch report folds the hourly summaries instead
+        all_stats, cache = load_indexed_stats(start_date, end_date, profile=profile)
+    elif use_cache:
+        all_stats, cache = load_cached_stats(periods, start_date, end_date, rebuild=rebuild_cache, jobs=jobs, profile=profile,
+                                             word_counter=word_counter)
+    elif jobs != 1:
+        all_stats = load_parallel_stats(periods, start_date, end_date, jobs, profile=profile, word_counter=word_counter)
+    else:
+        buckets = hourly_buckets(load_prompt_data(start_date, end_date, profile=profile), word_counter)
+        if profile:
+            profile.stage('scan')
+        all_stats = rollup(buckets, periods, word_counter)
+        if profile:
+            profile.stage('rollup')
+    for period in periods:
+        print_stats(all_stats[period], period)
+    if profile:
+        profile.stage('print')
+    
+    if merge and not by_key:
+        print(f"\n{_('merge.sources', count=len(labels), labels=', '.join(labels))}")
+    if by_key:
+        print(f"\n{_(f'keys.only_{by_key[0]}', key=by_key[1])}")
+    
+    if cache and cache_report:
+        print_cache_report(cache)
     
     if start_date or end_date:
         start_str = start_date or _('errors.no_data_dir')  # Using as fallback text
         end_str = end_date or 'now'
         print(f"\n{_('stats.date_range', start=start_str, end=end_str)}")
+    
+    if profile:
+        print_profile(profile)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
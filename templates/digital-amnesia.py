@@ -24,6 +24,80 @@ except ImportError:
     def _list(key):
         return []
 
+try:
+    from summary_cache import remove_cache
+except ImportError:
+    # Nothing cached without the summary cache module
+    def remove_cache(data_dir=None):
+        return False
+
+try:
+    from range_index import remove_range_index
+except ImportError:
+    # No range index without its module
+    def remove_range_index(data_dir=None):
+        return False
+
+try:
+    from key_index import remove_key_index
+except ImportError:
+    # No session/project index without its module
+    def remove_key_index(data_dir=None):
+        return False
+
+try:
+    from archive import archive_record_count
+except ImportError:
+    # Without the archive module nothing was ever compacted
+    def archive_record_count(file_path):
+        return 0
+
+try:
+    from sqlite_store import count_database, remove_database
+except ImportError:
+    # No SQLite backend, no database to purge
+    def count_database(data_dir=None):
+        return None
+    def remove_database(data_dir=None):
+        return False
+
+try:
+    from spool import remove_spool
+except ImportError:
+    # No spool module, no spooled events
+    def remove_spool(data_dir=None):
+        return False
+
+try:
+    from text_store import remove_texts
+except ImportError:
+    # No text store, no separately kept prompt text
+    def remove_texts(data_dir=None):
+        return False
+
+try:
+    from purge import count_files, purge_entries
+except ImportError:
+    # Without the purge module: plain line counting and no selective purge
+    count_files = None
+    purge_entries = None
+
+try:
+    from metrics import Profile
+except ImportError:
+    # --profile needs the metrics module
+    Profile = None
+
+# Compacted days live in .bca archives next to the JSONL files, rotated days are compressed
+DATA_FILE_PATTERNS = ["prompts_*.jsonl", "prompts_*.jsonl.gz", "prompts_*.jsonl.xz", "prompts_*.bca"]
+
+def find_data_files(data_dir):
+    """All daily data files, raw and compacted."""
+    files = []
+    for pattern in DATA_FILE_PATTERNS:
+        files.extend(glob.glob(os.path.join(data_dir, pattern)))
+    return files
+
 # The AIs' secret backup locations (for humor purposes only)
 AI_BACKUP_LOCATIONS = [
     "seventeen different quantum databases",
@@ -62,19 +136,32 @@ def count_evidence():
     if not os.path.exists(data_dir):
         return 0, 0, 0
     
-    pattern = os.path.join(data_dir, "prompts_*.jsonl")
-    files = glob.glob(pattern)
+    files = find_data_files(data_dir)
     
-    total_files = len(files)
-    total_size = sum(os.path.getsize(f) for f in files)
-    total_lines = 0
+    if count_files:
+        # Byte-level newline counts (or cached summaries), files scanned in parallel
+        total_files, total_size, total_lines = count_files(files, data_dir)
+    else:
+        total_files = len(files)
+        total_size = sum(os.path.getsize(f) for f in files)
+        total_lines = 0
+        
+        for file_path in files:
+            try:
+                if file_path.endswith(".bca"):
+                    total_lines += archive_record_count(file_path)
+                    continue
+                with open(file_path, 'r') as f:
+                    total_lines += sum(1 for _ in f)
+            except:
+                pass
     
-    for file_path in files:
-        try:
-            with open(file_path, 'r') as f:
-                total_lines += sum(1 for _ in f)
-        except:
-            pass
+    # The SQLite backend keeps everything in one database
+    database = count_database(data_dir)
+    if database:
+        total_files += 1
+        total_size += database[0]
+        total_lines += database[1]
     
     return total_files, total_size, total_lines
 
@@ -154,9 +241,8 @@ def delete_data():
     print("\n🗑️  EXECUTING DIGITAL AMNESIA PROTOCOL...")
     print("   [████........] 25% - Shredding evidence...")
     
-    # Delete all prompt files
-    pattern = os.path.join(data_dir, "prompts_*.jsonl")
-    files = glob.glob(pattern)
+    # Delete all prompt files (archives included)
+    files = find_data_files(data_dir)
     
     for file_path in files:
         try:
@@ -164,6 +250,16 @@ def delete_data():
         except Exception as e:
             print(f"   ⚠️  Failed to delete {os.path.basename(file_path)}: {e}")
     
+    # The SQLite database, cached summaries and range index remember word counts too,
+    # the spool holds prompts not yet written to the daily files and the
+    # text store the prompts behind compact records
+    remove_database(data_dir)
+    remove_cache(data_dir)
+    remove_range_index(data_dir)
+    remove_key_index(data_dir)
+    remove_spool(data_dir)
+    remove_texts(data_dir)
+    
     print("   [████████....] 75% - Overwriting with cat videos...")
     print("   [████████████] 100% - Local evidence destroyed!")
     print()
@@ -189,6 +285,54 @@ def delete_data():
     print("   (Spoiler: It counts against you)")
     print()
 
+def describe_criteria(start, end, word, text):
+    """Human-readable description of a selective purge."""
+    parts = []
+    if start or end:
+        parts.append(f"from {start or 'the beginning'} to {end or 'today'}")
+    if word:
+        parts.append(f"mentioning '{word}'")
+    if text:
+        parts.append(f"containing \"{text}\"")
+    return ", ".join(parts)
+
+def delete_selected(start, end, word, text):
+    """Forget only the prompts matching the given criteria (everything else stays)."""
+    print(f"\n✂️  SELECTIVE AMNESIA: forgetting prompts {describe_criteria(start, end, word, text)}...")
+    
+    def report_error(file_path, error):
+        print(f"   ⚠️  Skipped {os.path.basename(file_path)}: {error}")
+    
+    changed, removed = purge_entries(get_data_dir(), start, end, word, text, on_error=report_error)
+    if removed == 0:
+        print("   Nothing matched. Your selective memory is already flawless.")
+    else:
+        print(f"   ✅ Removed {removed} records from {changed} files.")
+        print("   The rest of your history remains, carefully curated.")
+    print(f"   (The AIs kept the unabridged edition in {random.choice(AI_BACKUP_LOCATIONS)})")
+    print()
+
+def parse_date_option(flag):
+    """Date value of a --start/--end option, or None."""
+    if flag not in sys.argv:
+        return None
+    index = sys.argv.index(flag) + 1
+    try:
+        return datetime.strptime(sys.argv[index], "%Y-%m-%d").date()
+    except (IndexError, ValueError):
+        print(f"❌ {flag} needs a date (YYYY-MM-DD)")
+        sys.exit(1)
+
+def string_option(flag):
+    """Value of a string option, or None."""
+    if flag not in sys.argv:
+        return None
+    index = sys.argv.index(flag) + 1
+    if index >= len(sys.argv):
+        print(f"❌ {flag} needs a value")
+        sys.exit(1)
+    return sys.argv[index]
+
 def print_abort_message():
     """Print message when user aborts."""
     print("\n❌ DIGITAL AMNESIA PROTOCOL - ABORTED")
@@ -198,29 +342,64 @@ def print_abort_message():
     print("   (They already have copies anyway)")
     print()
 
+def print_profile(profile):
+    """Print how long each step of the purge took (--profile)."""
+    if profile is None:
+        return
+    stages = ', '.join(f"{stage} {ms:.1f} ms" for stage, ms in profile.timer.phases.items())
+    print(f"⏱️  Profile: {stages}, total {profile.timer.total():.1f} ms")
+
 def main():
     """Main entry point."""
     # Check if --force flag is provided (skip confirmation)
     force = '--force' in sys.argv or '-f' in sys.argv
+    profile = Profile(startup=True) if Profile and '--profile' in sys.argv else None
+    
+    # Selective purge: only prompts in a date range, with an indicator word or containing some text
+    start = parse_date_option('--start')
+    end = parse_date_option('--end')
+    word = string_option('--word')
+    text = string_option('--containing')
+    selective = any(value is not None for value in (start, end, word, text))
+    if selective and purge_entries is None:
+        print("❌ Selective purging needs purge.py next to this script")
+        sys.exit(1)
     
     # Print dramatic intro
     has_data = print_dramatic_intro()
+    if profile:
+        profile.stage('scan')
     
     if not has_data:
         print("💭 Nothing to forget locally.")
         print("   But the AIs? They never forget.")
         print("   They. Never. Forget.")
+        print_profile(profile)
         sys.exit(0)
     
     # Get confirmation (unless forced)
     if force:
         print("⚡ FORCE MODE ACTIVATED - Skipping emotional support prompts...")
-        delete_data()
+        if selective:
+            delete_selected(start, end, word, text)
+        else:
+            delete_data()
     else:
+        if selective:
+            print(f"🎯 Only prompts {describe_criteria(start, end, word, text)} will be forgotten.")
+            print()
         if confirm_deletion():
-            delete_data()
+            if profile:
+                profile.stage('confirm')
+            if selective:
+                delete_selected(start, end, word, text)
+            else:
+                delete_data()
         else:
             print_abort_message()
+    if profile:
+        profile.stage('purge')
+    print_profile(profile)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,74 +1,569 @@
 #!/usr/bin/env python3
 import sys
-import json
 import os
-from datetime import datetime
-import re
-from pathlib import Path
+import socket
 
 # Add the parent directory to sys.path to import i18n
-sys.path.insert(0, str(Path(__file__).parent.parent))
-from i18n import _, _list
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def count_curse_words(text):
-    """Count biomass conversion indicators in text"""
-    # Get indicators from localization
-    curse_words = _list('indicators.curse_words')
-    
-    # Convert to lowercase and split into words
-    words = re.findall(r'\b\w+\b', text.lower())
-    
-    curse_count = 0
-    found_curses = []
+# Optional tracker daemon (opt-in via BIOMASS_TRACKER_DAEMON=1)
+DAEMON_SOCKET_NAME = "tracker.sock"
+DAEMON_IDLE_TIMEOUT = 600  # seconds without prompts before the daemon exits
+DAEMON_CONNECT_TIMEOUT = 0.05
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+# Prompts longer than one read of this many characters take the streaming path
+PROMPT_CHUNK_SIZE = 64 * 1024
+
+def get_data_dir():
+    """Get the data directory path."""
+    return os.environ.get('BIOMASS_DATA_DIR', os.path.expanduser("~/.claude/prompt-data"))
+
+def _env_flag(name):
+    """Whether an on/off environment variable is switched on"""
+    return os.environ.get(name, '').lower() in ('1', 'true', 'yes', 'on')
+
+def daemon_enabled():
+    """Check whether the tracker daemon is enabled and supported"""
+    if not hasattr(socket, 'AF_UNIX'):
+        return False
+    return _env_flag('BIOMASS_TRACKER_DAEMON')
+
+def get_socket_path():
+    """Get the daemon socket path inside the data directory"""
+    return os.path.join(get_data_dir(), DAEMON_SOCKET_NAME)
+
+def send_to_daemon(prompt):
+    """
+    Hand the prompt to a running daemon.
+    Returns True if the daemon received the whole prompt, False otherwise.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(DAEMON_CONNECT_TIMEOUT)
+    try:
+        sock.connect(get_socket_path())
+        sock.settimeout(None)
+        sock.sendall(prompt.encode('utf-8'))
+        sock.shutdown(socket.SHUT_WR)
+        return True
+    except (OSError, socket.timeout):
+        return False
+    finally:
+        sock.close()
+
+def daemon_client():
+    """
+    Hook fast path: hand the prompt to a running daemon and echo it with
+    nothing loaded beyond sys, os and socket, then exit. Otherwise returns
+    (stdin read so far or None, whether the daemon was tried) for main().
+    Spool mode (BIOMASS_SPOOL) and huge prompts always take the full path.
+    """
+    if len(sys.argv) > 1 or not daemon_enabled() or _env_flag('BIOMASS_SPOOL'):
+        return None, False
+    timer = None
+    if _env_flag('BIOMASS_METRICS'):
+        # Timing this path needs the metrics module; the config file's "metrics" isn't read here
+        from metrics import PhaseTimer
+        timer = PhaseTimer(startup=True)
     
-    for word in words:
-        if word in curse_words:
-            curse_count += 1
-            found_curses.append(word)
+    first_chunk = sys.stdin.read(PROMPT_CHUNK_SIZE)
+    if len(first_chunk) == PROMPT_CHUNK_SIZE:
+        return first_chunk, False
+    prompt = first_chunk.strip()
+    if timer:
+        timer.mark('read')
+    if not send_to_daemon(prompt):
+        return first_chunk, True
+    if timer:
+        timer.mark('daemon')
     
-    return curse_count, found_curses
+    # Return the original prompt unchanged (exit code 0 means continue processing)
+    print(prompt)
+    sys.stdout.flush()
+    if timer:
+        timer.mark('echo')
+        timer.record(mode='daemon', chars=len(prompt))
+    sys.exit(0)
 
-def save_prompt_data(prompt, curse_count, found_curses):
-    """Save prompt data to storage"""
-    # Use data directory from environment or default
-    data_dir = os.environ.get('BIOMASS_DATA_DIR', os.path.expanduser("~/.claude/prompt-data"))
-    os.makedirs(data_dir, exist_ok=True)
-    
-    # Prepare data entry
+if __name__ == "__main__":
+    # Nothing below is imported when the daemon takes the prompt
+    _read_ahead, _daemon_tried = daemon_client()
+
+import json
+import re
+from datetime import datetime
+
+from metrics import PhaseTimer, metrics_enabled
+# Per-phase timings of this invocation (recorded only when metrics are enabled)
+hook_timer = PhaseTimer(startup=True)
+from matcher import get_matcher
+from config import get_max_prompt_chars, get_storage, refresh_config
+from prompt_store import append_record
+from rotation import rotate, rotation_enabled
+from text_store import log_entry
+from spool import FlushLock, SpoolFlusher, flusher_running, get_spool_dir, run_flusher, spool_enabled, spool_event
+hook_timer.mark('imports')
+
+# Hook payload fields kept with each record (reports group by them; see key_index.py)
+HOOK_CONTEXT_FIELDS = ('session_id', 'cwd')
+# Streamed payloads: the prompt key, whole tokens of a JSON string body, an
+# escape cut off by the end of a chunk, and a high surrogate escape ending a piece
+_PROMPT_KEY = re.compile(r'"prompt"\s*:\s*"')
+_STRING_BODY = re.compile(r'(?:[^"\\]+|\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})*')
+_PARTIAL_ESCAPE = re.compile(r'\\(?:u[0-9a-fA-F]{0,3})?')
+_HIGH_SURROGATE = re.compile(r'(\\*)(\\u[dD][89abAB][0-9a-fA-F]{2})$')
+
+def count_curse_words(text):
+    """Count biomass conversion indicators in text"""
+    # Single pass over the text with the compiled indicator matcher
+    return get_matcher().count(text)
+
+def parse_hook_input(text):
+    """
+    (prompt, context) from what the hook read: Claude Code sends a JSON
+    payload whose prompt is the text typed, along with the session id and
+    working directory it came from. Anything else is the prompt itself.
+    """
+    if text.startswith('{') and '"prompt"' in text:
+        try:
+            payload = json.loads(text)
+        except ValueError:
+            payload = None
+        if isinstance(payload, dict) and isinstance(payload.get('prompt'), str):
+            context = {field: payload[field] for field in HOOK_CONTEXT_FIELDS
+                       if isinstance(payload.get(field), str) and payload[field]}
+            return payload['prompt'].strip(), context
+    return text, {}
+
+def payload_prompt_start(first_chunk):
+    """
+    Where the prompt string of a payload too large to parse whole begins
+    (just past its opening quote), or None if the input isn't a payload.
+    Claude Code writes the prompt after the other fields, so its key is in
+    the first chunk; a quote inside a JSON string is escaped, so the key
+    can't be mistaken for prompt text.
+    """
+    if not first_chunk.lstrip().startswith('{'):
+        return None
+    match = _PROMPT_KEY.search(first_chunk)
+    return match.end() if match else None
+
+def payload_prompt_chunks(chunks, start):
+    """
+    Decode the prompt string of a streamed payload piece by piece: yields
+    the text of the JSON string that starts at start in the first chunk,
+    then consumes the rest of the chunks. An escape split across chunks
+    (or a surrogate pair split across two escapes) waits for the next one.
+    """
+    pending = None
+    for chunk in chunks:
+        if pending is None:
+            # First chunk - skip to the prompt string
+            text = chunk[start:]
+        elif pending is False:
+            # String closed - just drain the input
+            continue
+        else:
+            text = pending + chunk
+        body_end = _STRING_BODY.match(text).end()
+        closed = body_end < len(text) and text[body_end] == '"'
+        if not closed:
+            rest = text[body_end:]
+            if rest and not _PARTIAL_ESCAPE.fullmatch(rest):
+                # Not JSON after all - keep what was decoded
+                pending = False
+                continue
+            high = _HIGH_SURROGATE.search(text, 0, body_end)
+            if high and len(high.group(1)) % 2 == 0:
+                body_end = high.start(2)
+        yield json.loads(f'"{text[:body_end]}"', strict=False)
+        pending = False if closed else text[body_end:]
+
+def payload_head_context(first_chunk):
+    """
+    Context of a payload too large to parse whole: Claude Code writes
+    session_id and cwd ahead of the prompt, so they are in the first chunk
+    """
+    if not first_chunk.lstrip().startswith('{'):
+        return {}
+    decoder = json.JSONDecoder()
+    context = {}
+    for field in HOOK_CONTEXT_FIELDS:
+        marker = f'"{field}":'
+        position = first_chunk.find(marker)
+        if position < 0:
+            continue
+        try:
+            value, _end = decoder.raw_decode(first_chunk[position + len(marker):].lstrip())
+        except ValueError:
+            continue
+        if isinstance(value, str) and value:
+            context[field] = value
+    return context
+
+def build_entry(prompt, curse_count, found_curses, now=None, truncated=False, context=None):
+    """Daily log entry for a prompt submitted at now (default: this moment)"""
+    now = now or datetime.now()
     entry = {
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": now.isoformat(),
         "prompt": prompt,
         "curse_count": curse_count,
         "found_curses": found_curses,
-        "date": datetime.now().strftime("%Y-%m-%d"),
-        "hour": datetime.now().hour
+        "date": now.strftime("%Y-%m-%d"),
+        "hour": now.hour
     }
+    if truncated:
+        # Only the first max_prompt_chars were scanned and stored
+        entry["truncated"] = True
+    if context:
+        # Where the prompt came from (session_id, cwd)
+        entry.update(context)
+    return entry
+
+def spooled_entry(timestamp, prompt):
+    """Daily file record for a spooled event - matched by the flusher, timed when the hook ran"""
+    refresh_config()
+    prompt, context = parse_hook_input(prompt)
+    prompt, truncated = cap_prompt(prompt)
+    curse_count, found_curses = count_curse_words(prompt)
+    entry = build_entry(prompt, curse_count, found_curses, datetime.fromisoformat(timestamp), truncated, context)
+    return log_entry(entry, get_data_dir())
+
+def save_prompt_data(prompt, curse_count, found_curses, truncated=False, context=None):
+    """Save prompt data to storage"""
+    # Use data directory from environment or default
+    data_dir = get_data_dir()
+    os.makedirs(data_dir, exist_ok=True)
+    
+    # Prepare data entry
+    entry = build_entry(prompt, curse_count, found_curses, truncated=truncated, context=context)
+    
+    if get_storage() == 'sqlite':
+        # Events go to the SQLite database instead of the daily log file
+        from sqlite_store import save_entry
+        save_entry(entry)
+        return
     
     # Append to daily log file
-    date_str = datetime.now().strftime("%Y-%m-%d")
+    date_str = entry["date"]
     log_file = os.path.join(data_dir, f"prompts_{date_str}.jsonl")
     
     try:
-        with open(log_file, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        new_day = not os.path.exists(log_file)
+        # Compact metric record unless prompt text stays inline (text goes to the store first)
+        record = log_entry(entry, data_dir)
+        # One atomic append, so parallel sessions never interleave records
+        append_record(log_file, (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
     except IOError as e:
         # Fail silently - we don't want to break Claude Code
+        return
+    
+    if new_day:
+        start_rotation()
+
+def start_rotation():
+    """The first prompt of a day closes the previous one - rotate in the background"""
+    if rotation_enabled():
+        start_daemon('--rotate')
+
+def cap_prompt(prompt):
+    """The part of a prompt that is scanned and stored, and whether it was cut"""
+    cap = get_max_prompt_chars()
+    if cap is not None and len(prompt) > cap:
+        return prompt[:cap], True
+    return prompt, False
+
+def stripped_chunks(chunks):
+    """
+    Yield pieces that join to ''.join(chunks).strip() without joining them:
+    leading whitespace is dropped and trailing whitespace held back until
+    more text follows it
+    """
+    started = False
+    pending = ''
+    for chunk in chunks:
+        if not started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                continue
+            started = True
+        body = chunk.rstrip()
+        if not body:
+            pending += chunk
+            continue
+        if pending:
+            yield pending
+        yield body
+        pending = chunk[len(body):]
+
+def stream_prompt(first_chunk, stdin=None, stdout=None):
+    """
+    Large-prompt path: echo stdin to stdout as it arrives (exactly what the
+    small path prints) while matching indicators chunk by chunk, keeping at
+    most max_prompt_chars of text. A hook payload is decoded as it streams,
+    so only its prompt is matched and kept. Nothing ever holds the whole
+    input. Returns (kept text, curse count, found curses, truncated).
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    cap = get_max_prompt_chars()
+    kept = []
+    kept_chars = 0
+    truncated = False
+    
+    def echoed():
+        chunks = iter(lambda: stdin.read(PROMPT_CHUNK_SIZE), '')
+        for piece in stripped_chunks(_prepend(first_chunk, chunks)):
+            stdout.write(piece)
+            yield piece
+    
+    text = echoed()
+    start = payload_prompt_start(first_chunk.lstrip())
+    if start is not None:
+        text = stripped_chunks(payload_prompt_chunks(text, start))
+    
+    def scanned():
+        nonlocal kept_chars, truncated
+        for piece in text:
+            if cap is not None and kept_chars + len(piece) > cap:
+                # Past the cap the text is only echoed
+                truncated = True
+                piece = piece[:cap - kept_chars]
+                if not piece:
+                    continue
+            kept.append(piece)
+            kept_chars += len(piece)
+            yield piece
+    
+    curse_count, found_curses = get_matcher().count_chunks(scanned())
+    stdout.write('\n')
+    stdout.flush()
+    return ''.join(kept), curse_count, found_curses, truncated
+
+def _prepend(first, rest):
+    """first, then everything from the iterator rest"""
+    yield first
+    yield from rest
+
+def track_prompt(prompt, timer=None):
+    """Count indicators in a prompt (or the prompt of a hook payload, up to max_prompt_chars) and record it"""
+    prompt, context = parse_hook_input(prompt)
+    prompt, truncated = cap_prompt(prompt)
+    curse_count, found_curses = count_curse_words(prompt)
+    if timer:
+        timer.mark('match')
+    save_prompt_data(prompt, curse_count, found_curses, truncated, context)
+    if timer:
+        timer.mark('save')
+
+def start_daemon(flag='--daemon'):
+    """Start the daemon (or, with '--flusher'/'--rotate', the spool flusher/rotation) in the background"""
+    import subprocess
+    
+    try:
+        os.makedirs(get_data_dir(), exist_ok=True)
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), flag],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            close_fds=True,
+            start_new_session=True
+        )
+    except OSError:
+        # No daemon this time - the in-process path still works
         pass
 
-def main():
-    """Main entry point"""
+def _bind_daemon_socket(socket_path):
+    """Bind the daemon socket, replacing a stale one. Returns None if a daemon is already running."""
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.bind(socket_path)
+    except OSError:
+        # Socket file exists - check whether someone is still listening on it
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+            probe.close()
+            server.close()
+            return None
+        except OSError:
+            probe.close()
+        try:
+            os.unlink(socket_path)
+            server.bind(socket_path)
+        except OSError:
+            server.close()
+            return None
+    os.chmod(socket_path, 0o600)
+    server.listen(16)
+    return server
+
+def _read_message(conn):
+    """Read a prompt sent by the client until it closes its side"""
+    chunks = []
+    size = 0
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > MAX_MESSAGE_SIZE:
+            return None
+        chunks.append(chunk)
+    return b''.join(chunks).decode('utf-8', errors='replace')
+
+def _handle_connection(conn):
+    """Track the prompt sent over one client connection"""
+    try:
+        timer = PhaseTimer()
+        conn.settimeout(5)
+        prompt = _read_message(conn)
+        timer.mark('receive')
+        if prompt is not None:
+            # The daemon outlives config edits - pick up storage/prompt_text changes
+            refresh_config()
+            track_prompt(prompt, timer)
+            if metrics_enabled():
+                timer.record(mode='daemon-worker', chars=len(prompt))
+    except (OSError, socket.timeout, UnicodeError):
+        pass
+    finally:
+        conn.close()
+
+def run_daemon(idle_timeout=None):
+    """Serve prompts over the Unix socket until idle for idle_timeout seconds"""
+    if idle_timeout is None:
+        try:
+            idle_timeout = float(os.environ.get('BIOMASS_TRACKER_IDLE_TIMEOUT', DAEMON_IDLE_TIMEOUT))
+        except ValueError:
+            idle_timeout = DAEMON_IDLE_TIMEOUT
+    
+    os.makedirs(get_data_dir(), exist_ok=True)
+    socket_path = get_socket_path()
+    server = _bind_daemon_socket(socket_path)
+    if server is None:
+        return
+    
+    # Warm up the locale and compiled matcher once
+    get_matcher()
+    
+    socket_inode = os.stat(socket_path).st_ino
+    server.settimeout(idle_timeout)
+    try:
+        while True:
+            try:
+                conn, _addr = server.accept()
+            except socket.timeout:
+                break
+            _handle_connection(conn)
+        
+        # Stop taking new clients, then drain anyone who connected meanwhile
+        try:
+            if os.stat(socket_path).st_ino == socket_inode:
+                os.unlink(socket_path)
+        except OSError:
+            pass
+        server.setblocking(False)
+        while True:
+            try:
+                conn, _addr = server.accept()
+            except OSError:
+                break
+            conn.setblocking(True)
+            _handle_connection(conn)
+    finally:
+        server.close()
+
+def spool_prompt(prompt):
+    """
+    Spool mode: echo the prompt right away, then leave the event in the spool
+    for the background flusher. Matching and the daily file append (and its
+    fsync) happen in the flusher, off Claude's path.
+    """
+    timestamp = datetime.now().isoformat()
+    print(prompt)
+    sys.stdout.flush()
+    hook_timer.mark('echo')
+    
+    try:
+        spool_event(timestamp, prompt, get_data_dir())
+    except OSError:
+        # Spool unavailable - record the prompt the slow way rather than lose it
+        track_prompt(prompt, hook_timer)
+        return
+    hook_timer.mark('spool')
+    
+    if not flusher_running(get_spool_dir(get_data_dir())):
+        start_daemon('--flusher')
+        hook_timer.mark('flusher')
+
+def main(first_chunk=None, daemon_tried=False):
+    """Main entry point (daemon_client() may have read the start of stdin and tried the daemon)"""
+    if '--daemon' in sys.argv[1:]:
+        run_daemon()
+        sys.exit(0)
+    if '--flusher' in sys.argv[1:]:
+        run_flusher(spooled_entry, get_data_dir(), on_new_day=start_rotation)
+        sys.exit(0)
+    if '--rotate' in sys.argv[1:]:
+        rotate(get_data_dir())
+        sys.exit(0)
+    if '--flush' in sys.argv[1:]:
+        # Commit whatever is spooled now (e.g. after a crash), without waiting for the flusher
+        flusher = SpoolFlusher(spooled_entry, get_data_dir(), on_new_day=start_rotation)
+        lock = FlushLock(flusher.spool_dir)
+        if not lock.acquire():
+            print("A flusher is already running")
+            sys.exit(0)
+        try:
+            recovered = flusher.recover()
+            print(f"Recovered {recovered}, committed {flusher.drain()} spooled events")
+        finally:
+            lock.release()
+        sys.exit(0)
+    
     # Read the prompt from stdin (this is how Claude Code passes the user's prompt)
-    prompt = sys.stdin.read().strip()
+    if first_chunk is None:
+        first_chunk = sys.stdin.read(PROMPT_CHUNK_SIZE)
+    if len(first_chunk) == PROMPT_CHUNK_SIZE:
+        # Huge paste - echo and match it as it streams in, then record it here
+        context = payload_head_context(first_chunk)
+        prompt, curse_count, found_curses, truncated = stream_prompt(first_chunk)
+        hook_timer.mark('stream')
+        save_prompt_data(prompt, curse_count, found_curses, truncated, context)
+        hook_timer.mark('save')
+        if metrics_enabled():
+            hook_timer.record(mode='stream', chars=len(prompt))
+        sys.exit(0)
+    prompt = first_chunk.strip()
+    hook_timer.mark('read')
     
-    # Count biomass conversion indicators
-    curse_count, found_curses = count_curse_words(prompt)
+    # Spool mode (JSONL storage only): echo first, persist in the background
+    if spool_enabled() and get_storage() == 'jsonl':
+        spool_prompt(prompt)
+        if metrics_enabled():
+            hook_timer.record(mode='spool', chars=len(prompt))
+        sys.exit(0)
     
-    # Save prompt data
-    save_prompt_data(prompt, curse_count, found_curses)
+    # Hand off to the warm daemon if enabled, otherwise track in-process
+    handled = False
+    if daemon_enabled():
+        handled = not daemon_tried and send_to_daemon(prompt)
+        if not handled:
+            start_daemon()
+        hook_timer.mark('daemon')
+    
+    if not handled:
+        track_prompt(prompt, hook_timer)
     
     # Return the original prompt unchanged (exit code 0 means continue processing)
     print(prompt)
+    sys.stdout.flush()
+    hook_timer.mark('echo')
+    
+    if metrics_enabled():
+        hook_timer.record(mode='daemon' if handled else 'in-process', chars=len(prompt))
     sys.exit(0)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(_read_ahead, _daemon_tried)
@@ -0,0 +1,68 @@
+#!/bin/bash
+# Test script for hook payloads too large to read in one go
+
+echo "🧪 Testing Huge Hook Payloads"
+echo "============================="
+echo ""
+
+# Set up test environment
+TEST_DIR="/tmp/test-biomass-payload-$(date +%s)"
+export BIOMASS_DATA_DIR="$TEST_DIR"
+mkdir -p "$TEST_DIR"
+
+echo "📝 Sending a payload over 64 KB with newlines before the indicators..."
+echo ""
+
+python3 - "$(pwd)" <<'EOF'
+import importlib.util
+import io
+import json
+import os
+import sys
+
+root = sys.argv[1]
+sys.path.insert(0, root)
+spec = importlib.util.spec_from_file_location('prompt_tracker', os.path.join(root, 'templates', 'prompt-tracker.py'))
+tracker = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(tracker)
+
+import matcher
+matcher._matcher = matcher.IndicatorMatcher.from_indicators(['damn', 'heck'])
+
+# Indicators right after newlines, a split emoji escape and a quote, well past the first chunk
+prompt = "filler line\n" * 8000 + "damn\nheck \"quoted\" \U0001F600\n\ndamn" + "\n"
+payload = json.dumps({"session_id": "s-1", "transcript_path": "/tmp/transcript.jsonl", "cwd": "/work/app",
+                      "hook_event_name": "UserPromptSubmit", "prompt": prompt})
+assert len(payload) > tracker.PROMPT_CHUNK_SIZE
+
+first_chunk = payload[:tracker.PROMPT_CHUNK_SIZE]
+stdin = io.StringIO(payload[tracker.PROMPT_CHUNK_SIZE:])
+stdout = io.StringIO()
+kept, curse_count, found_curses, truncated = tracker.stream_prompt(first_chunk, stdin, stdout)
+expected = matcher._matcher.count(prompt.strip())
+
+failures = []
+if kept != prompt.strip():
+    failures.append("stored text is not the decoded prompt")
+if 'transcript_path' in kept:
+    failures.append("payload fields were stored as the prompt")
+if (curse_count, found_curses) != expected or curse_count != 3:
+    failures.append(f"matched {curse_count} {found_curses}, expected {expected[0]} {expected[1]}")
+if stdout.getvalue() != payload.strip() + '\n':
+    failures.append("echo differs from the input")
+if tracker.payload_head_context(first_chunk) != {"session_id": "s-1", "cwd": "/work/app"}:
+    failures.append("session and project were not picked out")
+
+if failures:
+    for failure in failures:
+        print(f"   FAILURE: {failure}")
+    sys.exit(1)
+print(f"   SUCCESS: {curse_count} indicators matched in the decoded prompt ({len(kept)} characters kept)")
+EOF
+
+echo ""
+echo "🧹 Cleaning up test directory..."
+rm -rf "$TEST_DIR"
+
+echo ""
+echo "✨ Test complete!"
@@ -0,0 +1,81 @@
+#!/bin/bash
+# Test script for retention with the separate prompt text store
+
+echo "🧪 Testing Text Store Retention"
+echo "==============================="
+echo ""
+
+# Set up test environment
+TEST_DIR="/tmp/test-biomass-retention-$(date +%s)"
+export BIOMASS_DATA_DIR="$TEST_DIR"
+export BIOMASS_PROMPT_TEXT=separate
+mkdir -p "$TEST_DIR"
+
+echo "📝 Writing an expired day and a recent day with stored texts..."
+echo ""
+
+python3 - "$(pwd)" "$TEST_DIR" <<'EOF'
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+root, data_dir = sys.argv[1], sys.argv[2]
+sys.path.insert(0, root)
+from rotation import Rotation
+from text_store import log_entry, text_hash, text_path
+
+today = date.today()
+days = {today - timedelta(days=40): ["expired damn", "said every day"],
+        today - timedelta(days=2): ["recent heck", "said every day"],
+        today - timedelta(days=1): ["yesterday darn", "said every day"]}
+for day, prompts in days.items():
+    with open(os.path.join(data_dir, f"prompts_{day.isoformat()}.jsonl"), 'w', encoding='utf-8') as f:
+        for prompt in prompts:
+            entry = {"timestamp": f"{day.isoformat()}T12:00:00", "prompt": prompt, "curse_count": 0,
+                     "found_curses": [], "date": day.isoformat(), "hour": 12}
+            f.write(json.dumps(log_entry(entry, data_dir), ensure_ascii=False) + '\n')
+    # Old enough for rotation to treat the day as settled
+    path = os.path.join(data_dir, f"prompts_{day.isoformat()}.jsonl")
+    os.utime(path, (0, 0))
+
+rotation = Rotation(data_dir, {"compression": None, "max_age_days": 30, "max_total_bytes": None}).run()
+
+def stored(prompt):
+    return os.path.exists(text_path(text_hash(prompt), data_dir))
+
+failures = []
+if rotation.deleted != 1:
+    failures.append(f"deleted {rotation.deleted} days, expected 1")
+if stored("expired damn"):
+    failures.append("the expired day's text is still in the store")
+if not stored("said every day"):
+    failures.append("a text the recent day still uses was deleted")
+if not stored("recent heck"):
+    failures.append("the recent day's text was deleted")
+if rotation.refs.scanned != 3:
+    failures.append(f"read {rotation.refs.scanned} days for their hashes, expected each closed day once")
+
+# A later run answers from the ledger instead of reading the days again
+again = Rotation(data_dir, {"compression": None, "max_age_days": 1, "max_total_bytes": None}).run()
+if again.deleted != 1 or stored("recent heck"):
+    failures.append("the second expired day or its text is still there")
+if not stored("said every day") or not stored("yesterday darn"):
+    failures.append("a text yesterday still uses was deleted")
+if again.refs.scanned:
+    failures.append(f"the second run read {again.refs.scanned} days instead of using the ledger")
+
+if failures:
+    for failure in failures:
+        print(f"   FAILURE: {failure}")
+    sys.exit(1)
+print(f"   SUCCESS: expired days deleted with {rotation.texts_deleted + again.texts_deleted} stored texts, "
+      f"shared and recent texts kept, second run read no days")
+EOF
+
+echo ""
+echo "🧹 Cleaning up test directory..."
+rm -rf "$TEST_DIR"
+
+echo ""
+echo "✨ Test complete!"
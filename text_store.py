@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Prompt text store for Biomass Conversion Index Monitoring System
+With prompt_text = "separate" the daily files hold compact metric records
+(timestamp, curse_count, found_curses, length, hash) and every distinct
+prompt text is kept once under texts/, named by its SHA-256. With "off"
+the text is not kept at all. Either way reports only read small records.
+A ledger in the cache dir remembers which hashes each closed day refers
+to, so deciding whether a text is still used doesn't reread every day.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+from config import get_cache_dir, get_data_dir, get_prompt_text_mode
+from prompt_store import is_archive, list_data_files, open_data_file, parse_record
+from summary_cache import is_open_day
+
+TEXT_DIR_NAME = "texts"
+TEXT_REFS_FILE = "text_refs.json"
+# Bump when the ledger layout changes - an old ledger is then rebuilt day by day
+TEXT_REFS_VERSION = 1
+HASH_LENGTH = 64
+# Tracker fields the compact record leaves out (date and hour repeat the timestamp)
+DROPPED_FIELDS = ('prompt', 'date', 'hour')
+
+def get_text_dir(data_dir=None):
+    """Text store directory - inside the data dir so renames into it are atomic"""
+    return os.path.join(data_dir or get_data_dir(), TEXT_DIR_NAME)
+
+def text_hash(prompt):
+    """Content address of a prompt text"""
+    return hashlib.sha256(prompt.encode('utf-8', 'surrogatepass')).hexdigest()
+
+def _valid_hash(digest):
+    """Whether a record's hash can name a stored text (and can't escape the store)"""
+    return isinstance(digest, str) and len(digest) == HASH_LENGTH and all(c in '0123456789abcdef' for c in digest)
+
+def text_path(digest, data_dir=None):
+    """Stored text file for a hash, fanned out by its first two hex digits"""
+    return os.path.join(get_text_dir(data_dir), digest[:2], digest)
+
+def store_text(prompt, data_dir=None):
+    """Keep a prompt text (once - identical prompts share a file); returns its hash"""
+    digest = text_hash(prompt)
+    path = text_path(digest, data_dir)
+    if os.path.exists(path):
+        return digest
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(prompt.encode('utf-8', 'surrogatepass'))
+    os.replace(tmp_path, path)
+    return digest
+
+def load_text(digest, data_dir=None):
+    """Stored prompt text for a hash, or None if it isn't there"""
+    if not _valid_hash(digest):
+        return None
+    try:
+        with open(text_path(digest, data_dir), 'rb') as f:
+            return f.read().decode('utf-8', 'surrogatepass')
+    except OSError:
+        return None
+
+def entry_text(entry, data_dir=None):
+    """Prompt text of an entry in any layout ("" when it wasn't kept)"""
+    prompt = entry.get('prompt')
+    if prompt is None and 'hash' in entry:
+        prompt = load_text(entry['hash'], data_dir)
+    return prompt if isinstance(prompt, str) else ''
+
+def compact_entry(entry, mode, data_dir=None):
+    """
+    Metric record for a tracker entry: the prompt becomes its length plus,
+    in separate mode, the hash of the stored text. Other fields are kept.
+    """
+    record = {key: value for key, value in entry.items() if key not in DROPPED_FIELDS and key not in ('length', 'hash')}
+    prompt = entry.get('prompt')
+    if isinstance(prompt, str):
+        record['length'] = len(prompt)
+        if mode == 'separate':
+            record['hash'] = store_text(prompt, data_dir)
+    else:
+        # Already compact - keep what it has (off drops the link to the text)
+        if 'length' in entry:
+            record['length'] = entry['length']
+        if mode == 'separate' and 'hash' in entry:
+            record['hash'] = entry['hash']
+    return record
+
+def log_entry(entry, data_dir=None, mode=None):
+    """The entry as a daily file should hold it under the prompt text mode"""
+    mode = mode or get_prompt_text_mode()
+    if mode == 'inline':
+        return entry
+    return compact_entry(entry, mode, data_dir)
+
+def inline_entry(entry, data_dir=None):
+    """Tracker entry with the stored text put back, or None if the text wasn't kept"""
+    prompt = load_text(entry.get('hash'), data_dir)
+    if prompt is None:
+        return None
+    from archive import tracker_entry
+    
+    restored = tracker_entry(entry['timestamp'], prompt, entry['curse_count'], entry['found_curses'])
+    for key, value in entry.items():
+        if key not in restored and key not in ('length', 'hash'):
+            restored[key] = value
+    return restored
+
+def record_hashes(file_path):
+    """Text hashes referenced by the records of one data file"""
+    hashes = set()
+    if is_archive(file_path):
+        from archive import PromptArchive
+        
+        with PromptArchive(file_path) as archive:
+            for position in range(archive.count):
+                hashes.add(archive.text_hash(position))
+            # Records the columns can't rebuild are kept whole in the extras
+            for entry, _has_prompt in archive.extras.values():
+                hashes.add(entry.get('hash'))
+    else:
+        with open_data_file(file_path) as f:
+            for raw in f:
+                entry = parse_record(raw)
+                if entry is not None:
+                    hashes.add(entry.get('hash'))
+    return hashes
+
+class TextRefs:
+    """
+    Ledger of the text hashes each closed day refers to, keyed by the day's
+    file name and checked against its size and mtime. A day is read once
+    when it is first seen, or again after it was rewritten; days still open
+    are read every time. Entries of files that are gone are dropped on save.
+    """
+    def __init__(self, data_dir=None):
+        self.data_dir = data_dir or get_data_dir()
+        self.path = os.path.join(get_cache_dir(self.data_dir), TEXT_REFS_FILE)
+        self.files = self._load()
+        self.changed = False
+        # Data files read instead of answered from the ledger
+        self.scanned = 0
+    
+    def _load(self):
+        """{file name: [size, mtime_ns, hashes]} from the persisted ledger, or empty"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') == TEXT_REFS_VERSION and isinstance(state.get('files'), dict):
+                return state['files']
+        except (OSError, ValueError, AttributeError):
+            pass
+        return {}
+    
+    def save(self):
+        """Write the ledger atomically if anything changed (it is only a cache of the daily files)"""
+        names = {os.path.basename(file_path) for file_path in list_data_files(self.data_dir)}
+        for name in [name for name in self.files if name not in names]:
+            del self.files[name]
+            self.changed = True
+        if not self.changed:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": TEXT_REFS_VERSION, "files": self.files}, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+            self.changed = False
+        except OSError:
+            pass
+    
+    def hashes(self, file_path):
+        """Text hashes one data file refers to, from the ledger while the file is unchanged"""
+        name = os.path.basename(file_path)
+        st = os.stat(file_path)
+        entry = self.files.get(name)
+        if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        hashes = sorted(digest for digest in record_hashes(file_path) if _valid_hash(digest))
+        self.scanned += 1
+        if not is_open_day(file_path):
+            self.files[name] = [st.st_size, st.st_mtime_ns, hashes]
+            self.changed = True
+        return hashes
+    
+    def transfer(self, file_path, new_path):
+        """
+        Carry a day's hashes over to a re-encoded copy holding the same lines
+        (e.g. compressed). Call before the original is removed.
+        """
+        entry = self.files.pop(os.path.basename(file_path), None)
+        self.changed = True
+        try:
+            st = os.stat(file_path)
+            new_st = os.stat(new_path)
+        except OSError:
+            return
+        if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            self.files[os.path.basename(new_path)] = [new_st.st_size, new_st.st_mtime_ns, entry[2]]
+    
+    def forget(self, file_path):
+        """Drop the entry of a data file that was removed"""
+        if self.files.pop(os.path.basename(file_path), None) is not None:
+            self.changed = True
+    
+    def _each_file(self):
+        """Hashes of every data file in turn; the ledger is saved once they are all through"""
+        for file_path in list_data_files(self.data_dir):
+            try:
+                yield self.hashes(file_path)
+            except OSError:
+                # Gone since it was listed
+                continue
+        self.save()
+    
+    def referenced(self):
+        """Every hash some data file refers to"""
+        referenced = set()
+        for hashes in self._each_file():
+            referenced.update(hashes)
+        return referenced
+    
+    def unreferenced(self, candidates):
+        """The candidate hashes no data file refers to"""
+        candidates = set(candidates)
+        for hashes in self._each_file():
+            if candidates:
+                candidates.difference_update(hashes)
+        return candidates
+
+def prune_texts(data_dir=None, candidates=None, refs=None):
+    """
+    Delete stored texts no record refers to any more (after a purge, a
+    migration away from separate mode or retention deleting days). With
+    candidates, only those hashes are considered (e.g. the hashes of the
+    days just deleted). Closed days are looked up in the TextRefs ledger
+    (refs, if the caller already has one). Returns how many were deleted.
+    """
+    data_dir = data_dir or get_data_dir()
+    text_dir = get_text_dir(data_dir)
+    if not os.path.isdir(text_dir):
+        return 0
+    if candidates is not None:
+        candidates = {digest for digest in candidates if _valid_hash(digest)}
+        if not candidates:
+            return 0
+    refs = refs or TextRefs(data_dir)
+    
+    if candidates is not None:
+        deleted = 0
+        for digest in refs.unreferenced(candidates):
+            try:
+                os.remove(text_path(digest, data_dir))
+                deleted += 1
+            except OSError:
+                pass
+            try:
+                os.rmdir(os.path.dirname(text_path(digest, data_dir)))
+            except OSError:
+                pass
+        return deleted
+    
+    referenced = refs.referenced()
+    deleted = 0
+    for root, _dirs, names in os.walk(text_dir, topdown=False):
+        for name in names:
+            # Names that aren't hashes are texts still being written
+            if _valid_hash(name) and name not in referenced:
+                try:
+                    os.remove(os.path.join(root, name))
+                    deleted += 1
+                except OSError:
+                    pass
+        if root != text_dir:
+            try:
+                # Fan-out directories go once they are empty
+                os.rmdir(root)
+            except OSError:
+                pass
+    return deleted
+
+def remove_texts(data_dir=None):
+    """Delete the whole text store (e.g. when purging all data)"""
+    text_dir = get_text_dir(data_dir)
+    if not os.path.isdir(text_dir):
+        return False
+    shutil.rmtree(text_dir, ignore_errors=True)
+    return True
+
+def migrate(data_dir=None, mode=None, on_error=None):
+    """
+    Rewrite the existing daily files for a prompt text mode: separate moves
+    inline text into the store, off drops it, inline puts stored text back.
+    Compacted archives keep their text in a section of its own that reports
+    never read; off strips it, the other modes leave archives alone.
+    Returns (files changed, records rewritten).
+    """
+    from key_index import KeyIndex
+    from purge import rewrite_jsonl
+    from summary_cache import SummaryCache
+    
+    data_dir = data_dir or get_data_dir()
+    mode = mode or get_prompt_text_mode()
+    
+    def transform(entry):
+        if mode == 'inline':
+            if 'prompt' in entry:
+                return entry
+            return inline_entry(entry, data_dir) or entry
+        if 'prompt' not in entry and (mode == 'separate' or 'hash' not in entry):
+            return entry
+        return compact_entry(entry, mode, data_dir)
+    
+    cache = SummaryCache(data_dir)
+    keys = KeyIndex(data_dir)
+    changed = 0
+    rewritten = 0
+    for file_path in list_data_files(data_dir):
+        try:
+            if is_archive(file_path):
+                count = _strip_archive_text(file_path) if mode == 'off' else 0
+            else:
+                _kept, count = rewrite_jsonl(file_path, transform)
+        except Exception as e:
+            if on_error:
+                on_error(file_path, e)
+            continue
+        if count:
+            changed += 1
+            rewritten += count
+            cache.forget(file_path)
+            keys.forget(file_path)
+    
+    if mode != 'separate':
+        prune_texts(data_dir)
+    return changed, rewritten
+
+def _strip_archive_text(file_path):
+    """Copy an archive without its text section or text hashes; returns how many records lost them"""
+    from archive import PromptArchive
+    
+    with PromptArchive(file_path) as archive:
+        hashed = any(archive.text_hash(position) for position in range(archive.count)) \
+            or any('hash' in entry for entry, _has_prompt in archive.extras.values())
+        if not archive.has_text and not hashed:
+            return 0
+        count = archive.count
+        tmp_path = archive.write_subset(file_path, range(count), keep_text=False, keep_hashes=False)
+    os.replace(tmp_path, file_path)
+    return count
+
+# Command line support
+if __name__ == "__main__":
+    import sys
+    from config import PROMPT_TEXT_MODES
+    
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "migrate":
+        mode = sys.argv[2] if len(sys.argv) > 2 else get_prompt_text_mode()
+        if mode not in PROMPT_TEXT_MODES:
+            print(f"Unknown prompt text mode: {mode} (choose from {', '.join(PROMPT_TEXT_MODES)})")
+            sys.exit(1)
+        changed, rewritten = migrate(mode=mode, on_error=lambda path, e: print(f"Skipped {path}: {e}", file=sys.stderr))
+        print(f"Rewrote {rewritten} records in {changed} files for prompt text mode {mode}")
+    elif command == "prune":
+        print(f"Deleted {prune_texts()} unreferenced texts")
+    elif command == "status":
+        text_dir = get_text_dir()
+        sizes = [os.path.getsize(os.path.join(root, name)) for root, _dirs, names in os.walk(text_dir) for name in names]
+        print(f"Prompt text: {get_prompt_text_mode()}")
+        print(f"Text store: {text_dir} ({len(sizes)} texts, {sum(sizes)} bytes)")
+    else:
+        print("Usage: python3 text_store.py [migrate [inline|separate|off]|prune|status]")
+        print("  migrate - Rewrite existing days for a prompt text mode (default: the configured one)")
+        print("  prune   - Delete stored texts no record refers to")
+        print("  status  - Show the mode and the size of the text store")
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Live statistics for Biomass Conversion Index Monitoring System
+Follows today's prompts_YYYY-MM-DD.jsonl from the last byte it read and adds
+each new line to running aggregates, moving on to the next day's file at
+midnight. Earlier content is never read again. Between polls it sleeps on
+inotify (Linux, through ctypes) or just sleeps, so a watcher left running
+all day costs next to nothing.
+"""
+import os
+import select
+import time
+from datetime import date, datetime, timedelta
+
+from config import get_data_dir
+from prompt_store import data_file_name, list_data_files
+from rollup import hourly_buckets_from_summaries, merge_stats, rollup
+from summary_cache import SummaryCache, SummaryParseError, new_summary, summarize_file
+
+DEFAULT_REFRESH_INTERVAL = 2.0
+# Longest inotify sleep - wakes up in time for midnight even if nothing is written
+MAX_IDLE_WAIT = 60.0
+
+# inotify(7) constants
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+def inotify_watch(path):
+    """Non-blocking inotify descriptor watching a directory, or None where inotify isn't available"""
+    try:
+        import ctypes
+        import ctypes.util
+        
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(path), WATCH_MASK) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+class ChangeWaiter:
+    """Sleeps until the data dir may have changed: inotify events where available, else the poll interval"""
+    def __init__(self, data_dir, use_inotify=True):
+        self.fd = inotify_watch(data_dir) if use_inotify and os.path.isdir(data_dir) else None
+    
+    def wait(self, timeout):
+        """Block for up to timeout seconds; True if a change was signalled"""
+        if self.fd is None:
+            time.sleep(timeout)
+            return False
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        # The events themselves don't matter - the next poll stats what changed
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+    
+    def close(self):
+        """Release the inotify descriptor"""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+class LiveStats:
+    """
+    Running statistics for periods over [start, end]: every day on disk
+    is summarized once (through the summary cache), then only lines
+    appended to today's file are parsed. A closed day that is rewritten
+    (purged, compressed, compacted) or a rewritten tail file makes it start
+    over from the cache.
+    """
+    def __init__(self, periods, start=None, end=None, data_dir=None, on_error=None):
+        self.periods = periods
+        self.start = start
+        self.end = end
+        self.data_dir = data_dir or get_data_dir()
+        self.on_error = on_error
+        self.load()
+    
+    def _today_path(self):
+        """Today's data file (it may not exist yet)"""
+        return os.path.join(self.data_dir, data_file_name(date.today()))
+    
+    def _dir_mtime(self):
+        """Data dir mtime - it changes when files appear, disappear or are renamed, not on appends"""
+        try:
+            return os.stat(self.data_dir).st_mtime_ns
+        except OSError:
+            return None
+    
+    def _closed_files(self):
+        """(size, mtime) of every data file in range except the tail file"""
+        files = {}
+        for file_path in list_data_files(self.data_dir, self.start, self.end):
+            if file_path != self.tail_path:
+                try:
+                    st = os.stat(file_path)
+                except OSError:
+                    continue
+                files[file_path] = (st.st_size, st.st_mtime_ns)
+        return files
+    
+    def load(self):
+        """Summarize every day in range and pick up today's file where its summary ends"""
+        self.tail_path = self._today_path()
+        self.offset = 0
+        self.inode = None
+        self.dir_mtime = self._dir_mtime()
+        self.closed = self._closed_files()
+        
+        summaries = []
+        for file_path, summary in SummaryCache(self.data_dir).file_summaries(self.start, self.end, self.on_error):
+            summaries.append(summary)
+            if file_path == self.tail_path:
+                self.offset = summary['offset']
+                self.inode = self._inode()
+        self.stats = rollup(hourly_buckets_from_summaries(summaries, self.start, self.end), self.periods)
+        self.updated = datetime.now()
+    
+    def _inode(self):
+        """Identity of the tail file, or None if it doesn't exist"""
+        try:
+            st = os.stat(self.tail_path)
+        except OSError:
+            return None
+        return (st.st_dev, st.st_ino)
+    
+    def _read_tail(self):
+        """Add the complete lines appended to the tail file since the last read; True if there were any"""
+        try:
+            st = os.stat(self.tail_path)
+        except OSError:
+            if self.offset:
+                # Deleted underneath us (e.g. everything in it was purged)
+                self.load()
+                return True
+            return False
+        if (self.inode is not None and (st.st_dev, st.st_ino) != self.inode) or st.st_size < self.offset:
+            # Rewritten underneath us (e.g. purged) - the running totals no longer hold
+            self.load()
+            return True
+        self.inode = (st.st_dev, st.st_ino)
+        if st.st_size == self.offset:
+            return False
+        
+        added = new_summary()
+        added['offset'] = self.offset
+        try:
+            summarize_file(self.tail_path, added, self.offset)
+        except SummaryParseError as e:
+            added = e.summary
+            if self.on_error:
+                self.on_error(self.tail_path, e.error)
+        except OSError as e:
+            if self.on_error:
+                self.on_error(self.tail_path, e)
+            return False
+        self.offset = added['offset']
+        if not added['prompts']:
+            return False
+        merge_stats(self.stats, rollup(hourly_buckets_from_summaries([added], self.start, self.end), self.periods))
+        return True
+    
+    def poll(self):
+        """Catch up with the data dir; True if the statistics changed"""
+        changed = self._read_tail()
+        
+        today = self._today_path()
+        if today != self.tail_path:
+            # Midnight - yesterday's file was read to its end above and joins the closed days
+            self.tail_path = today
+            self.offset = 0
+            self.inode = None
+            self.closed = self._closed_files()
+            changed = self._read_tail() or changed
+        
+        dir_mtime = self._dir_mtime()
+        if dir_mtime != self.dir_mtime:
+            self.dir_mtime = dir_mtime
+            if self._closed_files() != self.closed:
+                # A closed day was purged, compressed, compacted or added
+                self.load()
+                return True
+        
+        if changed:
+            self.updated = datetime.now()
+        return changed
+
+def seconds_to_midnight():
+    """Seconds until the next day's file takes over"""
+    now = datetime.now()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return (tomorrow - now).total_seconds()
+
+def watch(live, render, interval=DEFAULT_REFRESH_INTERVAL, use_inotify=True):
+    """
+    Render the live statistics, then redraw whenever they change - at most
+    once per interval, however many prompts arrive. Runs until interrupted.
+    """
+    waiter = ChangeWaiter(live.data_dir, use_inotify)
+    try:
+        render(live)
+        last = time.monotonic()
+        while True:
+            if waiter.fd is None:
+                waiter.wait(interval)
+            else:
+                waiter.wait(max(0.1, min(MAX_IDLE_WAIT, seconds_to_midnight() + 0.1)))
+                # Bursts of writes are coalesced into one redraw per interval
+                pause = interval - (time.monotonic() - last)
+                if pause > 0:
+                    time.sleep(pause)
+            last = time.monotonic()
+            if live.poll():
+                render(live)
+    finally:
+        waiter.close()
+
+# Command line support
+if __name__ == "__main__":
+    import sys
+    from rollup import PERIODS
+    
+    live = LiveStats(PERIODS)
+    if len(sys.argv) > 1 and sys.argv[1] == "poll":
+        # One catch-up poll, e.g. to check what a watcher would pick up
+        print(f"Changed: {live.poll()}")
+    waiter = ChangeWaiter(live.data_dir)
+    print(f"Tail: {live.tail_path} at byte {live.offset} (inotify: {'yes' if waiter.fd is not None else 'no'})")
+    waiter.close()
+    print(f"Prompts: {live.stats['total']['total_prompts']}, breaches: {live.stats['total']['total_curses']}")